@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Script to annotate <img> tags in all HTML files of the churchsite project
+Adds width/height from the scanned image dimensions, loading="lazy" and
+decoding="async" below the hero, and fetchpriority="high" on the first
+carousel image. Tags are edited in place in the token stream, so the rest
+of the markup keeps its exact formatting; re-running changes nothing.
+"""
+
+import os
+import re
+import glob
+import posixpath
+from pathlib import Path
+from urllib.parse import unquote
+from concurrent.futures import ProcessPoolExecutor
+
+from image_index import ImageIndex
+from image_probe import safe_probe
+from asset_graph import resolve
+from prettify_html import atomic_write
+
+# Comments and raw-text elements are skipped whole; every other tag is a token
+TOKEN_PATTERN = re.compile(
+    r'<!--.*?-->|<(script|style|textarea)\b.*?</\1\s*>|<(/?)([a-zA-Z][\w-]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>',
+    re.IGNORECASE | re.DOTALL)
+ATTR_PATTERN = re.compile(r'''([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?''')
+# Containers (by tag or exact class) whose images are visible on first paint
+EAGER_TAGS = {'header', 'nav'}
+EAGER_CLASSES = {'hero', 'header', 'navbar', 'page-loader'}
+HERO_CLASSES = {'hero', 'hero__carousel'}
+DENSITY_PATTERN = re.compile(r'@(\d+(?:\.\d+)?)x\.[^.]+$')
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+
+def parse_attributes(text):
+    """Attribute names (lowercased) to values; valueless attributes map to ''"""
+    attrs = {}
+    for match in ATTR_PATTERN.finditer(text):
+        value = next((v for v in match.group(2, 3, 4) if v is not None), '')
+        attrs.setdefault(match.group(1).lower(), value)
+    return attrs
+
+
+def display_size(meta, src):
+    """CSS pixel size of an image: intrinsic size divided by its @Nx density"""
+    density = DENSITY_PATTERN.search(src)
+    scale = float(density.group(1)) if density else 1.0
+    return round(meta['width'] / scale), round(meta['height'] / scale)
+
+
+def annotate_html(content, page, dimensions):
+    """Return content with its <img> tags annotated, plus the number of tags changed
+
+    dimensions maps project-relative image paths to probe results. Only
+    missing attributes are added, which is what makes the pass idempotent.
+    """
+    parts = []
+    pos = 0
+    changed = 0
+    # Stack of open elements: True for those that make their images eager
+    stack = []
+    # Depth of the hero carousel while inside it
+    carousel_depth = None
+    has_priority = re.search(r'<img\b[^>]*\bfetchpriority\s*=', content, re.IGNORECASE) is not None
+
+    for match in TOKEN_PATTERN.finditer(content):
+        closing, tag = match.group(2), match.group(3)
+        if not tag:
+            continue
+        tag = tag.lower()
+        if closing:
+            # Pop back to the matching element; stray end tags are ignored
+            for index in range(len(stack) - 1, -1, -1):
+                if stack[index][0] == tag:
+                    del stack[index:]
+                    break
+            if carousel_depth is not None and len(stack) < carousel_depth:
+                carousel_depth = None
+            continue
+
+        attr_text = match.group(4)
+        attrs = parse_attributes(attr_text)
+        if tag != 'img':
+            if tag not in VOID_ELEMENTS and not attr_text.rstrip().endswith('/'):
+                classes = set(attrs.get('class', '').split())
+                stack.append((tag, tag in EAGER_TAGS or bool(classes & EAGER_CLASSES)))
+                if carousel_depth is None and classes & HERO_CLASSES:
+                    carousel_depth = len(stack)
+            continue
+
+        additions = []
+        src = attrs.get('src', '')
+        if 'width' not in attrs and 'height' not in attrs and src:
+            target = resolve(page, unquote(src))
+            meta = dimensions.get(target) if target else None
+            if meta and meta.get('width') and meta.get('height'):
+                width, height = display_size(meta, target)
+                additions += [f'width="{width}"', f'height="{height}"']
+
+        # An image that already has a fetchpriority (the LCP image from an earlier run) stays eager
+        eager = any(flag for _, flag in stack) or 'fetchpriority' in attrs
+        if carousel_depth is not None and not has_priority:
+            additions.append('fetchpriority="high"')
+            has_priority = True
+        elif not eager:
+            if 'loading' not in attrs:
+                additions.append('loading="lazy"')
+            if 'decoding' not in attrs:
+                additions.append('decoding="async"')
+
+        if not additions:
+            continue
+
+        # Insert before the closing '>' or '/>', keeping the tag's own layout
+        end = match.end() - 1
+        if content[end - 1] == '/':
+            end -= 1
+        insert_at = end
+        while insert_at > match.start() and content[insert_at - 1].isspace():
+            insert_at -= 1
+        parts.append(content[pos:insert_at])
+        parts.append(' ' + ' '.join(additions))
+        pos = insert_at
+        changed += 1
+
+    parts.append(content[pos:])
+    return ''.join(parts), changed
+
+
+def process_file(file_path, project_root, dimensions):
+    """Annotate one page; safe to run in a worker process"""
+    result = {'file': file_path, 'changed': 0, 'error': None}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            content = file.read()
+        page = Path(file_path).resolve().relative_to(Path(project_root).resolve()).as_posix()
+        annotated, result['changed'] = annotate_html(content, page, dimensions)
+        if annotated != content:
+            atomic_write(file_path, annotated)
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def load_dimensions(project_root, jobs=None):
+    """Dimensions of every image under images/, from the incremental image index"""
+    project_root = Path(project_root)
+    index = ImageIndex(project_root / 'images', jobs=jobs)
+    entries = index.refresh()
+    index.save()
+    return {posixpath.join('images', path): record.get('meta') for path, record in entries.items()
+            if record.get('meta')}
+
+
+def annotate_files(html_files, project_root, jobs=None):
+    """Annotate many pages across a process pool"""
+    dimensions = load_dimensions(project_root, jobs)
+
+    # Images referenced outside images/ (e.g. assets/) are probed directly
+    for file_path in html_files:
+        page = Path(file_path).resolve().relative_to(Path(project_root).resolve()).as_posix()
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for src in re.findall(r'<img\b[^>]*?\bsrc\s*=\s*["\']([^"\']+)', file.read(), re.IGNORECASE):
+                target = resolve(page, unquote(src))
+                if target and target not in dimensions:
+                    path = os.path.join(project_root, target)
+                    dimensions[target] = safe_probe(path) if os.path.isfile(path) else None
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(process_file, f, str(project_root), dimensions) for f in html_files]
+        return [future.result() for future in futures]
+
+
+def main():
+    """Main function to annotate all HTML files"""
+    html_files = sorted(glob.glob('*.html'))
+
+    if not html_files:
+        print("No HTML files found in the current directory.")
+        return
+
+    print(f"Annotating <img> tags in {len(html_files)} HTML files...\n")
+    results = annotate_files(html_files, os.getcwd())
+
+    for result in results:
+        if result['error']:
+            print(f"✗ Error annotating {result['file']}: {result['error']}")
+        elif result['changed']:
+            print(f"✓ Annotated {result['changed']} images: {result['file']}")
+        else:
+            print(f"= Unchanged: {result['file']}")
+
+    changed_count = sum(1 for r in results if r['changed'])
+    print(f"\nCompleted! {changed_count}/{len(html_files)} files updated.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Asset Reference Graph for Church Website
+Streams every HTML page, stylesheet and JS bundle, extracts the assets they
+reference (src, href, srcset, CSS url() and bundle string literals) and
+resolves them against one in-memory set of existing files, reporting
+missing references and orphaned assets.
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import posixpath
+from pathlib import Path
+from html.parser import HTMLParser
+from urllib.parse import unquote
+
+from css_index import CSSIndex, tokenize
+
+# Directories that are never part of the deployed site
+SKIP_DIRS = {'.git', '.idea', '__pycache__', 'css_backups', 'dist', 'build', 'benchmarks', 'node_modules'}
+ASSET_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.avif', '.ico',
+                    '.css', '.js', '.json', '.xml', '.webapp', '.woff', '.woff2', '.ttf'}
+# Attributes that always hold a reference; others only count when they look like an asset path
+REF_ATTRIBUTES = {'src', 'href', 'poster', 'data-src'}
+SRCSET_ATTRIBUTES = {'srcset', 'data-srcset'}
+EXTERNAL_PATTERN = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//|#)', re.IGNORECASE)
+# Quoted relative paths only; absolute '/x.jpg' strings in bundles are URL fragments
+BUNDLE_STRING_PATTERN = re.compile(
+    rb'''["'`]([^"'`\s<>()/][^"'`\s<>()]*\.(?:jpg|jpeg|png|gif|webp|svg|avif|css|js|json|html))["'`]''', re.IGNORECASE)
+# Tool output that lives in the project root but is not part of the site
+IGNORED_FILES = {'image_organization_report.json', 'image_organization_report.jsonl', 'asset_graph.json'}
+READ_SIZE = 64 * 1024
+
+
+def scan_site_files(project_root):
+    """Return the set of every file in the site (relative posix paths) from one walk"""
+    project_root = str(project_root)
+    files = set()
+    stack = ['']
+    while stack:
+        relative_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(project_root, relative_dir)) as it:
+                for entry in it:
+                    relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS and not entry.name.startswith('.'):
+                            stack.append(relative_path)
+                    elif not entry.name.startswith('.') and relative_path not in IGNORED_FILES:
+                        files.add(relative_path)
+        except OSError:
+            continue
+    return files
+
+
+def is_asset_path(value):
+    """True for attribute values that look like a local asset path"""
+    return ' ' not in value and os.path.splitext(value.split('?', 1)[0].split('#', 1)[0])[1].lower() in ASSET_EXTENSIONS
+
+
+class _ReferenceParser(HTMLParser):
+    """Collects references from tags as the page is fed in chunks"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.refs = []
+        self.in_style = False
+
+    def handle_starttag(self, tag, attrs):
+        self.in_style = tag == 'style'
+        for name, value in attrs:
+            if not value:
+                continue
+            if name in REF_ATTRIBUTES:
+                self.refs.append((name, value))
+            elif name in SRCSET_ATTRIBUTES:
+                for candidate in value.split(','):
+                    candidate = candidate.strip().split(' ', 1)[0]
+                    if candidate:
+                        self.refs.append((name, candidate))
+            elif name == 'style':
+                self._css_refs(value, 'style')
+            elif is_asset_path(value):
+                self.refs.append((name, value))
+
+    def handle_endtag(self, tag):
+        if tag == 'style':
+            self.in_style = False
+
+    def handle_data(self, data):
+        if self.in_style:
+            self._css_refs(data, 'style')
+
+    def _css_refs(self, css, kind):
+        for ref in tokenize(css.encode('utf-8')):
+            self.refs.append((kind, ref['path']))
+
+
+def parse_html_refs(chunks):
+    """Every reference in an HTML document given as an iterable of text chunks"""
+    parser = _ReferenceParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return [target for _, target in parser.refs]
+
+
+def resolve(referrer, target):
+    """Resolve a reference from a file to a project-relative path, or None if external"""
+    target = target.strip()
+    if not target or EXTERNAL_PATTERN.match(target):
+        return None
+    target = unquote(target.split('#', 1)[0].split('?', 1)[0])
+    if not target:
+        return None
+    if target.startswith('/'):
+        resolved = posixpath.normpath(target.lstrip('/'))
+    else:
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(referrer), target))
+    return resolved
+
+
+class AssetGraph:
+    def __init__(self, project_root):
+        self.project_root = Path(project_root)
+        self.existing = set()
+        self.graph = {}
+        self.missing = []
+
+    def html_refs(self, relative_path):
+        """Stream one HTML page through the parser"""
+        with open(self.project_root / relative_path, 'r', encoding='utf-8', errors='replace') as f:
+            return parse_html_refs(iter(lambda: f.read(READ_SIZE), ''))
+
+    def bundle_refs(self, relative_path):
+        """Scan a JS bundle for quoted asset paths without loading it into memory"""
+        with open(self.project_root / relative_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return [m.group(1).decode('utf-8', 'replace') for m in BUNDLE_STRING_PATTERN.finditer(data)]
+
+    def build(self):
+        """Walk the site once and build the reference graph"""
+        self.existing = scan_site_files(self.project_root)
+        css_index = CSSIndex(self.project_root)
+
+        self.graph = {}
+        self.missing = []
+        for referrer in sorted(self.existing):
+            extension = os.path.splitext(referrer)[1].lower()
+            if extension == '.html':
+                targets = self.html_refs(referrer)
+            elif extension == '.css':
+                targets = [ref['path'] for ref in css_index.refs(self.project_root / referrer)]
+            elif extension == '.js':
+                targets = self.bundle_refs(referrer)
+            else:
+                continue
+
+            resolved = []
+            seen = set()
+            for target in targets:
+                path = resolve(referrer, target)
+                if path is None or path in seen:
+                    continue
+                seen.add(path)
+                resolved.append(path)
+                if path not in self.existing:
+                    self.missing.append({'referrer': referrer, 'target': path})
+            self.graph[referrer] = resolved
+
+        css_index.save()
+        return self.graph
+
+    def orphans(self):
+        """Assets no page, stylesheet or bundle references (HTML pages are entry points)"""
+        referenced = {path for targets in self.graph.values() for path in targets}
+        return sorted(
+            path for path in self.existing
+            if path not in referenced
+            and os.path.splitext(path)[1].lower() in ASSET_EXTENSIONS
+            and not path.endswith('.html')
+        )
+
+    def to_dict(self):
+        """Return the graph with missing and orphaned assets, ready for JSON"""
+        return {
+            'graph': self.graph,
+            'missing': self.missing,
+            'orphans': self.orphans()
+        }
+
+
+def main():
+    project_root = os.getcwd()
+
+    print("Church Website Asset Reference Graph")
+    print(f"Project root: {project_root}")
+
+    asset_graph = AssetGraph(project_root)
+    asset_graph.build()
+    result = asset_graph.to_dict()
+
+    print(f"\nScanned {len(result['graph'])} referrers, {len(asset_graph.existing)} files")
+
+    missing_targets = {}
+    for ref in result['missing']:
+        missing_targets.setdefault(ref['target'], []).append(ref['referrer'])
+    print(f"\nMISSING ({len(missing_targets)} targets, {len(result['missing'])} references):")
+    for target, referrers in sorted(missing_targets.items()):
+        print(f"  ❌ {target} (in {len(referrers)} files, e.g. {referrers[0]})")
+
+    print(f"\nORPHANED ({len(result['orphans'])} assets):")
+    for path in result['orphans']:
+        print(f"  • {path}")
+
+    output_file = Path(project_root) / 'asset_graph.json'
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nGraph saved to: {output_file}")
+
+    return 1 if result['missing'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
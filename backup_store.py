@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Backup Store for Church Website
+Content-addressed backups of the files the tools rewrite (stylesheets,
+prettified pages). Each distinct file version is stored once, compressed,
+under objects/ by its hash; each backup run only writes a small snapshot
+manifest listing which version every file had. Any snapshot can be
+restored, and gc drops old snapshots and the versions nothing refers to.
+
+Usage: python backup_store.py list
+       python backup_store.py restore SNAPSHOT [file ...]
+       python backup_store.py gc [keep]
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # gzip is used instead
+    zstandard = None
+
+STORE_DIRNAME = 'css_backups'
+STORE_VERSION = 1
+DEFAULT_KEEP = 20
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def compress(data):
+    """Returns (suffix, compressed bytes) with the best available codec"""
+    if zstandard is not None:
+        return '.zst', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return '.gz', gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def decompress(suffix, data):
+    if suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError("this backup was compressed with zstd; install zstandard to restore it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class BackupStore:
+    def __init__(self, project_root, store_dir=None):
+        self.project_root = Path(os.path.abspath(project_root))
+        self.store_dir = Path(store_dir) if store_dir else self.project_root / STORE_DIRNAME
+        self.objects_dir = self.store_dir / 'objects'
+        self.snapshots_dir = self.store_dir / 'snapshots'
+
+    def object_path(self, digest):
+        """Stored path of a version, whichever codec wrote it, or None"""
+        for suffix in ('.zst', '.gz'):
+            path = self.objects_dir / digest[:2] / (digest + suffix)
+            if path.exists():
+                return path
+        return None
+
+    def put(self, data):
+        """Store one version (once); returns its hash and whether it was new"""
+        digest = content_hash(data)
+        if self.object_path(digest):
+            return digest, False
+        suffix, packed = compress(data)
+        path = self.objects_dir / digest[:2] / (digest + suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_bytes(packed)
+        os.replace(tmp_path, path)
+        return digest, True
+
+    def get(self, digest):
+        path = self.object_path(digest)
+        if path is None:
+            raise FileNotFoundError(f"backup object {digest} is missing")
+        return decompress(path.suffix, path.read_bytes())
+
+    def relative(self, file_path):
+        """Project-relative path of a file, whether or not either side went through a symlink"""
+        try:
+            return Path(os.path.abspath(file_path)).relative_to(self.project_root).as_posix()
+        except ValueError:
+            return Path(file_path).resolve().relative_to(self.project_root.resolve()).as_posix()
+
+    def snapshots(self):
+        """Snapshot manifests, oldest first"""
+        if not self.snapshots_dir.exists():
+            return []
+        result = []
+        for path in sorted(self.snapshots_dir.glob('*.json')):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            manifest['id'] = path.stem
+            result.append(manifest)
+        return result
+
+    def load(self, snapshot_id):
+        with open(self.snapshots_dir / f"{snapshot_id}.json", 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest['id'] = snapshot_id
+        return manifest
+
+    def latest(self, label=None):
+        matching = [s for s in self.snapshots() if label is None or s.get('label') == label]
+        return matching[-1] if matching else None
+
+    def snapshot(self, file_paths, label='backup'):
+        """Back up files; returns (snapshot id, stats)
+
+        Files whose size and mtime match the previous snapshot with the same
+        label are not read again. If nothing differs from that snapshot, no
+        new one is written and its id is returned.
+        """
+        previous = self.latest(label)
+        previous_files = previous['files'] if previous else {}
+        files = {}
+        stats = {'files': 0, 'new_objects': 0, 'stored_bytes': 0}
+        for file_path in file_paths:
+            relative_path = self.relative(file_path)
+            st = os.stat(file_path)
+            entry = previous_files.get(relative_path)
+            if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size \
+                    and self.object_path(entry['hash']):
+                files[relative_path] = entry
+            else:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+                digest, new = self.put(data)
+                if new:
+                    stats['new_objects'] += 1
+                    stats['stored_bytes'] += self.object_path(digest).stat().st_size
+                files[relative_path] = {'hash': digest, 'size': st.st_size, 'mtime': st.st_mtime_ns,
+                                        'mode': st.st_mode & 0o7777}
+            stats['files'] += 1
+
+        unchanged = previous and {p: e['hash'] for p, e in files.items()} == \
+            {p: e['hash'] for p, e in previous_files.items()}
+        if unchanged:
+            if files != previous_files:
+                # Same content, new stat keys: refresh them so the next run skips reading
+                self._write_manifest(previous['id'], previous['created'], label, files)
+            return previous['id'], stats
+
+        created = datetime.now()
+        snapshot_id = f"{created.strftime('%Y%m%d_%H%M%S_%f')}_{label}"
+        self._write_manifest(snapshot_id, created.isoformat(), label, files)
+        return snapshot_id, stats
+
+    def _write_manifest(self, snapshot_id, created, label, files):
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        path = self.snapshots_dir / f"{snapshot_id}.json"
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STORE_VERSION, 'created': created, 'label': label, 'files': files},
+                      f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def restore(self, snapshot_id, paths=None, dry_run=False):
+        """Put files back as they were in a snapshot; returns the paths that changed
+
+        Files already identical to the snapshot are left alone.
+        """
+        manifest = self.load(snapshot_id)
+        wanted = {self.relative(self.project_root / p) for p in paths} if paths else None
+        restored = []
+        for relative_path, entry in sorted(manifest['files'].items()):
+            if wanted is not None and relative_path not in wanted:
+                continue
+            target = self.project_root / relative_path
+            try:
+                st = target.stat()
+                if st.st_size == entry['size'] and content_hash(target.read_bytes()) == entry['hash']:
+                    continue
+            except OSError:
+                pass
+            restored.append(relative_path)
+            if dry_run:
+                continue
+            data = self.get(entry['hash'])
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(target.name + '.restore.tmp')
+            tmp_path.write_bytes(data)
+            os.chmod(tmp_path, entry.get('mode', 0o644))
+            os.replace(tmp_path, target)
+        return restored
+
+    def gc(self, keep=DEFAULT_KEEP, dry_run=False):
+        """Keep the newest `keep` snapshots per label, then drop unreferenced objects"""
+        snapshots = self.snapshots()
+        by_label = {}
+        for manifest in snapshots:
+            by_label.setdefault(manifest.get('label'), []).append(manifest)
+        doomed = [m for group in by_label.values() for m in group[:max(len(group) - keep, 0)]]
+        doomed_ids = {m['id'] for m in doomed}
+        kept = [m for m in snapshots if m['id'] not in doomed_ids]
+
+        referenced = {entry['hash'] for m in kept for entry in m['files'].values()}
+        stats = {'snapshots_removed': len(doomed), 'objects_removed': 0, 'bytes_freed': 0}
+        if not dry_run:
+            for manifest in doomed:
+                (self.snapshots_dir / f"{manifest['id']}.json").unlink(missing_ok=True)
+        if self.objects_dir.exists():
+            for path in self.objects_dir.glob('*/*'):
+                digest = path.name.split('.', 1)[0]
+                if digest not in referenced:
+                    stats['objects_removed'] += 1
+                    stats['bytes_freed'] += path.stat().st_size
+                    if not dry_run:
+                        path.unlink()
+        return stats
+
+
+def main():
+    project_root = os.getcwd()
+    store = BackupStore(project_root)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+
+    print("Church Website Backup Store")
+    print(f"Store: {store.store_dir} ({'zstd' if zstandard else 'gzip'})")
+
+    if command == 'list':
+        for manifest in store.snapshots():
+            size = sum(entry['size'] for entry in manifest['files'].values())
+            print(f"  {manifest['id']}  {len(manifest['files'])} files, {size:,} bytes")
+        return 0
+    if command == 'restore' and len(sys.argv) > 2:
+        started = time.perf_counter()
+        restored = store.restore(sys.argv[2], sys.argv[3:] or None)
+        for path in restored:
+            print(f"  ✅ Restored {path}")
+        print(f"\nRestored {len(restored)} files in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return 0
+    if command == 'gc':
+        stats = store.gc(keep=int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_KEEP)
+        print(f"Removed {stats['snapshots_removed']} snapshots and {stats['objects_removed']} objects "
+              f"({stats['bytes_freed']:,} bytes)")
+        return 0
+    print(__doc__.strip().split('\n\n')[-1])
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
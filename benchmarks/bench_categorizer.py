@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Categorizer Micro-benchmark
+Compares the compiled CategoryMatcher against the original nested
+category/pattern loops on a synthetic tree of image paths.
+
+Usage: python benchmarks/bench_categorizer.py [file_count]
+"""
+
+import sys
+import random
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from image_categories import CategoryMatcher, build_categories, FALLBACK_CATEGORY
+
+WORDS = ['hero', 'slide', 'banner', 'logo', 'favicon', 'ministry', 'sermon', 'gallery',
+         'staff', 'event', 'button', 'payment', 'photo', 'post', 'user', 'img', 'church',
+         'youth', 'worship', 'easter', 'summer', 'team']
+DIRS = ['carousel', 'backgrounds', 'logos', 'favicons', 'content', 'content/sermons',
+        'content/ministries', 'uncategorized', 'ui', 'payments', '2024/uploads']
+EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp', '.svg', '.gif']
+
+
+def synthetic_paths(count, seed=42):
+    """Generate reproducible relative image paths"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        name = '-'.join(rng.sample(WORDS, rng.randint(1, 3)))
+        suffix = rng.choice(['', '@1.5x', '@2x'])
+        paths.append(f"{rng.choice(DIRS)}/{name}-{i}{suffix}{rng.choice(EXTENSIONS)}")
+    return paths
+
+
+def legacy_match(categories, relative_path):
+    """The original scan_images loop, kept here as the baseline"""
+    file_lower = relative_path.rsplit('/', 1)[-1].lower()
+    for category, info in categories.items():
+        if category == FALLBACK_CATEGORY:
+            continue
+        for pattern in info['patterns']:
+            if pattern in file_lower or pattern in str(relative_path).lower():
+                return category
+    return FALLBACK_CATEGORY
+
+
+def best_of(func, repeat=3):
+    """Return the best wall time of several runs and the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    paths = synthetic_paths(count)
+    categories = build_categories()
+
+    build_time, matcher = best_of(lambda: CategoryMatcher(categories))
+    legacy_time, legacy = best_of(lambda: [legacy_match(categories, p) for p in paths])
+    compiled_time, compiled = best_of(lambda: [matcher.match(p) for p in paths])
+
+    mismatches = sum(1 for a, b in zip(legacy, compiled) if a != b)
+
+    print(f"Categorizer benchmark ({count:,} synthetic paths)")
+    print("-" * 40)
+    print(f"  Nested loops:     {legacy_time * 1000:8.1f} ms")
+    print(f"  CategoryMatcher:  {compiled_time * 1000:8.1f} ms (+{build_time * 1000:.2f} ms compile)")
+    print(f"  Speedup:          {legacy_time / compiled_time:8.2f}x")
+    print(f"  Mismatches:       {mismatches}")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Static Server Load Test
+Starts serve_site.StaticServer on a free port and drives it with many
+concurrent keep-alive connections, each requesting the site's pages and
+assets in turn. Reports throughput and latency percentiles.
+
+Usage: python benchmarks/bench_serve.py [--connections 200] [--seconds 5] [--dist] [--gzip]
+       python benchmarks/bench_serve.py --url http://127.0.0.1:8000 (an already running server)
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from serve_site import StaticServer
+from asset_graph import scan_site_files
+from build_dist import DIST_DIRNAME
+
+
+async def fetch(reader, writer, host, path, accept_encoding):
+    """Send one keep-alive GET and read the full response; returns the body size"""
+    request = f"GET /{path} HTTP/1.1\r\nHost: {host}\r\n"
+    if accept_encoding:
+        request += f"Accept-Encoding: {accept_encoding}\r\n"
+    writer.write((request + "\r\n").encode('latin-1'))
+    await writer.drain()
+
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n')[1:]:
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':', 1)[1])
+    if length:
+        await reader.readexactly(length)
+    return status, length
+
+
+async def client(host, port, paths, offset, deadline, accept_encoding, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies, transferred, errors = [], 0, 0
+    index = offset
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            status, length = await fetch(reader, writer, host, path, accept_encoding)
+            latencies.append(time.perf_counter() - started)
+            transferred += length
+            if status >= 400:
+                errors += 1
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+    results.append((latencies, transferred, errors))
+
+
+async def run(args):
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+        site_dir = ROOT / DIST_DIRNAME if args.dist else ROOT
+    else:
+        site_dir = ROOT / DIST_DIRNAME if args.dist else ROOT
+        server = StaticServer(site_dir, port=0)
+        await server.start()
+        host, port = server.host, server.port
+
+    paths = sorted(path for path in scan_site_files(site_dir) if not path.endswith(('.gz', '.br')))
+    accept_encoding = 'br, gzip' if args.gzip else None
+    print(f"Serving {len(paths)} files from {site_dir} with {args.connections} connections "
+          f"for {args.seconds}s{' (compressed)' if args.gzip else ''}")
+
+    results = []
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    await asyncio.gather(*(
+        client(host, port, paths, i, deadline, accept_encoding, results) for i in range(args.connections)
+    ))
+    elapsed = time.perf_counter() - started
+
+    if server is not None:
+        await server.close()
+
+    latencies = sorted(value for latency_list, _, _ in results for value in latency_list)
+    transferred = sum(t for _, t, _ in results)
+    errors = sum(e for _, _, e in results)
+    if not latencies:
+        print("No requests completed")
+        return 1
+
+    def percentile(fraction):
+        return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+
+    print(f"\n{len(latencies)} requests in {elapsed:.2f}s: {len(latencies) / elapsed:,.0f} req/s, "
+          f"{transferred / elapsed / 1024 / 1024:.1f} MB/s, {errors} error responses")
+    print(f"latency p50 {percentile(0.5):.2f} ms, p90 {percentile(0.9):.2f} ms, p99 {percentile(0.99):.2f} ms")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the local static server")
+    parser.add_argument('--connections', '-c', type=int, default=200)
+    parser.add_argument('--seconds', '-s', type=float, default=5.0)
+    parser.add_argument('--dist', action='store_true', help=f"serve {DIST_DIRNAME}/ instead of the sources")
+    parser.add_argument('--gzip', action='store_true', help="send Accept-Encoding: br, gzip")
+    parser.add_argument('--url', help="test an already running server instead of starting one")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
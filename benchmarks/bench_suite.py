@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Asset Tooling Benchmark Suite
+Generates a synthetic site (N images, M pages, a main.css with K url()
+references) in a temporary directory and times each stage of the tooling
+on it: scan_images, update_image_paths, check_css_references,
+verify_image_paths and prettify_files. Every stage runs cold (no caches) and,
+where it has one, warm (cache present), with 1 and N workers where it can
+use them. Wall time (untraced) and peak memory (a separate traced run, plus
+the peak RSS of any pool workers) are written as JSON so runs on different
+commits can be compared with --compare.
+
+Usage: python benchmarks/bench_suite.py [--images 2000] [--pages 50] [--css-refs 2000] [--jobs N]
+       python benchmarks/bench_suite.py --compare benchmarks/results/OLD.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+from pathlib import Path
+from contextlib import redirect_stdout
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from organize_images import ImageOrganizer
+from update_css_paths import CSSPathUpdater
+from css_index import CACHE_FILENAME as CSS_CACHE_FILENAME
+from image_index import ImageIndex
+from prettify_html import prettify_files, CACHE_FILENAME as PRETTIFY_CACHE_FILENAME
+from synthetic_site import generate_site, write_pages
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+# A stage counts as a regression in --compare when it gets this much slower
+REGRESSION_THRESHOLD = 1.10
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def peak_memory(func):
+    """Peak traced memory of one run of func, and the peak RSS of its worker processes
+
+    The run happens in a forked child so RUSAGE_CHILDREN covers only the
+    pool workers this stage started, not those of earlier stages. Anything
+    the run writes to disk is kept; its in-memory side effects are not.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        try:
+            tracemalloc.start()
+            with redirect_stdout(io.StringIO()):
+                func()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            # ru_maxrss is in kilobytes on Linux, bytes on macOS
+            workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            workers *= 1 if sys.platform == 'darwin' else 1024
+            os.write(write_fd, json.dumps([peak, workers]).encode('utf-8'))
+        except BaseException:
+            status = 1
+        finally:
+            os._exit(status)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as pipe:
+        data = pipe.read()
+    _, status = os.waitpid(pid, 0)
+    if status or not data:
+        raise RuntimeError("memory measurement run failed")
+    return tuple(json.loads(data))
+
+
+def measure(func, repeat=1, setup=None):
+    """Best wall time of repeat runs, then peak memory from one more run
+
+    setup() runs before each repetition, outside the timed region, to put the
+    tree back into the state the stage expects (e.g. drop a cache). Timed runs
+    are not traced, since tracemalloc slows allocation-heavy stages by several
+    times; memory comes from a separate run (see peak_memory). Tool output is
+    discarded.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            func()
+        best = min(best, time.perf_counter() - start)
+    if setup:
+        setup()
+    peak, workers_peak = peak_memory(func)
+    return best, peak, workers_peak
+
+
+class BenchmarkSuite:
+    def __init__(self, site_dir, image_paths, pages, jobs, repeat, seed=42):
+        self.site_dir = Path(site_dir)
+        self.image_paths = image_paths
+        self.pages = pages
+        self.jobs = jobs
+        self.repeat = repeat
+        self.seed = seed
+        self.results = []
+
+    def record(self, stage, mode, jobs, func, setup=None):
+        seconds, peak, workers_peak = measure(func, self.repeat, setup)
+        self.results.append({'stage': stage, 'mode': mode, 'jobs': jobs,
+                             'seconds': round(seconds, 6), 'peak_kb': peak // 1024,
+                             'workers_peak_kb': workers_peak // 1024})
+        workers = f" {workers_peak / 1024:10.0f} KB/worker" if workers_peak else ''
+        print(f"  {stage:<22} {mode:<12} jobs={jobs:<3} {seconds * 1000:10.1f} ms {peak / 1024:10.0f} KB{workers}")
+
+    def drop_image_index(self):
+        ImageIndex(self.site_dir / 'images').index_file.unlink(missing_ok=True)
+
+    def drop_css_index(self):
+        (self.site_dir / CSS_CACHE_FILENAME).unlink(missing_ok=True)
+
+    def reset_pages(self):
+        """Fresh, unprettified pages and no prettify cache"""
+        write_pages(self.site_dir, self.image_paths, self.pages, self.seed)
+        (self.site_dir / PRETTIFY_CACHE_FILENAME).unlink(missing_ok=True)
+
+    def run(self):
+        organizer = ImageOrganizer(self.site_dir)
+        for jobs in sorted({1, self.jobs}):
+            self.record('scan_images', 'full', jobs, lambda: organizer.scan_images(jobs=jobs))
+            self.record('scan_images', 'cold', jobs, lambda: organizer.scan_images(incremental=True, jobs=jobs),
+                        setup=self.drop_image_index)
+        self.record('scan_images', 'warm', self.jobs,
+                    lambda: organizer.scan_images(incremental=True, jobs=self.jobs))
+
+        self.record('update_image_paths', 'dry-run', 1,
+                    lambda: CSSPathUpdater(self.site_dir).update_image_paths(dry_run=True))
+
+        self.record('check_css_references', 'cold', 1, organizer.check_css_references,
+                    setup=self.drop_css_index)
+        self.record('check_css_references', 'warm', 1, organizer.check_css_references)
+        self.record('verify_image_paths', 'cold', 1,
+                    lambda: CSSPathUpdater(self.site_dir).verify_image_paths(), setup=self.drop_css_index)
+        self.record('verify_image_paths', 'warm', 1,
+                    lambda: CSSPathUpdater(self.site_dir).verify_image_paths())
+
+        html_files = [str(self.site_dir / f"page-{i}.html") for i in range(self.pages)]
+        cache_file = self.site_dir / PRETTIFY_CACHE_FILENAME
+        for jobs in sorted({1, self.jobs}):
+            self.record('prettify_files', 'cold', jobs,
+                        lambda: prettify_files(html_files, jobs=jobs, cache_file=cache_file),
+                        setup=self.reset_pages)
+        self.record('prettify_files', 'warm', self.jobs,
+                    lambda: prettify_files(html_files, jobs=self.jobs, cache_file=cache_file))
+        return self.results
+
+
+def result_key(result):
+    return (result['stage'], result['mode'], result['jobs'])
+
+
+def compare(old_file, new_results):
+    """Print per-stage time ratios against an earlier results file; returns the regression count"""
+    with open(old_file, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    previous = {result_key(r): r for r in old['results']}
+    print(f"\nCompared with {old.get('commit', '?')} ({old_file}):")
+    regressions = 0
+    for result in new_results:
+        before = previous.get(result_key(result))
+        if not before or not before['seconds']:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        flag = ''
+        if ratio > REGRESSION_THRESHOLD:
+            flag = '  ⚠️  slower'
+            regressions += 1
+        print(f"  {result['stage']:<22} {result['mode']:<12} jobs={result['jobs']:<3} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the asset tooling on a synthetic site")
+    parser.add_argument('--images', type=int, default=2000)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--css-refs', type=int, default=2000)
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', '-o', help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="an earlier results file to compare against")
+    parser.add_argument('--keep', action='store_true', help="keep the generated site")
+    args = parser.parse_args()
+
+    site_dir = Path(tempfile.mkdtemp(prefix='churchsite-bench-'))
+    try:
+        started = time.perf_counter()
+        image_paths = generate_site(site_dir, args.images, args.pages, args.css_refs, args.seed)
+        print(f"Benchmark suite: {args.images:,} images, {args.pages} pages, {args.css_refs:,} url() refs "
+              f"(generated in {time.perf_counter() - started:.1f}s)")
+        print("-" * 72)
+        results = BenchmarkSuite(site_dir, image_paths, args.pages, args.jobs, args.repeat, args.seed).run()
+    finally:
+        if args.keep:
+            print(f"\nSite kept at {site_dir}")
+        else:
+            shutil.rmtree(site_dir, ignore_errors=True)
+
+    commit = git_commit()
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'params': {'images': args.images, 'pages': args.pages, 'css_refs': args.css_refs,
+                       'jobs': args.jobs, 'repeat': args.repeat, 'seed': args.seed},
+            'results': results,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        return 1 if compare(args.compare, results) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Synthetic Site Generator
+Writes a reproducible fake church site for benchmarking: N images spread
+over the category directories (with real PNG/JPEG/GIF/SVG headers so they
+can be probed), M HTML pages with <img> tags, and a main.css with K url()
+references in the old, pre-organization layout.
+
+Usage: python benchmarks/synthetic_site.py OUTPUT_DIR [images] [pages] [css_refs]
+"""
+
+import os
+import sys
+import random
+import struct
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_categorizer import synthetic_paths
+
+PAGE_IMAGES = 40
+DUPLICATE_RATE = 0.05
+# Fraction of CSS references that point at files that do not exist
+MISSING_RATE = 0.02
+
+
+def png_bytes(width, height, payload):
+    """A PNG signature and IHDR followed by filler bytes"""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    chunk = struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+    return b'\x89PNG\r\n\x1a\n' + chunk + payload
+
+
+def jpeg_bytes(width, height, payload):
+    """SOI, an APP0 segment and a baseline SOF0 followed by filler bytes"""
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 17, 8, height, width, 3) + b'\x01\x22\x00\x02\x11\x01\x03\x11\x01'
+    return b'\xff\xd8' + app0 + sof0 + payload
+
+
+def gif_bytes(width, height, payload):
+    return b'GIF89a' + struct.pack('<HH', width, height) + payload
+
+
+def svg_bytes(width, height, payload):
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}">'
+            f'<!-- {payload.hex()} --></svg>').encode('utf-8')
+
+
+ENCODERS = {'.png': png_bytes, '.jpg': jpeg_bytes, '.jpeg': jpeg_bytes, '.gif': gif_bytes,
+            '.svg': svg_bytes, '.webp': jpeg_bytes}
+
+
+def write_images(root, count, seed=42):
+    """Write count images under root/images; returns their relative paths"""
+    rng = random.Random(seed)
+    images_dir = Path(root) / 'images'
+    paths = synthetic_paths(count, seed)
+    previous = None
+    for relative_path in paths:
+        extension = os.path.splitext(relative_path)[1]
+        if extension == '.webp':
+            # A WebP header is not worth faking; store these as JPEG data
+            extension = '.jpg'
+        if previous is not None and rng.random() < DUPLICATE_RATE:
+            data = previous
+        else:
+            width, height = rng.choice([(64, 64), (820, 618), (1920, 900), (4000, 3000)])
+            data = ENCODERS[extension](width, height, rng.randbytes(rng.randint(2_000, 60_000)))
+        file_path = images_dir / relative_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(data)
+        previous = data
+    return paths
+
+
+def write_css(root, image_paths, ref_count, seed=42):
+    """main.css with ref_count url() rules, using the old flat/backgrounds layout"""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(ref_count):
+        if rng.random() < MISSING_RATE:
+            target = f"images/missing-{i}.png"
+        else:
+            relative_path = rng.choice(image_paths)
+            # Old layouts that PATH_MAPPINGS knows how to rewrite
+            if relative_path.startswith('carousel/'):
+                target = 'images/backgrounds/' + relative_path.split('/', 1)[1]
+            else:
+                target = 'images/' + relative_path
+        rules.append(f".rule-{i}{{background-image:url('{target}');background-size:cover}}")
+    (Path(root) / 'main.css').write_text('\n'.join(rules) + '\n', encoding='utf-8')
+
+
+def write_pages(root, image_paths, page_count, seed=42):
+    """page_count HTML pages, each with a handful of sections and <img> tags"""
+    rng = random.Random(seed)
+    for i in range(page_count):
+        sections = []
+        for j in range(PAGE_IMAGES):
+            src = 'images/' + rng.choice(image_paths)
+            sections.append(
+                f'<section class="section"><div class="container"><div class="card">'
+                f'<img alt="Image {j}" class="card__image" src="{src}"/><p>Text {j}</p>'
+                f'</div></div></section>')
+        page = ('<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"/>'
+                f'<title>Page {i}</title><link href="./main.css" rel="stylesheet"/></head>'
+                '<body><nav class="navbar"></nav><main>' + ''.join(sections) + '</main></body></html>')
+        (Path(root) / f"page-{i}.html").write_text(page, encoding='utf-8')
+
+
+def generate_site(root, images=2000, pages=50, css_refs=2000, seed=42):
+    """Write a complete synthetic site; returns the image paths relative to images/"""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    image_paths = write_images(root, images, seed)
+    write_css(root, image_paths, css_refs, seed)
+    write_pages(root, image_paths, pages, seed)
+    return image_paths
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1])
+        return 2
+    counts = [int(value) for value in sys.argv[2:5]]
+    generate_site(sys.argv[1], *counts)
+    print(f"Synthetic site written to {sys.argv[1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Responsive Image Derivative Builder for Church Website
+Generates resized WebP (and AVIF, when an encoder is available) copies of
+each source image and writes a manifest (source -> derivatives with width,
+format and size) for the HTML/CSS rewriters. Derivatives whose source was
+deleted or renamed are pruned.
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from image_index import ImageIndex
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional until this stage is actually run
+    Image = None
+    ImageOps = None
+    features = None
+
+DERIVED_DIRNAME = 'derived'
+MANIFEST_NAME = 'manifest.json'
+SOURCE_DIRS = ('carousel', 'backgrounds', 'content')
+SOURCE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+TARGET_WIDTHS = (480, 960, 1440, 1920)
+QUALITY = {'webp': 80, 'avif': 55}
+
+
+def available_formats():
+    """Return the derivative formats that can be encoded on this machine"""
+    if Image is None:
+        return []
+    formats = ['webp'] if features.check('webp') else []
+    if features.check('avif') or shutil.which('avifenc'):
+        formats.append('avif')
+    return formats
+
+
+def derivative_name(source, width, fmt):
+    """Return the derived path (relative to images/derived) for one output"""
+    # The whole source name, extension included, is the stem: hero.jpg and
+    # hero.png in one directory (or hero@2x.jpg) must never share an output
+    return f"{source}-{width}w.{fmt}"
+
+
+def _save_avif(image, output_path):
+    """Encode AVIF with Pillow if it supports it, else through avifenc"""
+    if features.check('avif'):
+        image.save(output_path, 'AVIF', quality=QUALITY['avif'])
+        return
+
+    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
+        tmp_png = tmp.name
+    try:
+        image.save(tmp_png, 'PNG')
+        subprocess.run(['avifenc', '--jobs', '1', '-q', str(QUALITY['avif']), tmp_png, str(output_path)],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.unlink(tmp_png)
+
+
+def encode_source(task):
+    """Resize and encode one source image; runs inside a worker process"""
+    source_path, output_dir, source, formats = task
+    outputs = []
+
+    with Image.open(source_path) as original:
+        original.load()
+        # WebP/AVIF output drops the EXIF orientation tag, so apply it to the pixels
+        original = ImageOps.exif_transpose(original)
+        width, height = original.size
+        image = original.convert('RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    # Never upscale: the largest derivative is the source width itself
+    widths = sorted({w for w in TARGET_WIDTHS if w < width} | {width})
+    for target_width in widths:
+        target_height = max(1, round(height * target_width / width))
+        resized = image if target_width == width else image.resize((target_width, target_height), Image.LANCZOS)
+
+        for fmt in formats:
+            relative = derivative_name(source, target_width, fmt)
+            output_path = Path(output_dir) / relative
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            if fmt == 'avif':
+                _save_avif(resized, output_path)
+            else:
+                resized.save(output_path, 'WEBP', quality=QUALITY['webp'], method=4)
+            outputs.append({
+                'path': f"images/{DERIVED_DIRNAME}/{relative}",
+                'width': target_width,
+                'height': target_height,
+                'format': fmt,
+                'bytes': output_path.stat().st_size
+            })
+
+    return {'width': width, 'height': height, 'derivatives': outputs}
+
+
+class DerivativeBuilder:
+    def __init__(self, project_root, jobs=None):
+        self.project_root = Path(project_root)
+        self.images_dir = self.project_root / 'images'
+        self.output_dir = self.images_dir / DERIVED_DIRNAME
+        self.manifest_file = self.output_dir / MANIFEST_NAME
+        self.jobs = jobs
+        self.manifest = {}
+        self.issues = []
+        self.pending = []
+        self.encoded = 0
+        self.pruned = 0
+
+    def load_manifest(self):
+        """Load the previous manifest so up-to-date sources can be skipped"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f).get('images', {})
+        except (OSError, ValueError):
+            self.manifest = {}
+        return self.manifest
+
+    def save_manifest(self, formats):
+        """Write the manifest atomically"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.manifest_file.with_name(MANIFEST_NAME + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'formats': formats, 'widths': list(TARGET_WIDTHS), 'images': self.manifest}, f, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    def is_up_to_date(self, source, record, formats):
+        """A source is current when its hash matches and every output exists"""
+        entry = self.manifest.get(source)
+        if not entry or entry.get('hash') != record['hash']:
+            return False
+        if sorted({d['format'] for d in entry['derivatives']}) != sorted(formats):
+            return False
+        # Outputs written under an older naming scheme are rebuilt
+        if any(d['path'] != f"images/{DERIVED_DIRNAME}/{derivative_name(source, d['width'], d['format'])}"
+               for d in entry['derivatives']):
+            return False
+        return all((self.project_root / d['path']).exists() for d in entry['derivatives'])
+
+    def prune(self, paths, dry_run=False):
+        """Delete derived files (project-relative paths) and any directories they leave empty"""
+        for path in sorted(paths):
+            file_path = self.project_root / path
+            if dry_run:
+                print(f"  Would remove {path}")
+                continue
+            try:
+                file_path.unlink(missing_ok=True)
+                parent = file_path.parent
+                while parent != self.output_dir and not any(parent.iterdir()):
+                    parent.rmdir()
+                    parent = parent.parent
+            except OSError as e:
+                error_msg = f"Error removing {path}: {e}"
+                print(f"  ❌ {error_msg}")
+                self.issues.append(error_msg)
+        self.pruned = len(paths)
+
+    def build(self, dry_run=False):
+        """Encode every out-of-date source across a process pool, then prune stale outputs"""
+        formats = available_formats()
+        if not formats:
+            print("Pillow with WebP support is required to build derivatives (pip install Pillow).")
+            return None
+
+        print(f"Building responsive derivatives ({', '.join(formats)})...")
+        self.load_manifest()
+
+        index = ImageIndex(self.images_dir, jobs=self.jobs)
+        entries = index.refresh()
+        index.save()
+
+        sources = {
+            path: record for path, record in entries.items()
+            if path.split('/', 1)[0] in SOURCE_DIRS and Path(path).suffix.lower() in SOURCE_EXTENSIONS
+        }
+
+        pending = [path for path, record in sources.items() if not self.is_up_to_date(path, record, formats)]
+        skipped = len(sources) - len(pending)
+
+        self.pending = pending
+        previous = {d['path'] for entry in self.manifest.values() for d in entry['derivatives']}
+        # Drop manifest entries for sources that no longer exist
+        for source in set(self.manifest) - set(sources):
+            del self.manifest[source]
+
+        if dry_run:
+            for source in sorted(pending):
+                print(f"  Would encode {source}")
+            # Outputs a re-encode would drop are only known after encoding
+            kept = {d['path'] for entry in self.manifest.values() for d in entry['derivatives']}
+            self.prune(previous - kept, dry_run=True)
+            return self.manifest
+
+        encoded = 0
+        if pending:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                futures = {
+                    pool.submit(encode_source, (str(self.images_dir / path), str(self.output_dir), path, formats)): path
+                    for path in pending
+                }
+                for future in as_completed(futures):
+                    source = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        error_msg = f"Error encoding {source}: {e}"
+                        print(f"  ❌ {error_msg}")
+                        self.issues.append(error_msg)
+                        continue
+                    result['hash'] = sources[source]['hash']
+                    result['source_bytes'] = sources[source]['size']
+                    self.manifest[source] = result
+                    encoded += 1
+                    print(f"  ✅ {source} -> {len(result['derivatives'])} derivatives")
+
+        # Outputs no manifest entry points at any more: deleted or renamed sources,
+        # widths a shrunken source no longer has, the old naming scheme
+        current = {d['path'] for entry in self.manifest.values() for d in entry['derivatives']}
+        self.prune(previous - current)
+
+        self.encoded = encoded
+        self.save_manifest(formats)
+        print(f"\nEncoded {encoded} sources, {skipped} up to date, removed {self.pruned} stale derivatives")
+        return self.manifest
+
+
+def main():
+    project_root = os.getcwd()
+
+    print("Church Website Image Derivative Builder")
+    print(f"Project root: {project_root}")
+
+    builder = DerivativeBuilder(project_root)
+    manifest = builder.build()
+    if manifest is None:
+        return 1
+
+    source_bytes = sum(entry['source_bytes'] for entry in manifest.values())
+    webp_bytes = sum(max((d['bytes'] for d in entry['derivatives'] if d['format'] == 'webp'), default=0)
+                     for entry in manifest.values())
+    print(f"Largest WebP derivatives: {webp_bytes / 1024:.1f} KB vs {source_bytes / 1024:.1f} KB of sources")
+    return 1 if builder.issues else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
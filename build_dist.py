@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Production Build Script for Church Website
+Writes a deployable dist/ tree with minified HTML and CSS plus precompressed
+.gz/.br siblings, leaving the authoring files untouched. Inputs whose
+content hash matches the build manifest are skipped.
+"""
+
+import os
+import re
+import sys
+import json
+import gzip
+import shutil
+import hashlib
+from pathlib import Path
+
+from asset_graph import scan_site_files, ASSET_EXTENSIONS
+
+try:
+    import brotli
+except ImportError:  # .br output is skipped when brotli is not installed
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:  # bundles are copied as-is without a JS minifier
+    rjsmin = None
+
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = '.build-manifest.json'
+# Bump when the minifiers change so every output is rebuilt once
+BUILD_VERSION = 2
+COMPRESSIBLE_EXTENSIONS = {'.html', '.css', '.js', '.svg', '.json', '.xml', '.webapp', '.ico'}
+MIN_COMPRESS_SIZE = 1024
+
+# Elements whose contents must keep their whitespace exactly
+PROTECTED_PATTERN = re.compile(r'(<(pre|textarea|script|style)\b[^>]*>.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+# Of those, the ones that never render, so whitespace around them can go
+INVISIBLE_TAGS = {'script', 'style'}
+# Comments, except IE conditional comments
+HTML_COMMENT_PATTERN = re.compile(r'<!--(?!\[if|<!\[endif).*?-->', re.DOTALL)
+# Whitespace next to block-level tags never renders, so it can go entirely
+BLOCK_TAGS = ('html|head|body|title|meta|link|script|style|div|section|header|footer|nav|main|'
+              'article|aside|p|ul|ol|li|dl|dt|dd|h[1-6]|table|thead|tbody|tfoot|tr|td|th|form|'
+              'fieldset|legend|figure|figcaption|hr|br|option|select|!doctype')
+BLOCK_TAG_PATTERN = re.compile(r'\s*(</?(?:' + BLOCK_TAGS + r')\b[^>]*>)\s*', re.IGNORECASE)
+CSS_TOKEN_PATTERN = re.compile(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|/\*!.*?\*/)|/\*.*?\*/''', re.DOTALL)
+
+
+def minify_css(css):
+    """Strip comments and redundant whitespace, leaving strings untouched"""
+    parts = []
+    pos = 0
+    for match in CSS_TOKEN_PATTERN.finditer(css):
+        parts.append(_squeeze_css(css[pos:match.start()]))
+        if match.group(1):
+            parts.append(match.group(1))
+        pos = match.end()
+    parts.append(_squeeze_css(css[pos:]))
+    return ''.join(parts).strip()
+
+
+def _squeeze_css(text):
+    text = re.sub(r'\s+', ' ', text)
+    # Spaces around ':' are left alone: 'a :hover' and 'a:hover' differ
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    return text.replace(';}', '}')
+
+
+def minify_html(html):
+    """Drop comments and collapse whitespace outside pre/textarea/script/style"""
+    # split() yields [text, block, tagname, text, block, tagname, ...]
+    chunks = PROTECTED_PATTERN.split(html)
+    parts = []
+    for index in range(0, len(chunks), 3):
+        text = HTML_COMMENT_PATTERN.sub('', chunks[index])
+        text = BLOCK_TAG_PATTERN.sub(r'\1', re.sub(r'\s+', ' ', text))
+        # Whitespace beside script/style never renders and goes; beside
+        # pre/textarea it may (Label: <textarea>), so it stays as one space
+        if index > 0 and chunks[index - 1].lower() in INVISIBLE_TAGS:
+            text = text.lstrip()
+        if index + 1 < len(chunks) and chunks[index + 2].lower() in INVISIBLE_TAGS:
+            text = text.rstrip()
+        parts.append(text)
+        if index + 1 < len(chunks):
+            block = chunks[index + 1]
+            if block[:6].lower() == '<style':
+                open_end = block.index('>') + 1
+                close_start = block.lower().rindex('</style')
+                block = block[:open_end] + minify_css(block[open_end:close_start]) + block[close_start:]
+            parts.append(block)
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    """Minify JS with rjsmin when installed, otherwise pass it through"""
+    return rjsmin.jsmin(js) if rjsmin else js
+
+
+MINIFIERS = {'.html': minify_html, '.css': minify_css, '.js': minify_js}
+
+
+def file_hash(file_path):
+    """Hex content hash of a file, read in chunks"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_compressed(output_path, data):
+    """Write .gz (and .br when available) siblings; returns the files written"""
+    written = []
+    gz_path = output_path.with_name(output_path.name + '.gz')
+    with open(gz_path, 'wb') as f:
+        # mtime=0 keeps the .gz byte-identical across rebuilds
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) as gz:
+            gz.write(data)
+    written.append(gz_path)
+
+    if brotli is not None:
+        br_path = output_path.with_name(output_path.name + '.br')
+        br_path.write_bytes(brotli.compress(data, quality=11))
+        written.append(br_path)
+    return written
+
+
+class DistBuilder:
+    def __init__(self, project_root, output_dir=None):
+        self.project_root = Path(project_root)
+        self.output_dir = Path(output_dir) if output_dir else self.project_root / DIST_DIRNAME
+        self.manifest_file = self.output_dir / MANIFEST_NAME
+        self.manifest = {}
+        self.stats = {'built': 0, 'skipped': 0, 'removed': 0, 'input_bytes': 0, 'output_bytes': 0, 'gzip_bytes': 0}
+        self.issues = []
+
+    def load_manifest(self):
+        """Load the previous build manifest, ignoring missing or outdated ones"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.manifest = data['files'] if data.get('version') == BUILD_VERSION else {}
+        except (OSError, ValueError, KeyError):
+            self.manifest = {}
+        return self.manifest
+
+    def save_manifest(self):
+        """Write the manifest atomically"""
+        tmp_file = self.manifest_file.with_name(MANIFEST_NAME + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': BUILD_VERSION, 'files': self.manifest}, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+    def source_files(self):
+        """Every deployable file: pages plus referenced asset types"""
+        return sorted(
+            path for path in scan_site_files(self.project_root)
+            if os.path.splitext(path)[1].lower() in ASSET_EXTENSIONS | {'.html'}
+        )
+
+    def is_up_to_date(self, relative_path, source_path):
+        """Cheap stat check first, content hash only when the stat changed"""
+        entry = self.manifest.get(relative_path)
+        if not entry or not all((self.output_dir / out).exists() for out in entry['outputs']):
+            return False, None
+        st = source_path.stat()
+        if entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return True, entry['hash']
+        digest = file_hash(source_path)
+        if digest != entry['hash']:
+            return False, digest
+        # Touched but identical: refresh the stat key so the next run skips hashing
+        entry['mtime'], entry['size'] = st.st_mtime_ns, st.st_size
+        return True, digest
+
+    def build_file(self, relative_path, source_path, digest):
+        """Minify or link one input into dist/ and precompress it"""
+        output_path = self.output_dir / relative_path
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        extension = output_path.suffix.lower()
+        outputs = [output_path]
+
+        minifier = MINIFIERS.get(extension)
+        if minifier:
+            text = source_path.read_text(encoding='utf-8')
+            data = minifier(text).encode('utf-8')
+            output_path.write_bytes(data)
+        else:
+            # Binary assets: hard link when possible, no copy needed
+            if output_path.exists():
+                output_path.unlink()
+            try:
+                os.link(source_path, output_path)
+            except OSError:
+                shutil.copy2(source_path, output_path)
+            data = None
+
+        if extension in COMPRESSIBLE_EXTENSIONS:
+            if data is None:
+                data = output_path.read_bytes()
+            if len(data) >= MIN_COMPRESS_SIZE:
+                outputs.extend(write_compressed(output_path, data))
+
+        st = source_path.stat()
+        self.manifest[relative_path] = {
+            'hash': digest or file_hash(source_path),
+            'mtime': st.st_mtime_ns,
+            'size': st.st_size,
+            'outputs': [out.relative_to(self.output_dir).as_posix() for out in outputs]
+        }
+
+    def build(self):
+        """Build dist/, skipping unchanged inputs and removing outputs of deleted ones"""
+        print(f"Building production tree in {self.output_dir}...")
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.load_manifest()
+
+        sources = self.source_files()
+        for relative_path in sources:
+            source_path = self.project_root / relative_path
+            up_to_date, digest = self.is_up_to_date(relative_path, source_path)
+            if up_to_date:
+                self.stats['skipped'] += 1
+            else:
+                try:
+                    self.build_file(relative_path, source_path, digest)
+                    self.stats['built'] += 1
+                    print(f"  ✅ {relative_path}")
+                except Exception as e:
+                    error_msg = f"Error building {relative_path}: {e}"
+                    print(f"  ❌ {error_msg}")
+                    self.issues.append(error_msg)
+                    continue
+            self._add_size_stats(relative_path, source_path)
+
+        for relative_path in set(self.manifest) - set(sources):
+            for out in self.manifest.pop(relative_path)['outputs']:
+                (self.output_dir / out).unlink(missing_ok=True)
+            self.stats['removed'] += 1
+
+        self.save_manifest()
+        return self.stats
+
+    def _add_size_stats(self, relative_path, source_path):
+        """Accumulate before/after sizes of the text assets (HTML, CSS, JS)"""
+        entry = self.manifest.get(relative_path)
+        if not entry or os.path.splitext(relative_path)[1].lower() not in MINIFIERS:
+            return
+        self.stats['input_bytes'] += source_path.stat().st_size
+        self.stats['output_bytes'] += (self.output_dir / relative_path).stat().st_size
+        gz_path = self.output_dir / (relative_path + '.gz')
+        self.stats['gzip_bytes'] += gz_path.stat().st_size if gz_path.exists() \
+            else (self.output_dir / relative_path).stat().st_size
+
+
+def format_size(size_bytes):
+    """Format file size in human readable format"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size_bytes < 1024.0:
+            return f"{size_bytes:.1f} {unit}"
+        size_bytes /= 1024.0
+    return f"{size_bytes:.1f} TB"
+
+
+def main():
+    project_root = os.getcwd()
+
+    print("Church Website Production Build")
+    print(f"Project root: {project_root}")
+    if brotli is None:
+        print("ℹ️  brotli not installed: writing .gz only")
+
+    builder = DistBuilder(project_root)
+    stats = builder.build()
+
+    print(f"\nBuilt {stats['built']}, skipped {stats['skipped']} unchanged, removed {stats['removed']}")
+    print(f"HTML/CSS/JS source: {format_size(stats['input_bytes'])} -> minified: {format_size(stats['output_bytes'])} "
+          f"-> transfer (gzip): {format_size(stats['gzip_bytes'])}")
+    return 1 if builder.issues else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Incremental Page Build for Church Website
+Composes every page with its partials into a self-contained build/ tree.
+Partials are the HTML fragments (nav-bar.html, footer.html,
+time-location.html, ...) and are pulled in either by an explicit
+<!-- #include "footer.html" --> directive or by the $.get() placeholder
+blocks the pages use today, which are replaced with the fragment's markup
+at build time. A manifest records the page -> partials -> assets graph, so
+after an edit only the pages that depend on the changed files are composed
+again (across worker processes when there are many), and only changed
+assets are re-linked.
+"""
+
+import os
+import re
+import sys
+import posixpath
+import json
+import time
+import shutil
+import hashlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from asset_graph import AssetGraph, scan_site_files, parse_html_refs, resolve
+from css_index import CSSIndex
+
+BUILD_DIRNAME = 'build'
+MANIFEST_NAME = '.pages-manifest.json'
+MANIFEST_VERSION = 1
+# Below this many pages to compose, a process pool costs more than it saves
+POOL_THRESHOLD = 64
+MAX_INCLUDE_DEPTH = 8
+
+# <!-- #include "partial.html" --> or the runtime include the pages use today:
+#   <div id="x-placeholder"></div><script>$.get("x.html", function(data){ $("#x-placeholder").replaceWith(data); });</script>
+INCLUDE_PATTERN = re.compile(
+    r'<!--\s*#include\s+"(?P<directive>[^"]+)"\s*-->'
+    r'|<div id="(?P<id>[\w-]+)">\s*</div>\s*<script>\s*\$\.get\(\s*"(?P<runtime>[^"]+\.html)"\s*,'
+    r'\s*function\s*\(\s*data\s*\)\s*\{\s*\$\("#(?P=id)"\)\.replaceWith\(data\);?\s*\}\);?\s*</script>',
+    re.IGNORECASE)
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def is_document(text):
+    """Complete pages have an <html> element; everything else is a partial"""
+    return '<html' in text[:2048].lower()
+
+
+def partial_body(text):
+    """The markup a partial contributes; its own <head> is only for previewing it standalone"""
+    head_end = text.lower().find('</head>')
+    return text[head_end + len('</head>'):].lstrip('\n') if head_end != -1 else text
+
+
+def compose(relative_path, text, partials, depth=0):
+    """Expand the includes of one file; returns (html, partial paths it depends on)
+
+    partials maps project-relative paths to partial bodies (partial_body()).
+    Includes of unknown files are left in place (and still recorded as
+    dependencies, so the page is rebuilt once the partial appears).
+    """
+    deps = set()
+
+    def replace(match):
+        target = resolve(relative_path, match.group('directive') or match.group('runtime'))
+        deps.add(target)
+        if target not in partials or depth >= MAX_INCLUDE_DEPTH:
+            return match.group(0)
+        html, nested = compose(target, partials[target], partials, depth + 1)
+        deps.update(nested)
+        return html
+
+    return INCLUDE_PATTERN.sub(replace, text), deps
+
+
+_PARTIALS = {}
+
+
+def _init_worker(partials):
+    global _PARTIALS
+    _PARTIALS = partials
+
+
+def build_page(project_root, output_dir, relative_path, previous_hash=None, parse_refs=True, partials=None):
+    """Compose one page, write it if its output changed and list what it depends on
+
+    The page's own references are only parsed when the page itself changed;
+    a page rebuilt for a partial edit reuses them from the manifest.
+    """
+    result = {'page': relative_path, 'deps': [], 'refs': None, 'hash': None, 'written': False, 'error': None}
+    try:
+        text = (Path(project_root) / relative_path).read_text(encoding='utf-8')
+        html, deps = compose(relative_path, text, _PARTIALS if partials is None else partials)
+        data = html.encode('utf-8')
+        result['hash'] = content_hash(data)
+        result['deps'] = sorted(deps)
+        if parse_refs:
+            result['refs'] = parse_html_refs([text])
+
+        output_path = Path(output_dir) / relative_path
+        # Identical output keeps its mtime so downstream steps see no change
+        if result['hash'] != previous_hash or not output_path.exists():
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            # Replace rather than write in place: never write through a hard link to a source
+            tmp_path = output_path.with_name(output_path.name + '.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, output_path)
+            result['written'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+class PageBuilder:
+    def __init__(self, project_root, output_dir=None, jobs=None):
+        self.project_root = Path(project_root)
+        self.output_dir = Path(output_dir) if output_dir else self.project_root / BUILD_DIRNAME
+        self.manifest_file = self.output_dir / MANIFEST_NAME
+        self.jobs = jobs
+        self.manifest = {'sources': {}, 'pages': {}, 'assets': {}}
+        self.partial_assets = {}
+        self.dirty = False
+        self.stats = {'pages': 0, 'partials': 0, 'changed': 0, 'composed': 0, 'written': 0,
+                      'skipped': 0, 'assets_linked': 0, 'removed': 0, 'ms': 0.0}
+        self.issues = []
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.manifest = data
+        except (OSError, ValueError):
+            pass
+        return self.manifest
+
+    def save_manifest(self):
+        self.manifest['version'] = MANIFEST_VERSION
+        tmp_file = self.manifest_file.with_name(MANIFEST_NAME + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            # One dumps() call uses the C encoder; dump() streams through the Python one
+            f.write(json.dumps(self.manifest, separators=(',', ':')))
+        os.replace(tmp_file, self.manifest_file)
+
+    def scan_sources(self, html_files):
+        """Stat every HTML source; read and hash only those whose stat changed
+
+        Returns the set of changed (added, edited or removed) paths and
+        fills self.texts with the text of every partial that was read.
+        """
+        previous = self.manifest['sources']
+        current = {}
+        changed = set()
+        self.texts = {}
+        for relative_path in html_files:
+            st = (self.project_root / relative_path).stat()
+            entry = previous.get(relative_path)
+            if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                current[relative_path] = entry
+                continue
+            data = (self.project_root / relative_path).read_bytes()
+            digest = content_hash(data)
+            self.dirty = True
+            text = data.decode('utf-8', errors='replace')
+            kind = 'page' if is_document(text) else 'partial'
+            current[relative_path] = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'hash': digest, 'kind': kind}
+            if kind == 'partial':
+                self.texts[relative_path] = text
+                current[relative_path]['refs'] = parse_html_refs([partial_body(text)])
+            if not entry or entry['hash'] != digest or entry['kind'] != kind:
+                changed.add(relative_path)
+        changed |= set(previous) - set(current)
+        self.dirty |= len(previous) != len(current)
+        self.manifest['sources'] = current
+        return changed
+
+    def dirty_pages(self, pages, changed):
+        """Pages that changed, depend on a changed partial, or have no current output"""
+        dirty = []
+        for page in pages:
+            entry = self.manifest['pages'].get(page)
+            if (page in changed or entry is None or changed.intersection(entry['deps'])
+                    or not (self.output_dir / page).exists()):
+                dirty.append(page)
+        return dirty
+
+    def load_partials(self):
+        """Body of every partial, ready to splice into pages"""
+        partials = {}
+        for relative_path, entry in self.manifest['sources'].items():
+            if entry['kind'] == 'partial':
+                text = self.texts.get(relative_path) or \
+                    (self.project_root / relative_path).read_text(encoding='utf-8', errors='replace')
+                partials[relative_path] = partial_body(text)
+        return partials
+
+    def compose_pages(self, dirty):
+        """Compose the dirty pages, in worker processes when there are enough of them"""
+        partials = self.load_partials()
+        previous = {page: self.manifest['pages'].get(page, {}) for page in dirty}
+        args = [(str(self.project_root), str(self.output_dir), page, previous[page].get('hash'),
+                 page in self.changed or 'own' not in previous[page]) for page in dirty]
+        workers = self.jobs or os.cpu_count() or 1
+        if len(dirty) < POOL_THRESHOLD or workers == 1:
+            return [build_page(*arg, partials=partials) for arg in args]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(partials,)) as pool:
+            chunksize = max(1, len(args) // (workers * 4))
+            return list(pool.map(build_page, *zip(*args), chunksize=chunksize))
+
+    def asset_refs(self, asset):
+        """What a stylesheet or bundle references in turn (url() images, quoted asset paths)"""
+        extension = os.path.splitext(asset)[1].lower()
+        if extension == '.css':
+            targets = [ref['path'] for ref in self.css_index.refs(self.project_root / asset)]
+        elif extension == '.js':
+            targets = self.graph.bundle_refs(asset)
+        else:
+            return []
+        # Pages are composed, never linked
+        return sorted(self.resolve_assets(asset, targets))
+
+    @staticmethod
+    def resolve_assets(page, targets):
+        return {path for path in (resolve(page, target) for target in targets)
+                if path and not path.endswith('.html')}
+
+    def page_assets(self, page, own, deps):
+        """Assets of a composed page: its own plus those of its partials
+
+        Included markup lands in the page, so partial paths resolve against
+        the page's directory; that is done once per (directory, partial).
+        """
+        assets = set(own)
+        directory = posixpath.dirname(page)
+        for dep in deps:
+            key = (directory, dep)
+            if key not in self.partial_assets:
+                refs = self.manifest['sources'].get(dep, {}).get('refs', [])
+                self.partial_assets[key] = self.resolve_assets(page, refs)
+            assets |= self.partial_assets[key]
+        return sorted(assets)
+
+    def link_assets(self):
+        """Hard link (or copy) every asset the pages reach that is new or changed
+
+        Partials are linked too, so a runtime include that was not inlined
+        still works in the build tree.
+        """
+        previous = self.manifest['assets']
+        current = {}
+        self.css_index = CSSIndex(self.project_root)
+        self.graph = AssetGraph(self.project_root)
+        pending = {asset for entry in self.manifest['pages'].values() for asset in entry['assets']}
+        pending.update(path for path, entry in self.manifest['sources'].items() if entry['kind'] == 'partial')
+        while pending:
+            asset = pending.pop()
+            if asset in current:
+                continue
+            source_path = self.project_root / asset
+            try:
+                st = source_path.stat()
+            except OSError:
+                continue
+            stamp = [st.st_mtime_ns, st.st_size]
+            output_path = self.output_dir / asset
+            entry = previous.get(asset)
+            if entry and entry['stamp'] == stamp and output_path.exists():
+                refs = entry['refs']
+            else:
+                output_path.parent.mkdir(parents=True, exist_ok=True)
+                output_path.unlink(missing_ok=True)
+                try:
+                    os.link(source_path, output_path)
+                except OSError:
+                    shutil.copy2(source_path, output_path)
+                self.stats['assets_linked'] += 1
+                self.dirty = True
+                refs = self.asset_refs(asset)
+            current[asset] = {'stamp': stamp, 'refs': refs}
+            pending.update(ref for ref in refs if ref not in current)
+        for asset in set(previous) - set(current):
+            (self.output_dir / asset).unlink(missing_ok=True)
+            self.dirty = True
+        self.css_index.save()
+        self.manifest['assets'] = current
+
+    def build(self):
+        """Bring build/ up to date; returns stats"""
+        started = time.perf_counter()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.load_manifest()
+
+        html_files = sorted(path for path in scan_site_files(self.project_root) if path.endswith('.html'))
+        changed = self.changed = self.scan_sources(html_files)
+        sources = self.manifest['sources']
+        pages = [path for path in html_files if sources[path]['kind'] == 'page']
+        self.stats.update(pages=len(pages), partials=len(html_files) - len(pages), changed=len(changed))
+
+        dirty = self.dirty_pages(pages, changed)
+        for result in self.compose_pages(dirty) if dirty else []:
+            if result['error']:
+                self.issues.append(f"Error building {result['page']}: {result['error']}")
+                self.manifest['pages'].pop(result['page'], None)
+                continue
+            page = result['page']
+            own = sorted(self.resolve_assets(page, result['refs'])) if result['refs'] is not None \
+                else self.manifest['pages'][page]['own']
+            self.manifest['pages'][page] = {'deps': result['deps'], 'own': own, 'hash': result['hash'],
+                                            'assets': self.page_assets(page, own, result['deps'])}
+            self.stats['composed'] += 1
+            self.stats['written'] += result['written']
+        self.stats['skipped'] = len(pages) - len(dirty)
+
+        for page in set(self.manifest['pages']) - set(pages):
+            del self.manifest['pages'][page]
+            (self.output_dir / page).unlink(missing_ok=True)
+            self.stats['removed'] += 1
+        self.dirty |= bool(dirty or self.stats['removed'])
+
+        self.link_assets()
+        if self.dirty:
+            self.save_manifest()
+        self.stats['ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return self.stats
+
+    def dependents(self, relative_path):
+        """Pages that include a partial (directly or through another partial)"""
+        return sorted(page for page, entry in self.manifest['pages'].items() if relative_path in entry['deps'])
+
+
+def main():
+    project_root = os.getcwd()
+
+    print("Church Website Page Build")
+    print(f"Project root: {project_root}")
+
+    builder = PageBuilder(project_root)
+    stats = builder.build()
+    for issue in builder.issues:
+        print(f"  ❌ {issue}")
+
+    print(f"\n{stats['pages']} pages, {stats['partials']} partials, {stats['changed']} changed sources")
+    print(f"Composed {stats['composed']} ({stats['written']} written), skipped {stats['skipped']} up to date, "
+          f"linked {stats['assets_linked']} assets, removed {stats['removed']} in {stats['ms']} ms")
+    print(f"Output: {builder.output_dir} (preview with: python serve_site.py --root {BUILD_DIRNAME})")
+    return 1 if builder.issues else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+JavaScript Bundle Analyzer for Church Website
+Splits every script the pages load into its webpack modules and recognises
+the libraries inside them (jQuery, Owl Carousel, Lightbox, AOS, Card). For
+each page it works out which scripts the page's DOM (with its partials) and
+its inline code actually use, keeps one copy of every library, drops unused,
+duplicate and missing scripts and gives the rest defer in dependency order.
+Reports the libraries shipped more than once and the bytes and estimated
+parse time saved per page; --apply rewrites the pages' script tags.
+
+Usage: python bundle_analyzer.py [--apply]
+"""
+
+import os
+import re
+import sys
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from asset_graph import resolve
+from build_pages import compose, is_document, partial_body
+from move_journal import write_durable
+from profiling import profiled, profile_session
+
+# Rough parse/compile cost of (unminified, development-mode) bundle code on a mid-range phone
+PARSE_MS_PER_KB = 1.0
+
+# How each library is recognised inside a bundle (signature) or from a CDN URL,
+# how code calls it (uses), what in the DOM means a page needs it (marker) and
+# which other libraries it needs on the page
+LIBRARIES = {
+    'jQuery': {
+        'signature': re.compile(r'jQuery JavaScript Library v(\d[\w.]*)'),
+        'url': re.compile(r'jquery[-/@]v?(\d+\.\d+\.\d+)|(?:^|/)jquery(?:\.min)?\.js$', re.IGNORECASE),
+        'uses': re.compile(r'(?<![\w.$])(?:\$|jQuery)\s*[(.]'),
+        'marker': None,
+        'requires': (),
+    },
+    'Owl Carousel': {
+        'signature': re.compile(r'Owl Carousel v(\d[\w.]*)'),
+        'url': re.compile(r'owl\.?carousel(?:[-@/]v?(\d+\.\d+\.\d+))?', re.IGNORECASE),
+        'uses': re.compile(r'\.owlCarousel\('),
+        'marker': '.owl-carousel',
+        'requires': ('jQuery',),
+    },
+    'Lightbox': {
+        'signature': re.compile(r'Lightbox v(\d[\w.]*)'),
+        'url': re.compile(r'lightbox2?(?:[-@/]v?(\d+\.\d+\.\d+))?(?:/|\.js)', re.IGNORECASE),
+        'uses': re.compile(r'\blightbox\.option\('),
+        'marker': '[data-lightbox]',
+        'requires': ('jQuery',),
+    },
+    'AOS': {
+        'signature': re.compile(r'data-aos-easing'),
+        'url': re.compile(r'(?:^|/)aos(?:@(\d+\.\d+\.\d+))?(?:/|\.js)', re.IGNORECASE),
+        'uses': re.compile(r'\bAOS\.\w+\('),
+        'marker': '[data-aos]',
+        'requires': (),
+    },
+    'Card': {
+        'signature': re.compile(r'Card\.prototype\.render'),
+        'url': re.compile(r'jquery\.card(?:[-@/]v?(\d+\.\d+\.\d+))?', re.IGNORECASE),
+        'uses': re.compile(r'\bnew Card\(|\.card\(\{'),
+        'marker': '.card-wrapper',
+        'requires': ('jQuery',),
+    },
+}
+
+SCRIPT_TAG = re.compile(r'<script\b(?P<attrs>[^>]*)>(?P<code>.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+SRC_ATTR = re.compile(r'''\ssrc\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+LOADING_ATTR = re.compile(r'''\s+(?:defer|async)(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+))?''', re.IGNORECASE)
+EXTERNAL_URL = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//)', re.IGNORECASE)
+# webpack 5 module keys ('/***/ 327:' or '/***/ "./src/aos.js":') and webpack 4 array slots ('/* 0 */')
+MODULE_MARKER = re.compile(r'^/\*\*\*/ (?:(\d+)|"([^"]+)"):\s*$|^/\* (\d+) \*/\s*$', re.MULTILINE)
+RUNTIME_MARKER = re.compile(r'^/\*{20,}/\s*$', re.MULTILINE)
+SELECTOR_CALL = re.compile(
+    r'''(?<![\w$])(querySelector(?:All)?|getElementById|getElementsByClassName|\$|jQuery)'''
+    r'''\(\s*(["'`])((?:(?!\2).)+)\2\s*\)''')
+
+
+def split_modules(text):
+    """(module id, source) for each webpack module; files without modules are one '(entry)' module"""
+    markers = list(MODULE_MARKER.finditer(text))
+    if not markers:
+        return [('(entry)', text)]
+    modules = []
+    for i, match in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        runtime = RUNTIME_MARKER.search(text, match.end(), end)
+        module_id = next(group for group in match.groups() if group is not None)
+        modules.append((module_id, text[match.end():runtime.start() if runtime else end]))
+    return modules
+
+
+def find_selectors(code):
+    """DOM selectors a piece of code looks up with literal strings"""
+    selectors = set()
+    for call, _, value in SELECTOR_CALL.findall(code):
+        if '${' in value:
+            continue
+        if call == 'getElementById':
+            value = '#' + value
+        elif call == 'getElementsByClassName':
+            value = '.' + '.'.join(value.split())
+        # Bare tags ('body') and markup ('<div>') say nothing about the page
+        if value[0] in '.#[' or (call.startswith('querySelector') and any(c in value for c in '.#[')):
+            selectors.add(value)
+    return selectors
+
+
+def find_uses(code):
+    return {name for name, library in LIBRARIES.items() if library['uses'].search(code)}
+
+
+def analyze_code(text, size):
+    """Libraries, app selectors and library uses of one script's source"""
+    info = {'size': size, 'modules': [], 'libraries': {}, 'selectors': set(), 'uses': set()}
+    for module_id, source in split_modules(text):
+        library = None
+        for name, spec in LIBRARIES.items():
+            match = spec['signature'].search(source)
+            if match:
+                library = name
+                info['libraries'].setdefault(name, {'version': match.group(1) if match.groups() else None,
+                                                    'bytes': 0})
+                info['libraries'][name]['bytes'] += len(source.encode('utf-8'))
+                break
+        info['modules'].append({'id': module_id, 'bytes': len(source.encode('utf-8')), 'library': library})
+        if library is None:
+            info['selectors'] |= find_selectors(source)
+            info['uses'] |= find_uses(source)
+    info['uses'] -= set(info['libraries'])
+    return info
+
+
+def analyze_url(url):
+    """What a CDN script provides, judged from its URL alone"""
+    info = {'size': None, 'modules': [], 'libraries': {}, 'selectors': set(), 'uses': set()}
+    path = url.split('?', 1)[0].split('#', 1)[0]
+    for name, spec in LIBRARIES.items():
+        match = spec['url'].search(path)
+        if match:
+            version = next((group for group in match.groups() if group), None)
+            info['libraries'][name] = {'version': version, 'bytes': None}
+            break
+    return info
+
+
+def needs(info):
+    """Libraries a script needs from elsewhere on the page"""
+    required = set(info['uses'])
+    for name in info['libraries']:
+        required.update(LIBRARIES[name]['requires'])
+    return required - set(info['libraries'])
+
+
+def version_key(version):
+    return tuple(int(part) for part in re.findall(r'\d+', version or ''))
+
+
+def provider_rank(script, name):
+    """Which of several copies of a library to keep: a CDN copy (cached across
+    sites, minified) before a bundled one, then the newest, then the first"""
+    return (not EXTERNAL_URL.match(script['key']), tuple(-part for part in version_key(
+        script['info']['libraries'][name]['version'])), script['start'])
+
+
+def script_tag(script, defer):
+    attrs = LOADING_ATTR.sub('', script['attrs'])
+    if defer:
+        attrs = ' defer="defer"' + attrs
+    return f"<script{attrs}></script>"
+
+
+class BundleAnalyzer:
+    def __init__(self, project_root):
+        self.project_root = Path(project_root)
+        self.scripts = {}
+        self.partials = {}
+        self.issues = []
+
+    def script_info(self, key):
+        """Analysis of one script (a project path or a URL), cached across pages"""
+        if key not in self.scripts:
+            if EXTERNAL_URL.match(key):
+                self.scripts[key] = analyze_url(key)
+            else:
+                file_path = self.project_root / key
+                if not file_path.is_file():
+                    self.scripts[key] = None
+                else:
+                    data = file_path.read_bytes()
+                    self.scripts[key] = analyze_code(data.decode('utf-8', errors='replace'), len(data))
+        return self.scripts[key]
+
+    def page_scripts(self, relative_path, text):
+        """External and inline scripts of a page, in document order"""
+        scripts = []
+        for match in SCRIPT_TAG.finditer(text):
+            attrs = match.group('attrs')
+            src = SRC_ATTR.search(attrs)
+            script = {'start': match.start(), 'end': match.end(), 'attrs': attrs,
+                      'defer': bool(re.search(r'\s(?:defer|async)\b', attrs, re.IGNORECASE))}
+            if src:
+                written = next(group for group in src.groups() if group is not None)
+                script['src'] = written
+                script['key'] = written if EXTERNAL_URL.match(written) else resolve(relative_path, written)
+                script['info'] = self.script_info(script['key']) if script['key'] else None
+            else:
+                script['src'] = None
+                script['uses'] = find_uses(match.group('code'))
+            scripts.append(script)
+        return scripts
+
+    def page_dom(self, relative_path, text):
+        html, _ = compose(relative_path, text, self.partials)
+        return BeautifulSoup(html, 'html.parser')
+
+    @staticmethod
+    def matches(dom, selectors):
+        for selector in selectors:
+            try:
+                if dom.select_one(selector) is not None:
+                    return True
+            except Exception:
+                continue
+        return False
+
+    def plan_page(self, relative_path, text):
+        """Which scripts a page keeps, in what order and with what loading"""
+        dom = self.page_dom(relative_path, text)
+        scripts = self.page_scripts(relative_path, text)
+        external = [s for s in scripts if s['src']]
+        inline = [s for s in scripts if not s['src']]
+
+        needed = set()
+        for script in inline:
+            needed |= script['uses']
+        marker_needed = {name for name, library in LIBRARIES.items()
+                         if library['marker'] and self.matches(dom, [library['marker']])}
+        needed |= marker_needed
+
+        kept = []
+        for script in external:
+            info = script['info']
+            if info is None:
+                continue
+            if info['selectors']:
+                if self.matches(dom, info['selectors']):
+                    kept.append(script)
+            elif not info['libraries']:
+                # Nothing tells what it is for: keep it
+                kept.append(script)
+
+        providers = {}
+        while True:
+            for script in kept:
+                needed |= needs(script['info'])
+            for name in list(needed):
+                while name not in providers:
+                    candidates = [s for s in external if s['info'] and name in s['info']['libraries']]
+                    if not candidates:
+                        break
+                    providers[name] = min(candidates, key=lambda s: provider_rank(s, name))
+                needed.update(LIBRARIES[name]['requires'])
+            added = [s for s in providers.values() if s not in kept]
+            if not added:
+                break
+            kept.extend(added)
+        kept.sort(key=lambda s: s['start'])
+        chosen = {id(s) for s in providers.values()}
+
+        dropped = []
+        for script in external:
+            if script in kept:
+                continue
+            info = script['info']
+            if info is None:
+                reason = 'missing'
+            elif info['libraries'] and set(info['libraries']) <= set(providers) and id(script) not in chosen:
+                reason = 'duplicate'
+            else:
+                reason = 'unused'
+            dropped.append({'src': script['src'], 'reason': reason, 'bytes': info['size'] if info else 0})
+
+        # Providers of what inline code calls must run before it, so they stay blocking
+        # (the kept scripts are written where the page's first script tag was)
+        blocking = set()
+        for script in kept:
+            info = script['info']
+            if not script['defer'] and EXTERNAL_URL.match(script['key']) and not info['libraries']:
+                blocking.add(id(script))
+            for name in info['libraries']:
+                if providers.get(name) is script and any(name in i['uses'] for i in inline):
+                    blocking.add(id(script))
+        changed = True
+        while changed:
+            changed = False
+            for script in kept:
+                if id(script) in blocking:
+                    for name in needs(script['info']):
+                        provider = providers.get(name)
+                        if provider is not None and id(provider) not in blocking:
+                            blocking.add(id(provider))
+                            changed = True
+
+        order = [s for s in kept if id(s) in blocking] + self.order_deferred(
+            [s for s in kept if id(s) not in blocking], providers)
+
+        duplicates = []
+        for script in kept:
+            for name, library in script['info']['libraries'].items():
+                provider = providers.get(name)
+                if provider is not None and provider is not script:
+                    duplicates.append({'src': script['src'], 'library': name, 'version': library['version'],
+                                       'bytes': library['bytes'], 'provider': provider['src']})
+
+        # Libraries the DOM does not call for, loaded only because app code calls them unconditionally
+        pinned = []
+        for name, provider in sorted(providers.items()):
+            marker = LIBRARIES[name]['marker']
+            if marker and provider['info']['size'] and name not in marker_needed and \
+                    not any(name in i['uses'] for i in inline):
+                users = [s['src'] for s in kept if name in needs(s['info'])]
+                pinned.append({'library': name, 'src': provider['src'], 'bytes': provider['info']['size'],
+                               'by': users})
+        unmet = sorted(name for name in needed if name not in providers)
+        dropped_bytes = sum(item['bytes'] or 0 for item in dropped)
+        new_scripts = [{'src': s['src'], 'defer': id(s) not in blocking} for s in order]
+        old_scripts = [{'src': s['src'], 'defer': s['defer']} for s in external]
+        return {
+            'page': relative_path,
+            'scripts': new_scripts,
+            'dropped': dropped,
+            'duplicates': duplicates,
+            'pinned': pinned,
+            'unmet': unmet,
+            'deferred': sum(1 for s in kept if not s['defer'] and id(s) not in blocking),
+            'bytes_saved': dropped_bytes,
+            'parse_ms_saved': round(dropped_bytes / 1024 * PARSE_MS_PER_KB, 1),
+            'changed': new_scripts != old_scripts,
+            '_external': external,
+            '_inline': inline,
+            '_order': order,
+            '_blocking': blocking,
+        }
+
+    @staticmethod
+    def order_deferred(scripts, providers):
+        """Deferred scripts run in document order: put each after the libraries it needs
+
+        A bundle that embeds its own copy of a library replaces the page's
+        global when it runs, so it goes after every script that uses that
+        library (otherwise plugins registered on the page's copy vanish).
+        """
+        after = {id(s): set() for s in scripts}
+        ids = set(after)
+        for script in scripts:
+            for name in needs(script['info']):
+                provider = providers.get(name)
+                if provider is not None and id(provider) in ids and provider is not script:
+                    after[id(script)].add(id(provider))
+            for name in script['info']['libraries']:
+                if providers.get(name) not in (None, script):
+                    for user in scripts:
+                        if user is not script and name in needs(user['info']):
+                            after[id(script)].add(id(user))
+
+        ordered, placed = [], set()
+        pending = list(scripts)
+        while pending:
+            ready = next((s for s in pending if after[id(s)] <= placed), None)
+            if ready is None:
+                # A cycle: keep the rest in document order
+                ordered.extend(pending)
+                break
+            ordered.append(ready)
+            placed.add(id(ready))
+            pending.remove(ready)
+        return ordered
+
+    @profiled()
+    def analyze(self):
+        """Plan every page; returns (page plans, libraries shipped more than once)"""
+        pages = {}
+        for file_path in sorted(self.project_root.glob('*.html')):
+            text = file_path.read_text(encoding='utf-8', errors='replace')
+            if is_document(text):
+                pages[file_path.name] = text
+            else:
+                self.partials[file_path.name] = partial_body(text)
+
+        plans = [self.plan_page(relative_path, text) for relative_path, text in pages.items()]
+        for file_path in sorted(self.project_root.glob('*.js')):
+            self.script_info(file_path.name)
+
+        shipped = {}
+        for key, info in sorted(self.scripts.items()):
+            for name, library in (info or {}).get('libraries', {}).items():
+                shipped.setdefault(name, []).append({'script': key, 'version': library['version'],
+                                                     'bytes': library['bytes']})
+        duplicates = {name: sources for name, sources in shipped.items() if len(sources) > 1}
+        return plans, duplicates
+
+    def bundle_pages(self, plans):
+        """Bundle -> the pages that keep it"""
+        pages = {}
+        for plan in plans:
+            for script in plan['scripts']:
+                pages.setdefault(script['src'], []).append(plan['page'])
+        return pages
+
+    @profiled()
+    def apply(self, plans, dry_run=False, backup_store=None):
+        """Rewrite the script tags of the pages whose plan changed; returns the pages written
+
+        The kept scripts go where the page's first external script was; inline
+        scripts stay where they are. Pages whose inline code runs before that
+        point are left alone.
+        """
+        targets = []
+        for plan in plans:
+            if not plan['changed'] or not plan['_external']:
+                continue
+            first = plan['_external'][0]['start']
+            if any(i['start'] < first and i['uses'] for i in plan['_inline']):
+                self.issues.append(f"{plan['page']}: inline code runs before its scripts; not rewritten")
+                continue
+            targets.append(plan)
+        if dry_run or not targets:
+            return [plan['page'] for plan in targets]
+        if backup_store is not None:
+            backup_store.snapshot([self.project_root / plan['page'] for plan in targets], label='html')
+
+        for plan in targets:
+            file_path = self.project_root / plan['page']
+            text = file_path.read_text(encoding='utf-8')
+            first = plan['_external'][0]
+            line_start = text.rfind('\n', 0, first['start']) + 1
+            indent = text[line_start:first['start']] if not text[line_start:first['start']].strip() else ''
+            block = ('\n' + indent).join(script_tag(s, id(s) not in plan['_blocking']) for s in plan['_order'])
+
+            # Cut from the end so earlier offsets stay valid
+            for script in reversed(plan['_external']):
+                start, end = script['start'], script['end']
+                if script is first:
+                    text = text[:start] + block + text[end:]
+                    continue
+                before = text.rfind('\n', 0, start) + 1
+                after = text.find('\n', end)
+                after = len(text) if after == -1 else after
+                if not text[before:start].strip() and not text[end:after].strip():
+                    start, end = before, min(after + 1, len(text))
+                text = text[:start] + text[end:]
+            write_durable(file_path, text.encode('utf-8'))
+        return [plan['page'] for plan in targets]
+
+
+def main():
+    project_root = os.getcwd()
+    apply = '--apply' in sys.argv[1:]
+    analyzer = BundleAnalyzer(project_root)
+
+    print("Church Website Bundle Analyzer")
+    print("=" * 40)
+    plans, duplicates = analyzer.analyze()
+
+    print("\n📋 LIBRARIES SHIPPED MORE THAN ONCE:")
+    if not duplicates:
+        print("  ✅ None")
+    for name, sources in duplicates.items():
+        print(f"  ⚠️  {name}:")
+        for source in sources:
+            size = f"{source['bytes']:,} bytes" if source['bytes'] else "external"
+            print(f"     {source['script']} (v{source['version'] or '?'}, {size})")
+
+    print("\n📋 BUNDLES BY PAGE:")
+    for src, pages in sorted(analyzer.bundle_pages(plans).items()):
+        print(f"  {src}: {', '.join(pages)}")
+
+    total = 0
+    for plan in plans:
+        print(f"\n📄 {plan['page']}: saves {plan['bytes_saved']:,} bytes "
+              f"(~{plan['parse_ms_saved']:.0f} ms parse), {plan['deferred']} newly deferred")
+        for script in plan['scripts']:
+            print(f"  {'defer' if script['defer'] else 'block'}  {script['src']}")
+        for item in plan['dropped']:
+            print(f"  ❌ {item['src']} ({item['reason']}, {item['bytes'] or 0:,} bytes)")
+        for item in plan['duplicates']:
+            print(f"  ℹ️  {item['src']} embeds {item['library']} v{item['version']} ({item['bytes']:,} bytes); "
+                  f"the page already loads {item['provider']}")
+        for item in plan['pinned']:
+            print(f"  ℹ️  {', '.join(item['by'])} calls {item['library']} unconditionally; guard the call "
+                  f"to drop {item['src']} ({item['bytes']:,} bytes) here")
+        for name in plan['unmet']:
+            print(f"  ⚠️  needs {name} but no script on the page provides it")
+        total += plan['bytes_saved']
+    print(f"\nTotal: {total:,} bytes (~{total / 1024 * PARSE_MS_PER_KB:.0f} ms parse) across {len(plans)} pages")
+
+    if apply:
+        from backup_store import BackupStore
+        written = analyzer.apply(plans, backup_store=BackupStore(project_root))
+        for page in written:
+            print(f"✅ Rewrote scripts in {page}")
+        for issue in analyzer.issues:
+            print(f"⚠️  {issue}")
+    else:
+        print("ℹ️  Run with --apply to rewrite the pages' script tags")
+    return 0
+
+
+if __name__ == "__main__":
+    with profile_session('--profile' in sys.argv[1:]):
+        main()
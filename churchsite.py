@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Church Website Command Line
+One non-interactive entry point for the site maintenance tools, for use in
+build pipelines:
+
+    python churchsite.py scan --root . --json
+    python churchsite.py organize --yes
+    python churchsite.py rewrite-css --dry-run
+    python churchsite.py fix-paths
+    python churchsite.py prettify --jobs 4
+    python churchsite.py build-pages
+    python churchsite.py verify
+    python churchsite.py watch --organize
+    python churchsite.py serve --dist --port 8000
+    python churchsite.py scan --profile --profile-output scan.prof
+
+Tool output is discarded unless --verbose is given; results are reported as
+a short summary, or as JSON lines on stdout with --json. --profile adds a
+per-stage timing and file/syscall counter table (or 'profile' records).
+"""
+
+import os
+import sys
+import json
+import argparse
+import contextlib
+from pathlib import Path
+
+# Exit codes
+EXIT_OK = 0
+EXIT_PROBLEMS = 1       # the command ran but found missing files or errors
+EXIT_USAGE = 2          # bad arguments (argparse's own code)
+EXIT_NOT_CONFIRMED = 3  # a change needed --yes and could not ask
+
+
+class Output:
+    """Collects results as JSON lines or a human summary"""
+
+    def __init__(self, as_json=False, verbose=False):
+        self.as_json = as_json
+        self.verbose = verbose
+        # Long-running commands show every event, not just the summary
+        self.follow = False
+        # Held on to so results still reach stdout while tool output is redirected
+        self.stream = sys.stdout
+
+    def emit(self, event, **fields):
+        """One result record; in human mode only summaries and problems are shown"""
+        if self.as_json:
+            self.stream.write(json.dumps({'event': event, **fields}, default=str) + '\n')
+        elif event in ('summary', 'error', 'missing') or self.follow:
+            details = ', '.join(f"{key}={value}" for key, value in fields.items())
+            self.stream.write(f"{event}: {details}\n")
+
+    @contextlib.contextmanager
+    def tool_output(self):
+        """Silence the tools' per-file prints unless --verbose (then send them to stderr)"""
+        if self.verbose:
+            target = sys.stderr if self.as_json else self.stream
+            with contextlib.redirect_stdout(target):
+                yield
+        else:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                yield
+
+
+def confirm(args, question):
+    """--yes or --dry-run decide; otherwise ask only when a person is at the terminal"""
+    if args.yes or args.dry_run:
+        return True
+    if args.json or not sys.stdin.isatty():
+        return False
+    return input(f"{question} (y/n): ").lower().strip() == 'y'
+
+
+def cmd_scan(args, out):
+    from organize_images import ImageOrganizer
+
+    organizer = ImageOrganizer(args.root)
+    with out.tool_output():
+        categories = organizer.scan_images(incremental=True, jobs=args.jobs)
+        if categories is None:
+            out.emit('error', message=f"images directory not found under {args.root}")
+            return EXIT_PROBLEMS
+        oversized = organizer.find_oversized_images()
+        duplicates = organizer.find_duplicates(jobs=args.jobs)
+        organizer.generate_report()
+
+    for category, info in categories.items():
+        for file_info in info['files']:
+            out.emit('image', category=category, path=file_info['current_path'], size=file_info['size'],
+                     format=file_info['format'], width=file_info['width'], height=file_info['height'])
+    for item in oversized:
+        out.emit('oversized', **item)
+    for group in duplicates:
+        out.emit('duplicate', **group)
+    out.emit('summary', command='scan',
+             images=sum(len(info['files']) for info in categories.values()),
+             oversized=len(oversized), duplicate_groups=len(duplicates), **organizer.report['scan'])
+    return EXIT_OK
+
+
+def cmd_organize(args, out):
+    from organize_images import ImageOrganizer
+    from move_journal import MoveTransaction
+
+    organizer = ImageOrganizer(args.root)
+    with out.tool_output():
+        if args.resume or args.rollback:
+            if not MoveTransaction(args.root).pending():
+                out.emit('summary', command='organize', message='nothing to resume or roll back')
+                return EXIT_OK
+            stats = organizer.rollback_organization() if args.rollback else organizer.resume_organization()
+            out.emit('summary', command='organize', action='rollback' if args.rollback else 'resume',
+                     **(stats or {}))
+            return EXIT_OK if stats is not None else EXIT_PROBLEMS
+
+        organizer.scan_images(incremental=True, jobs=args.jobs)
+        moves = organizer.plan_moves()
+        if not moves:
+            out.emit('summary', command='organize', moves=0)
+            return EXIT_OK
+        if not confirm(args, f"Move {len(moves)} images?"):
+            out.emit('error', message=f"{len(moves)} moves need confirmation; pass --yes or --dry-run")
+            return EXIT_NOT_CONFIRMED
+        moves = organizer.create_organized_structure(dry_run=args.dry_run)
+
+    for old, new in moves:
+        out.emit('move', source=f"images/{old}", target=f"images/{new}", dry_run=args.dry_run)
+    for issue in organizer.report['issues']:
+        out.emit('error', message=issue)
+    out.emit('summary', command='organize', moves=len(moves), dry_run=args.dry_run,
+             issues=len(organizer.report['issues']))
+    return EXIT_PROBLEMS if organizer.report['issues'] else EXIT_OK
+
+
+def cmd_rewrite_css(args, out):
+    from update_css_paths import CSSPathUpdater
+
+    updater = CSSPathUpdater(args.root)
+    with out.tool_output():
+        # Preview first; nothing is written until confirmed
+        updater.update_image_paths(dry_run=True)
+        updater.add_carousel_css(dry_run=True)
+        if not args.dry_run:
+            if not confirm(args, f"Apply {len(updater.changes_made)} CSS path changes?"):
+                out.emit('error', message="changes need confirmation; pass --yes or --dry-run")
+                return EXIT_NOT_CONFIRMED
+            updater.changes_made = []
+            updater.errors = []
+            updater.backup_css_files()
+            updater.update_image_paths(dry_run=False)
+            updater.add_carousel_css(dry_run=False)
+
+    for change in updater.changes_made:
+        out.emit('change', dry_run=args.dry_run, **change)
+    for error in updater.errors:
+        out.emit('error', message=error)
+    out.emit('summary', command='rewrite-css', changes=len(updater.changes_made), dry_run=args.dry_run,
+             errors=len(updater.errors))
+    return EXIT_PROBLEMS if updater.errors else EXIT_OK
+
+
+def cmd_fix_paths(args, out):
+    from fix_remaining_paths import fix_remaining_paths, verify_image_paths
+
+    with out.tool_output():
+        findings = fix_remaining_paths(args.root, dry_run=args.dry_run, jobs=args.jobs)
+        missing = verify_image_paths(args.root) if findings is not None and not args.dry_run else []
+
+    if findings is None:
+        out.emit('error', message=f"images directory not found under {args.root}")
+        return EXIT_PROBLEMS
+    fixes = [finding for finding in findings if finding['new_path']]
+    unresolved = [finding for finding in findings if not finding['new_path']]
+    for fix in fixes:
+        out.emit('change', file=fix['file'], old_path=fix['old_path'], new_path=fix['new_path'],
+                 method=fix['method'], dry_run=args.dry_run)
+    for finding in unresolved:
+        out.emit('missing', path=finding['old_path'], referrer=finding['file'],
+                 ambiguous=bool(finding['candidates']), candidates=finding['candidates'])
+    # Only report what verification found beyond the references already flagged above
+    missing = [path for path in missing if path not in {f['old_path'] for f in unresolved}]
+    for path in missing:
+        out.emit('missing', path=path, referrer='main.css')
+    out.emit('summary', command='fix-paths', fixes=len(fixes), unresolved=len(unresolved),
+             missing=len(missing), dry_run=args.dry_run)
+    return EXIT_PROBLEMS if missing or unresolved else EXIT_OK
+
+
+def cmd_prettify(args, out):
+    from prettify_html import prettify_files, CACHE_FILENAME
+    from backup_store import BackupStore
+
+    html_files = sorted(str(path) for path in Path(args.root).glob('*.html'))
+    with out.tool_output():
+        results = prettify_files(html_files, jobs=args.jobs, cache_file=str(Path(args.root) / CACHE_FILENAME),
+                                 backup_store=BackupStore(args.root), dry_run=args.dry_run)
+
+    for result in results:
+        if result['error']:
+            out.emit('error', file=result['file'], message=result['error'])
+        elif args.dry_run:
+            if result['changed']:
+                out.emit('change', file=result['file'], dry_run=True)
+        else:
+            out.emit('file', file=result['file'], changed=result['changed'], skipped=result['skipped'],
+                     parse_ms=round(result['parse_ms'], 1), serialize_ms=round(result['serialize_ms'], 1))
+    errors = sum(1 for r in results if r['error'])
+    out.emit('summary', command='prettify', files=len(results),
+             changed=sum(1 for r in results if r['changed']), errors=errors, dry_run=args.dry_run)
+    return EXIT_PROBLEMS if errors else EXIT_OK
+
+
+def cmd_derivatives(args, out):
+    from build_derivatives import DerivativeBuilder
+
+    builder = DerivativeBuilder(args.root, jobs=args.jobs)
+    with out.tool_output():
+        manifest = builder.build(dry_run=args.dry_run)
+
+    if manifest is None:
+        out.emit('error', message="Pillow with WebP support is required to build derivatives")
+        return EXIT_PROBLEMS
+    for issue in builder.issues:
+        out.emit('error', message=issue)
+    out.emit('summary', command='derivatives', sources=len(manifest), pending=len(builder.pending),
+             encoded=builder.encoded, pruned=builder.pruned, dry_run=args.dry_run)
+    return EXIT_PROBLEMS if builder.issues else EXIT_OK
+
+
+def cmd_build_pages(args, out):
+    from build_pages import PageBuilder
+
+    builder = PageBuilder(args.root, jobs=args.jobs)
+    with out.tool_output():
+        stats = builder.build()
+
+    for issue in builder.issues:
+        out.emit('error', message=issue)
+    out.emit('summary', command='build-pages', output=str(builder.output_dir), **stats)
+    return EXIT_PROBLEMS if builder.issues else EXIT_OK
+
+
+def cmd_bundles(args, out):
+    from bundle_analyzer import BundleAnalyzer
+    from backup_store import BackupStore
+
+    analyzer = BundleAnalyzer(args.root)
+    with out.tool_output():
+        plans, duplicates = analyzer.analyze()
+
+    for name, sources in duplicates.items():
+        out.emit('duplicate', library=name, sources=[source['script'] for source in sources])
+    for plan in plans:
+        out.emit('page', page=plan['page'], scripts=plan['scripts'], dropped=plan['dropped'],
+                 bytes_saved=plan['bytes_saved'], parse_ms_saved=plan['parse_ms_saved'], dry_run=args.dry_run)
+        for name in plan['unmet']:
+            out.emit('missing', library=name, referrer=plan['page'])
+
+    changed = [plan for plan in plans if plan['changed']]
+    if changed and not args.dry_run:
+        if not confirm(args, f"Rewrite the script tags of {len(changed)} pages?"):
+            out.emit('error', message=f"{len(changed)} pages need confirmation; pass --yes or --dry-run")
+            return EXIT_NOT_CONFIRMED
+        with out.tool_output():
+            analyzer.apply(plans, backup_store=BackupStore(args.root))
+    else:
+        analyzer.apply(plans, dry_run=True)
+
+    for issue in analyzer.issues:
+        out.emit('error', message=issue)
+    unmet = sum(len(plan['unmet']) for plan in plans)
+    out.emit('summary', command='bundles', pages=len(changed), bytes_saved=sum(p['bytes_saved'] for p in plans),
+             unmet=unmet, dry_run=args.dry_run)
+    return EXIT_PROBLEMS if unmet or analyzer.issues else EXIT_OK
+
+
+def cmd_video_feed(args, out):
+    from video_feed import VideoFeed
+
+    feed = VideoFeed(args.root, source=args.feed, ttl=args.ttl)
+    try:
+        items, status = feed.fetch(force=args.refresh, save=not args.dry_run)
+    except Exception as e:
+        out.emit('error', message=f"could not fetch {feed.source}: {e}")
+        return EXIT_PROBLEMS
+    if status == 'stale':
+        out.emit('error', message=f"fetch failed ({feed.error}); using the cached feed")
+    changed = [] if args.dry_run else feed.publish(items)
+    for file_name in changed:
+        out.emit('change', file=file_name)
+    out.emit('summary', command='video-feed', status=status, videos=len(items),
+             latest=items[0]['title'] if items else None, changed=len(changed), dry_run=args.dry_run)
+    return EXIT_OK if items else EXIT_PROBLEMS
+
+
+def cmd_verify(args, out):
+    from update_css_paths import CSSPathUpdater
+
+    with out.tool_output():
+        missing = CSSPathUpdater(args.root).verify_image_paths()
+
+    for item in missing:
+        out.emit('missing', path=item['image_path'], referrer=item['css_file'])
+    out.emit('summary', command='verify', missing=len(missing))
+    return EXIT_PROBLEMS if missing else EXIT_OK
+
+
+def cmd_watch(args, out):
+    from watch_site import SiteWatcher
+
+    out.follow = True
+    watcher = SiteWatcher(args.root, organize=args.organize and not args.dry_run,
+                          report=out.emit, polling=args.poll)
+    with out.tool_output():
+        return watcher.run()
+
+
+def cmd_serve(args, out):
+    import asyncio
+    from serve_site import StaticServer
+    from build_dist import DIST_DIRNAME
+
+    site_dir = Path(args.root) / DIST_DIRNAME if args.dist else Path(args.root)
+    if not site_dir.is_dir():
+        out.emit('error', message=f"{site_dir} not found; run build_dist.py first")
+        return EXIT_PROBLEMS
+    server = StaticServer(site_dir, args.host, args.port)
+    out.follow = True
+    out.emit('serving', root=str(site_dir), url=f"http://{args.host}:{args.port}/")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    out.emit('summary', command='serve', **server.stats)
+    return EXIT_OK
+
+
+COMMANDS = {
+    'scan': (cmd_scan, "Scan and categorize images, flag oversized and duplicate files"),
+    'organize': (cmd_organize, "Move images into their category directories (journaled)"),
+    'rewrite-css': (cmd_rewrite_css, "Rewrite CSS url() paths to the organized layout"),
+    'fix-paths': (cmd_fix_paths, "Find where missing images went and fix the CSS/HTML references"),
+    'prettify': (cmd_prettify, "Prettify the HTML pages"),
+    'derivatives': (cmd_derivatives, "Build resized WebP/AVIF image derivatives and prune stale ones"),
+    'build-pages': (cmd_build_pages, "Compose pages with their partials into build/ (incremental)"),
+    'bundles': (cmd_bundles, "Drop unused and duplicate scripts from each page and defer the rest"),
+    'video-feed': (cmd_video_feed, "Fetch the latest YouTube video and bake its title into index.html"),
+    'verify': (cmd_verify, "Check that every image referenced from CSS exists"),
+    'watch': (cmd_watch, "Watch images, CSS and HTML and re-run the affected stages on change"),
+    'serve': (cmd_serve, "Serve the site (or dist/) locally with production-like caching headers"),
+}
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--root', default=os.getcwd(), help="site root (default: current directory)")
+    common.add_argument('--jobs', '-j', type=int, default=None, help="worker threads/processes")
+    common.add_argument('--dry-run', '-n', action='store_true', help="report what would change, write nothing")
+    common.add_argument('--yes', '-y', action='store_true', help="apply changes without asking")
+    common.add_argument('--json', action='store_true', help="write results as JSON lines")
+    common.add_argument('--verbose', '-v', action='store_true', help="show the tools' per-file output")
+    common.add_argument('--profile', action='store_true', help="time each stage and count file/syscall calls")
+    common.add_argument('--profile-output', metavar='FILE', help="also write cProfile stats to FILE (implies --profile)")
+
+    parser = argparse.ArgumentParser(prog='churchsite', description="Church website maintenance tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (handler, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, parents=[common], help=help_text, description=help_text)
+        subparser.set_defaults(handler=handler)
+        if name == 'organize':
+            group = subparser.add_mutually_exclusive_group()
+            group.add_argument('--resume', action='store_true', help="finish an interrupted organize run")
+            group.add_argument('--rollback', action='store_true', help="undo an interrupted organize run")
+        if name == 'watch':
+            subparser.add_argument('--organize', action='store_true', help="move new images into their category")
+            subparser.add_argument('--poll', action='store_true', help="poll instead of using filesystem events")
+        if name == 'video-feed':
+            subparser.add_argument('--feed', help="feed URL or a local stand-in feed file (default: the channel's feed)")
+            subparser.add_argument('--ttl', type=int, default=3600, help="seconds a cached feed is used without asking")
+            subparser.add_argument('--refresh', action='store_true', help="revalidate even if the cache is fresh")
+        if name == 'serve':
+            subparser.add_argument('--dist', action='store_true', help="serve the built dist/ tree")
+            subparser.add_argument('--host', default='127.0.0.1')
+            subparser.add_argument('--port', type=int, default=8000)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.root = str(Path(args.root).resolve())
+    out = Output(as_json=args.json, verbose=args.verbose)
+
+    if not Path(args.root).is_dir():
+        out.emit('error', message=f"root is not a directory: {args.root}")
+        return EXIT_USAGE
+
+    # The tools import each other as top-level modules
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from profiling import PROFILER
+
+    profile = args.profile or bool(args.profile_output)
+    if profile:
+        PROFILER.enable(cprofile=bool(args.profile_output))
+    try:
+        if profile:
+            with PROFILER.stage(f"churchsite {args.command}"):
+                return args.handler(args, out)
+        return args.handler(args, out)
+    except KeyboardInterrupt:
+        out.emit('error', message='interrupted')
+        return 130
+    except Exception as e:
+        out.emit('error', message=f"{type(e).__name__}: {e}")
+        return EXIT_PROBLEMS
+    finally:
+        if profile:
+            report_profile(args, out)
+
+
+def report_profile(args, out):
+    """Stop profiling and report the per-stage table (or 'profile' records with --json)"""
+    from profiling import PROFILER
+
+    PROFILER.disable()
+    if args.json:
+        for row in PROFILER.summary():
+            out.emit('profile', **{key: round(value, 4) if isinstance(value, float) else value
+                                   for key, value in row.items()})
+    else:
+        PROFILER.print_summary(out.stream)
+    if args.profile_output and PROFILER.dump(args.profile_output):
+        out.emit('profile_output', file=args.profile_output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Critical CSS Extraction Script for Church Website
+Matches the rules of the site stylesheets against each page's DOM and
+writes, per page, a critical CSS block for inlining (rules that style
+above-the-fold elements) and a pruned stylesheet without unused rules.
+"""
+
+import os
+import re
+import sys
+import json
+import posixpath
+from pathlib import Path
+from html.parser import HTMLParser
+
+from update_css_paths import CSSPathUpdater
+from css_index import serialize_stylesheet, tokenize, apply_splices
+from asset_graph import EXTERNAL_PATTERN
+from build_dist import minify_css, DIST_DIRNAME
+
+OUTPUT_DIRNAME = 'critical'
+# Elements rendered before this many body elements count as above the fold
+FOLD_ELEMENT_LIMIT = 250
+# Markup built by bundles (e.g. the nav template in nav.bundle.js)
+TEMPLATE_PATTERN = re.compile(r'`([^`]*<[a-zA-Z][^`]*)`')
+# Quoted tokens in bundles that may be added as classes or ids at runtime
+JS_TOKEN_PATTERN = re.compile(r'''["'`]([\w\s-]{1,80})["'`]''')
+COMBINATOR_PATTERN = re.compile(r'\s*[>+~]\s*|\s+')
+SIMPLE_SELECTOR_PATTERN = re.compile(r'''
+    (?P<tag>^\*|^[a-zA-Z][\w-]*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?P<value>"[^"]*"|'[^']*'|[^\]\s]+)\s*(?:[iIsS]\s*)?)?\]
+  | ::?[\w-]+(?:\((?:[^()]|\([^()]*\))*\))?
+''', re.VERBOSE)
+
+
+class _PageParser(HTMLParser):
+    """Collects every element as {'tag', 'id', 'classes', 'attrs', 'fold'}"""
+
+    def __init__(self, above_fold=False):
+        super().__init__(convert_charrefs=True)
+        self.elements = []
+        self.scripts = []
+        self.stylesheets = []
+        self.in_body = above_fold
+        self.body_count = 0
+        self.always_above_fold = above_fold
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or '' for name, value in attrs}
+        if tag == 'body':
+            self.in_body = True
+        if self.in_body:
+            self.body_count += 1
+        if tag == 'script' and attrs.get('src'):
+            self.scripts.append(attrs['src'])
+        if tag == 'link' and 'stylesheet' in attrs.get('rel', '').split():
+            self.stylesheets.append(attrs.get('href', ''))
+
+        self.elements.append({
+            'tag': tag,
+            'id': attrs.get('id'),
+            'classes': set(attrs.get('class', '').split()),
+            'attrs': attrs,
+            'fold': self.always_above_fold or not self.in_body or self.body_count <= FOLD_ELEMENT_LIMIT
+        })
+
+    handle_startendtag = handle_starttag
+
+
+class PageModel:
+    """Indexes a page's elements for fast compound selector lookups"""
+
+    def __init__(self, elements, dynamic_tokens=()):
+        self.elements = elements
+        self.dynamic_tokens = set(dynamic_tokens)
+        self.by_tag, self.by_id, self.by_class = {}, {}, {}
+        for element in elements:
+            self.by_tag.setdefault(element['tag'], []).append(element)
+            if element['id']:
+                self.by_id.setdefault(element['id'], []).append(element)
+            for cls in element['classes']:
+                self.by_class.setdefault(cls, []).append(element)
+
+    def candidates(self, compound):
+        if compound['id']:
+            return self.by_id.get(compound['id'], [])
+        if compound['classes']:
+            return self.by_class.get(compound['classes'][0], [])
+        if compound['tag']:
+            return self.by_tag.get(compound['tag'], [])
+        return self.elements
+
+    def matches(self, compound, fold_only=False):
+        """True if some element satisfies every part of the compound selector"""
+        for element in self.candidates(compound):
+            if fold_only and not element['fold']:
+                continue
+            if compound['tag'] and element['tag'] != compound['tag']:
+                continue
+            if compound['id'] and element['id'] != compound['id']:
+                continue
+            if not all(cls in element['classes'] for cls in compound['classes']):
+                continue
+            if all(_attr_matches(element['attrs'], condition) for condition in compound['attrs']):
+                return True
+        return False
+
+    def may_match(self, compound):
+        """Looser check for states added by scripts: every class/id exists somewhere"""
+        if compound['tag'] and compound['tag'] not in self.by_tag:
+            return False
+        if compound['id'] and compound['id'] not in self.by_id and compound['id'] not in self.dynamic_tokens:
+            return False
+        return all(cls in self.by_class or cls in self.dynamic_tokens for cls in compound['classes'])
+
+
+def _attr_matches(attrs, condition):
+    name, op, value = condition
+    if name not in attrs:
+        return False
+    actual = attrs[name]
+    if op is None:
+        return True
+    if op == '=':
+        return actual == value
+    if op == '~=':
+        return value in actual.split()
+    if op == '|=':
+        return actual == value or actual.startswith(value + '-')
+    if op == '^=':
+        return actual.startswith(value)
+    if op == '$=':
+        return actual.endswith(value)
+    return value in actual
+
+
+def parse_compound(text):
+    """Parse one compound selector; pseudo-classes and pseudo-elements are ignored"""
+    compound = {'tag': None, 'id': None, 'classes': [], 'attrs': []}
+    for match in SIMPLE_SELECTOR_PATTERN.finditer(text):
+        if match.group('tag'):
+            compound['tag'] = None if match.group('tag') == '*' else match.group('tag').lower()
+        elif match.group('id'):
+            compound['id'] = match.group('id')
+        elif match.group('cls'):
+            compound['classes'].append(match.group('cls'))
+        elif match.group('attr'):
+            value = match.group('value')
+            if value and value[0] in '"\'':
+                value = value[1:-1]
+            compound['attrs'].append((match.group('attr').lower(), match.group('op'), value))
+    return compound
+
+
+def parse_selector(selector):
+    """Split a complex selector into compounds, ignoring the combinators"""
+    # Drop functional pseudo-classes first so their arguments are not read as compounds
+    selector = re.sub(r':(?:not|is|where|has|nth-[\w-]+)\((?:[^()]|\([^()]*\))*\)', '', selector)
+    return [parse_compound(part) for part in COMBINATOR_PATTERN.split(selector.strip()) if part]
+
+
+class CriticalCSSExtractor:
+    def __init__(self, project_root, output_dir=None):
+        self.project_root = Path(project_root)
+        self.output_dir = Path(output_dir) if output_dir else self.project_root / DIST_DIRNAME / OUTPUT_DIRNAME
+        self.updater = CSSPathUpdater(project_root)
+        self.selector_cache = {}
+        self.bundle_cache = {}
+        self.results = []
+
+    def compounds(self, selector):
+        compounds = self.selector_cache.get(selector)
+        if compounds is None:
+            compounds = self.selector_cache[selector] = parse_selector(selector)
+        return compounds
+
+    def bundle_info(self, src):
+        """Template markup and quoted tokens of one local script, read once per run"""
+        if src not in self.bundle_cache:
+            script = self.project_root / src.split('?', 1)[0]
+            markup, tokens = [], set()
+            if not re.match(r'^(?:[a-z]+:)?//', src) and script.is_file():
+                text = script.read_text(encoding='utf-8', errors='replace')
+                markup = TEMPLATE_PATTERN.findall(text)
+                for token in JS_TOKEN_PATTERN.findall(text):
+                    tokens.update(token.split())
+            self.bundle_cache[src] = (markup, tokens)
+        return self.bundle_cache[src]
+
+    def load_page(self, page):
+        parser = _PageParser()
+        with open(page, 'r', encoding='utf-8') as f:
+            parser.feed(f.read())
+        parser.close()
+
+        elements = list(parser.elements)
+        tokens = set()
+        for src in parser.scripts:
+            markup, script_tokens = self.bundle_info(src)
+            tokens |= script_tokens
+            # Script-built markup (the nav header) is rendered immediately
+            for template in markup:
+                template_parser = _PageParser(above_fold=True)
+                template_parser.feed(re.sub(r'\$\{[^}]*\}', '', template))
+                elements.extend(template_parser.elements)
+                for element in template_parser.elements:
+                    for name, value in element['attrs'].items():
+                        if name.startswith('data-') and name.endswith('classes'):
+                            tokens.update(value.split())
+        for element in elements:
+            for name, value in element['attrs'].items():
+                if name.startswith('data-') and name.endswith('classes'):
+                    tokens.update(value.split())
+
+        return PageModel(elements, tokens), parser.stylesheets
+
+    def filter_rules(self, nodes, model, critical):
+        """Return copies of nodes keeping only selectors used on the page"""
+        kept = []
+        for node in nodes:
+            if node['type'] == 'rule':
+                selectors = []
+                for selector in node['selectors']:
+                    compounds = self.compounds(selector)
+                    if not compounds:
+                        continue
+                    *ancestors, subject = compounds
+                    if critical:
+                        used = model.matches(subject, fold_only=True) and all(model.matches(c) for c in ancestors)
+                    else:
+                        used = all(model.matches(c) or model.may_match(c) for c in compounds)
+                    if used:
+                        selectors.append(selector)
+                if selectors:
+                    kept.append({'type': 'rule', 'selectors': selectors, 'body': node['body']})
+            elif node['type'] == 'at':
+                children = self.filter_rules(node['children'], model, critical)
+                if children:
+                    kept.append({'type': 'at', 'prelude': node['prelude'], 'children': children})
+            elif not critical or node['text'].lower().startswith(('@font-face', '@charset')):
+                # @import/@keyframes stay in the full pruned sheet only
+                kept.append(node)
+        return kept
+
+    def process_page(self, page):
+        stylesheets = self.updater.load_stylesheets()
+        model, linked = self.load_page(page)
+        # Keep the page's <link> order so the cascade is unchanged
+        linked_names = [Path(href.split('?', 1)[0]).name for href in linked]
+        sheets = [stylesheets[name] for name in dict.fromkeys(linked_names) if name in stylesheets]
+
+        original = sum(sheet['size'] for sheet in sheets)
+        rules = [node for sheet in sheets for node in sheet['rules']]
+        critical = minify_css(serialize_stylesheet(self.filter_rules(rules, model, critical=True)))
+        pruned = minify_css(serialize_stylesheet(self.filter_rules(rules, model, critical=False)))
+        # The critical block is inlined into the page; the pruned sheet lives in the output directory
+        pruned = rebase_urls(pruned, '.', Path(os.path.relpath(self.output_dir, self.project_root)).as_posix())
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stem = Path(page).stem
+        (self.output_dir / f"{stem}.critical.css").write_text(critical, encoding='utf-8')
+        pruned_file = self.output_dir / f"{stem}.pruned.css"
+        pruned_file.write_text(pruned, encoding='utf-8')
+        # The <link> goes into the page, so its href is relative to the page's directory
+        href = Path(os.path.relpath(os.path.abspath(pruned_file), os.path.dirname(os.path.abspath(page)))).as_posix()
+        (self.output_dir / f"{stem}.critical.html").write_text(inline_block(critical, href), encoding='utf-8')
+
+        result = {
+            'page': Path(page).name,
+            'stylesheets': [name for name in dict.fromkeys(linked_names) if name in stylesheets],
+            'original_bytes': original,
+            'pruned_bytes': len(pruned.encode('utf-8')),
+            'critical_bytes': len(critical.encode('utf-8')),
+        }
+        result['saved_bytes'] = result['original_bytes'] - result['pruned_bytes']
+        self.results.append(result)
+        return result
+
+    def run(self, pages=None):
+        pages = pages or sorted(self.project_root.glob('*.html'))
+        for page in pages:
+            try:
+                self.process_page(page)
+            except Exception as e:
+                print(f"  ❌ Error processing {Path(page).name}: {e}")
+        return self.results
+
+
+def rebase_urls(css, from_dir, to_dir):
+    """Rewrite the relative url()/@import paths of CSS written for from_dir so they work from to_dir"""
+    data = css.encode('utf-8')
+    splices = []
+    for ref in tokenize(data):
+        path = ref['path']
+        if not path or path.startswith(('/', 'data:')) or EXTERNAL_PATTERN.match(path):
+            continue
+        split = min((i for i in (path.find('?'), path.find('#')) if i != -1), default=len(path))
+        target = posixpath.normpath(posixpath.join(from_dir, path[:split]))
+        new_path = posixpath.relpath(target, to_dir) + path[split:]
+        if new_path != path:
+            splices.append((ref['start'], ref['end'], new_path.encode('utf-8')))
+    return apply_splices(data, splices).decode('utf-8') if splices else css
+
+
+def inline_block(critical_css, stylesheet_href):
+    """Markup that inlines the critical CSS and loads the rest without blocking render"""
+    return (
+        f"<style>{critical_css}</style>\n"
+        f'<link rel="preload" href="{stylesheet_href}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        f'<noscript><link rel="stylesheet" href="{stylesheet_href}"></noscript>\n'
+    )
+
+
+def format_size(size_bytes):
+    """Format file size in human readable format"""
+    for unit in ['B', 'KB', 'MB']:
+        if size_bytes < 1024.0:
+            return f"{size_bytes:.1f} {unit}"
+        size_bytes /= 1024.0
+    return f"{size_bytes:.1f} GB"
+
+
+def main():
+    project_root = os.getcwd()
+
+    print("Church Website Critical CSS Extractor")
+    print(f"Project root: {project_root}")
+
+    extractor = CriticalCSSExtractor(project_root)
+    results = extractor.run()
+
+    print(f"\n{'Page':<26}{'Linked CSS':>12}{'Pruned':>12}{'Critical':>12}{'Saved':>12}")
+    for r in results:
+        print(f"{r['page']:<26}{format_size(r['original_bytes']):>12}{format_size(r['pruned_bytes']):>12}"
+              f"{format_size(r['critical_bytes']):>12}{format_size(r['saved_bytes']):>12}")
+
+    report_file = extractor.output_dir / 'report.json'
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nOutput written to: {extractor.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+CSS Reference Index for Church Website
+Tokenizes each stylesheet once and records every url(), image-set() and
+@import reference with its byte offsets. Results are cached by file
+mtime/size and content hash so the organizer, the CSS path updater and the
+path fixer can all query references without re-reading unchanged files.
+"""
+
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+
+from image_index import IMAGE_EXTENSIONS
+
+CACHE_FILENAME = '.css_index.json'
+CACHE_VERSION = 1
+
+# Comments and plain strings are consumed so nothing inside them is reported
+TOKEN_PATTERN = re.compile(rb'''
+    (?P<comment>/\*.*?\*/)
+  | url\(\s*(?P<uq>["']?)(?P<url>[^"')]*?)(?P=uq)\s*\)
+  | (?P<imageset>(?:-webkit-)?image-set\()
+  | @import\s+(?P<iq>["'])(?P<import>[^"']*)(?P=iq)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+''', re.IGNORECASE | re.DOTALL | re.VERBOSE)
+
+# Inside image-set(): quoted candidates, url() candidates and the closing paren
+IMAGE_SET_PATTERN = re.compile(rb'''
+    url\(\s*(?P<uq>["']?)(?P<url>[^"')]*?)(?P=uq)\s*\)
+  | (?P<q>["'])(?P<string>[^"']*)(?P=q)
+  | (?P<open>\()
+  | (?P<close>\))
+''', re.IGNORECASE | re.VERBOSE)
+
+
+def tokenize(data):
+    """Return [{'kind', 'path', 'start', 'end'}] for every reference in CSS bytes"""
+    refs = []
+    pos = 0
+    while True:
+        match = TOKEN_PATTERN.search(data, pos)
+        if not match:
+            break
+        pos = match.end()
+
+        if match.group('url') is not None:
+            # @import url(...) is still an import
+            prefix = data[max(0, match.start() - 16):match.start()].rstrip().lower()
+            kind = 'import' if prefix.endswith(b'@import') else 'url'
+            refs.append(_ref(kind, match, 'url'))
+        elif match.group('import') is not None:
+            refs.append(_ref('import', match, 'import'))
+        elif match.group('imageset') is not None:
+            depth = 1
+            while depth:
+                inner = IMAGE_SET_PATTERN.search(data, pos)
+                if not inner:
+                    break
+                pos = inner.end()
+                if inner.group('open'):
+                    depth += 1
+                elif inner.group('close'):
+                    depth -= 1
+                elif inner.group('url') is not None:
+                    refs.append(_ref('image-set', inner, 'url'))
+                else:
+                    refs.append(_ref('image-set', inner, 'string'))
+    return refs
+
+
+def _ref(kind, match, group):
+    return {
+        'kind': kind,
+        'path': match.group(group).decode('utf-8', 'replace').strip(),
+        'start': match.start(group),
+        'end': match.end(group)
+    }
+
+
+def is_image_ref(path):
+    """True for references to local image files"""
+    if path.startswith('data:'):
+        return False
+    return os.path.splitext(path.split('?', 1)[0].split('#', 1)[0])[1].lower() in IMAGE_EXTENSIONS
+
+
+def apply_splices(data, splices):
+    """Apply (start, end, replacement_bytes) splices to data in one pass"""
+    parts = []
+    pos = 0
+    for start, end, replacement in sorted(splices):
+        parts.append(data[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(data[pos:])
+    return b''.join(parts)
+
+
+class CSSIndex:
+    def __init__(self, project_root, cache_file=None):
+        self.project_root = Path(project_root)
+        self.cache_file = Path(cache_file) if cache_file else self.project_root / CACHE_FILENAME
+        self.files = None
+        self.dirty = False
+        self.stats = {'cached': 0, 'tokenized': 0}
+
+    def load(self):
+        """Load cached references, ignoring missing or stale caches"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.files = data['files'] if data.get('version') == CACHE_VERSION else {}
+        except (OSError, ValueError, KeyError):
+            self.files = {}
+        return self.files
+
+    def save(self):
+        """Write the cache back to disk if anything changed"""
+        if not self.dirty:
+            return
+        tmp_file = self.cache_file.with_name(self.cache_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': self.files}, f, separators=(',', ':'))
+        os.replace(tmp_file, self.cache_file)
+        self.dirty = False
+
+    def refs(self, css_file):
+        """Return the references of one stylesheet, re-tokenizing only if it changed"""
+        if self.files is None:
+            self.load()
+
+        css_file = Path(css_file)
+        key = css_file.resolve().relative_to(self.project_root.resolve()).as_posix()
+        st = css_file.stat()
+        cached = self.files.get(key)
+        if cached and cached['mtime'] == st.st_mtime_ns and cached['size'] == st.st_size:
+            self.stats['cached'] += 1
+            return cached['refs']
+
+        data = css_file.read_bytes()
+        digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+        if cached and cached['hash'] == digest:
+            # Touched but unchanged: keep the references, refresh the stat key
+            refs = cached['refs']
+            self.stats['cached'] += 1
+        else:
+            refs = tokenize(data)
+            self.stats['tokenized'] += 1
+
+        self.files[key] = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'hash': digest, 'refs': refs}
+        self.dirty = True
+        return refs
+
+    def image_refs(self, css_files=None):
+        """Yield (css_file, ref) for every image reference in the given stylesheets"""
+        if css_files is None:
+            css_files = sorted(self.project_root.glob('*.css'))
+        for css_file in css_files:
+            for ref in self.refs(css_file):
+                if is_image_ref(ref['path']):
+                    yield Path(css_file), ref
+        self.save()
+
+    def rewrite_refs(self, css_file, mapper, dry_run=True):
+        """Splice mapper(path) over every reference at its recorded offsets
+
+        Returns a list of (old_path, new_path) for the references that changed.
+        """
+        refs = self.refs(css_file)
+        splices = []
+        changes = []
+        for ref in refs:
+            new_path = mapper(ref['path'])
+            if new_path and new_path != ref['path']:
+                splices.append((ref['start'], ref['end'], new_path.encode('utf-8')))
+                changes.append((ref['path'], new_path))
+
+        if changes and not dry_run:
+            data = Path(css_file).read_bytes()
+            Path(css_file).write_bytes(apply_splices(data, splices))
+            # Offsets moved; the next query will re-tokenize this file
+            self.files.pop(Path(css_file).resolve().relative_to(self.project_root.resolve()).as_posix(), None)
+            self.dirty = True
+            self.save()
+        return changes
+
+
+# Block at-rules whose contents are ordinary rules
+NESTED_AT_RULES = {'media', 'supports', 'document', '-moz-document', 'layer', 'container'}
+
+
+def _skip_string_or_comment(css, i):
+    """If css[i] starts a string or comment, return the index just past it"""
+    char = css[i]
+    if char in '"\'':
+        j = i + 1
+        while j < len(css) and css[j] != char:
+            j += 2 if css[j] == '\\' else 1
+        return j + 1
+    if css.startswith('/*', i):
+        end = css.find('*/', i + 2)
+        return len(css) if end == -1 else end + 2
+    return None
+
+
+def _find(css, i, stops):
+    """Index of the first top-level character in stops at or after i"""
+    depth = 0
+    while i < len(css):
+        skipped = _skip_string_or_comment(css, i)
+        if skipped is not None:
+            i = skipped
+            continue
+        char = css[i]
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif depth <= 0 and char in stops:
+            return i
+        i += 1
+    return len(css)
+
+
+def _block_end(css, open_index):
+    """Index of the '}' closing the block opened at open_index"""
+    depth = 0
+    i = open_index
+    while i < len(css):
+        skipped = _skip_string_or_comment(css, i)
+        if skipped is not None:
+            i = skipped
+            continue
+        if css[i] == '{':
+            depth += 1
+        elif css[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(css)
+
+
+def split_selectors(selector_text):
+    """Split a selector list on top-level commas"""
+    selectors = []
+    start = 0
+    while start < len(selector_text):
+        end = _find(selector_text, start, ',')
+        selector = selector_text[start:end].strip()
+        if selector:
+            selectors.append(selector)
+        start = end + 1
+    return selectors
+
+
+def parse_stylesheet(css):
+    """Parse CSS text into a list of nodes
+
+    {'type': 'rule', 'selectors': [...], 'body': '...'} for style rules,
+    {'type': 'at', 'prelude': '@media ...', 'children': [...]} for block
+    at-rules holding rules, and {'type': 'raw', 'text': '...'} for anything
+    kept verbatim (@import, @font-face, @keyframes, ...).
+    """
+    nodes = []
+    i = 0
+    while i < len(css):
+        if css[i].isspace():
+            i += 1
+            continue
+        if css.startswith('/*', i):
+            i = _skip_string_or_comment(css, i)
+            continue
+
+        stop = _find(css, i, '{;}' if css[i] == '@' else '{}')
+        if stop >= len(css) or css[stop] == '}':
+            # Stray text or an unbalanced brace: skip past it
+            i = stop + 1
+            continue
+
+        prelude = css[i:stop].strip()
+        if css[stop] == ';':
+            nodes.append({'type': 'raw', 'text': css[i:stop + 1].strip()})
+            i = stop + 1
+            continue
+
+        end = _block_end(css, stop)
+        if prelude.startswith('@'):
+            name = re.match(r'@([\w-]+)', prelude)
+            if name and name.group(1).lower() in NESTED_AT_RULES:
+                nodes.append({'type': 'at', 'prelude': prelude, 'children': parse_stylesheet(css[stop + 1:end])})
+            else:
+                nodes.append({'type': 'raw', 'text': css[i:end + 1].strip()})
+        else:
+            nodes.append({'type': 'rule', 'selectors': split_selectors(prelude), 'body': css[stop + 1:end].strip()})
+        i = end + 1
+    return nodes
+
+
+def serialize_stylesheet(nodes):
+    """Turn parsed nodes back into compact CSS, dropping empty blocks"""
+    parts = []
+    for node in nodes:
+        if node['type'] == 'rule':
+            if node['selectors']:
+                parts.append(f"{','.join(node['selectors'])}{{{node['body']}}}")
+        elif node['type'] == 'at':
+            inner = serialize_stylesheet(node['children'])
+            if inner:
+                parts.append(f"{node['prelude']}{{{inner}}}")
+        else:
+            parts.append(node['text'])
+    return ''.join(parts)
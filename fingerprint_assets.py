@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Asset Fingerprinting Script for Church Website
+Publishes every CSS, JS, image and font in the built dist/ tree under a
+content-hashed name (main.css -> main.1a2b3c4d.css) and rewrites the
+references in HTML, CSS and bundles so those files can be served with
+long-lived immutable caching. Runs incrementally: only assets whose
+content changed are re-hashed, and only their referrers are rewritten.
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import posixpath
+from pathlib import Path
+
+from asset_graph import scan_site_files, resolve
+from build_dist import DIST_DIRNAME, COMPRESSIBLE_EXTENSIONS, MIN_COMPRESS_SIZE, write_compressed
+
+MANIFEST_NAME = 'asset-manifest.json'
+STATE_NAME = '.fingerprint-state.json'
+HASH_LENGTH = 8
+BINARY_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.avif', '.woff', '.woff2', '.ttf'}
+FINGERPRINT_EXTENSIONS = BINARY_EXTENSIONS | {'.css', '.js'}
+REFERRER_EXTENSIONS = {'.html', '.css', '.js', '.json', '.xml', '.webapp'}
+# Leaves first, then CSS (may reference images), then JS, then pages; within a
+# phase, assets are ordered so @import targets and imported modules go first
+PHASES = (BINARY_EXTENSIONS, {'.css'}, {'.js'}, {'.html', '.json', '.xml', '.webapp'})
+
+HASHED_NAME_PATTERN = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^.]+)$' % HASH_LENGTH)
+# A relative asset path inside any text: attribute values, url(), string literals
+REF_PATTERN = re.compile(
+    r'(?<![\w@%+~./-])((?:\.{1,2}/)*[\w@%+~-][\w@%+~./-]*\.(?:' +
+    '|'.join(ext.lstrip('.') for ext in sorted(FINGERPRINT_EXTENSIONS)) +
+    r'))(?!\.?[\w-])', re.IGNORECASE)
+
+
+def content_hash(data):
+    """Short hex content hash used in published file names"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(relative_path, digest):
+    """main.css + 1a2b3c4d -> main.1a2b3c4d.css"""
+    stem, ext = posixpath.splitext(relative_path)
+    return f"{stem}.{digest}{ext}"
+
+
+class AssetFingerprinter:
+    def __init__(self, site_dir):
+        self.site_dir = Path(site_dir)
+        self.state_file = self.site_dir / STATE_NAME
+        self.manifest_file = self.site_dir / MANIFEST_NAME
+        self.assets = {}
+        self.referrers = {}
+        self.stats = {'hashed': 0, 'reused': 0, 'rewritten': 0, 'referrers_skipped': 0}
+
+    def load_state(self):
+        """Load per-asset hashes and per-referrer stats from the previous run"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.assets = state.get('assets', {})
+            self.referrers = state.get('referrers', {})
+        except (OSError, ValueError):
+            self.assets, self.referrers = {}, {}
+
+    def save_state(self):
+        """Write the run state and the public logical -> hashed manifest"""
+        tmp_file = self.state_file.with_name(STATE_NAME + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'assets': self.assets, 'referrers': self.referrers}, f, separators=(',', ':'))
+        os.replace(tmp_file, self.state_file)
+
+        manifest = {logical: info['hashed'] for logical, info in sorted(self.assets.items())}
+        with open(self.manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    def logical_files(self):
+        """Site files that are not themselves fingerprinted copies"""
+        files = scan_site_files(self.site_dir) - {MANIFEST_NAME}
+        logical = set()
+        for path in files:
+            match = HASHED_NAME_PATTERN.match(path)
+            if match and match.group('stem') + match.group('ext') in files:
+                continue
+            logical.add(path)
+        return logical
+
+    def lookup(self, referrer, ref):
+        """Return the logical asset a reference points at (plain or previously hashed)"""
+        resolved = resolve(referrer, ref)
+        if resolved is None:
+            return None
+        if resolved in self.assets:
+            return resolved
+        match = HASHED_NAME_PATTERN.match(resolved)
+        if match and match.group('stem') + match.group('ext') in self.assets:
+            return match.group('stem') + match.group('ext')
+        return None
+
+    def rewrite_referrer(self, relative_path):
+        """Point every asset reference in one file at its current hashed name"""
+        file_path = self.site_dir / relative_path
+        content = file_path.read_text(encoding='utf-8')
+        refs = set()
+
+        def replace(match):
+            ref = match.group(1)
+            logical = self.lookup(relative_path, ref)
+            if logical is None or logical == relative_path:
+                return ref
+            refs.add(logical)
+            # Only the file name changes, so the reference keeps its relative form
+            directory = ref.rsplit('/', 1)[0] + '/' if '/' in ref else ''
+            return directory + posixpath.basename(self.assets[logical]['hashed'])
+
+        new_content = REF_PATTERN.sub(replace, content)
+        if new_content != content:
+            data = new_content.encode('utf-8')
+            # Replace rather than write in place: dist/ may hard-link this file to its source
+            tmp_path = file_path.with_name(file_path.name + '.fingerprint-tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, file_path)
+            if file_path.suffix.lower() in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+                write_compressed(file_path, data)
+            self.stats['rewritten'] += 1
+
+        st = file_path.stat()
+        self.referrers[relative_path] = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'refs': sorted(refs)}
+
+    def publish(self, relative_path):
+        """Hash one asset and create its hashed copy; returns True if the hash changed"""
+        file_path = self.site_dir / relative_path
+        st = file_path.stat()
+        previous = self.assets.get(relative_path)
+        if previous and previous['mtime'] == st.st_mtime_ns and previous['size'] == st.st_size \
+                and (self.site_dir / previous['hashed']).exists():
+            self.stats['reused'] += 1
+            return False
+
+        data = file_path.read_bytes()
+        hashed = hashed_name(relative_path, content_hash(data))
+        self.stats['hashed'] += 1
+        hashed_path = self.site_dir / hashed
+
+        if not hashed_path.exists():
+            if file_path.suffix.lower() in BINARY_EXTENSIONS:
+                # dist/ replaces binaries by unlink + link, so sharing the inode is safe
+                try:
+                    os.link(file_path, hashed_path)
+                except OSError:
+                    shutil.copy2(file_path, hashed_path)
+            else:
+                # Text outputs are rewritten in place; never share their inode
+                hashed_path.write_bytes(data)
+            if hashed_path.suffix.lower() in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+                write_compressed(hashed_path, data)
+
+        changed = previous is None or previous['hashed'] != hashed
+        # New assets are seeded with their logical name, which must never be removed
+        if previous and changed and previous['hashed'] != relative_path:
+            self.remove_published(previous['hashed'])
+
+        self.assets[relative_path] = {'hashed': hashed, 'mtime': st.st_mtime_ns, 'size': st.st_size}
+        return changed
+
+    def remove_published(self, hashed):
+        """Delete a superseded hashed copy and its compressed siblings"""
+        for suffix in ('', '.gz', '.br'):
+            (self.site_dir / (hashed + suffix)).unlink(missing_ok=True)
+
+    def dependencies(self, relative_path):
+        """Logical assets one referrer points at, from the last run if it is unchanged"""
+        previous = self.referrers.get(relative_path)
+        st = (self.site_dir / relative_path).stat()
+        if previous and previous['mtime'] == st.st_mtime_ns and previous['size'] == st.st_size:
+            return set(previous['refs'])
+        content = (self.site_dir / relative_path).read_text(encoding='utf-8')
+        refs = {self.lookup(relative_path, match.group(1)) for match in REF_PATTERN.finditer(content)}
+        return refs - {None, relative_path}
+
+    def phase_order(self, paths):
+        """Order one phase's files so each comes after the same-phase assets it references
+
+        Referrers in a phase are rewritten one at a time, so main.css must be
+        rewritten after the reset.css it @imports has been published, or it
+        keeps pointing at the unhashed name. Cycles are broken arbitrarily.
+        """
+        members = set(paths)
+        ordered, visiting, done = [], set(), set()
+
+        def visit(path):
+            if path in done or path in visiting:
+                return
+            visiting.add(path)
+            if os.path.splitext(path)[1].lower() in REFERRER_EXTENSIONS:
+                for dependency in sorted(self.dependencies(path) & members):
+                    visit(dependency)
+            visiting.discard(path)
+            done.add(path)
+            ordered.append(path)
+
+        for path in sorted(paths):
+            visit(path)
+        return ordered
+
+    def run(self):
+        """Fingerprint the site; only changed assets and their referrers are touched"""
+        self.load_state()
+        logical = self.logical_files()
+
+        # Forget assets and referrers that were deleted
+        for path in set(self.assets) - logical:
+            self.remove_published(self.assets.pop(path)['hashed'])
+        for path in set(self.referrers) - logical:
+            del self.referrers[path]
+
+        # Seed entries for new assets so references to them resolve in this run
+        for path in logical:
+            if os.path.splitext(path)[1].lower() in FINGERPRINT_EXTENSIONS and path not in self.assets:
+                self.assets[path] = {'hashed': path, 'mtime': None, 'size': None}
+
+        changed_assets = set()
+        for extensions in PHASES:
+            for path in self.phase_order([p for p in logical if os.path.splitext(p)[1].lower() in extensions]):
+                extension = os.path.splitext(path)[1].lower()
+                if extension in REFERRER_EXTENSIONS:
+                    previous = self.referrers.get(path)
+                    st = (self.site_dir / path).stat()
+                    stale = previous is None or previous['mtime'] != st.st_mtime_ns or previous['size'] != st.st_size
+                    if stale or changed_assets.intersection(previous['refs']):
+                        self.rewrite_referrer(path)
+                    else:
+                        self.stats['referrers_skipped'] += 1
+                if extension in FINGERPRINT_EXTENSIONS and self.publish(path):
+                    changed_assets.add(path)
+
+        self.save_state()
+        return {logical: info['hashed'] for logical, info in self.assets.items()}
+
+
+def main():
+    project_root = os.getcwd()
+    site_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(project_root) / DIST_DIRNAME
+
+    print("Church Website Asset Fingerprinter")
+    print(f"Site directory: {site_dir}")
+
+    if not site_dir.exists():
+        print(f"{site_dir} not found. Run build_dist.py first.")
+        return 1
+
+    fingerprinter = AssetFingerprinter(site_dir)
+    fingerprinter.run()
+
+    stats = fingerprinter.stats
+    print(f"\nHashed {stats['hashed']} assets ({stats['reused']} unchanged), "
+          f"rewrote {stats['rewritten']} referrers ({stats['referrers_skipped']} untouched)")
+    print(f"Manifest saved to: {fingerprinter.manifest_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
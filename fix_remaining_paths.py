@@ -1,89 +1,70 @@
 #!/usr/bin/env python3
 """
 Fix Remaining Image Paths Script
-This script fixes the remaining broken image paths after reorganization.
+This script fixes the remaining broken image paths after reorganization,
+finding where each missing image went by name, density-free stem or hash.
 """
 
 import os
-import re
+import sys
 from pathlib import Path
+from css_index import CSSIndex
+from path_resolver import PathResolver
 
-def fix_remaining_paths():
-    project_root = Path(os.getcwd())
-    main_css = project_root / 'main.css'
+def fix_remaining_paths(project_root=None, dry_run=False, jobs=None):
+    """Resolve missing image references in the root CSS and HTML files and fix them
     
-    if not main_css.exists():
-        print("main.css not found")
-        return
+    Returns one finding per broken reference: {file, old_path, new_path,
+    method, candidates}, with new_path None when it was ambiguous
+    (candidates lists the choices) or had no match. Returns None if
+    there is no images directory to resolve against.
+    """
+    project_root = Path(project_root or os.getcwd())
     
-    # Read current CSS content
-    with open(main_css, 'r', encoding='utf-8') as f:
-        content = f.read()
+    if not (project_root / 'images').is_dir():
+        print("images directory not found")
+        return None
     
     print("Fixing remaining image paths...")
     
-    # Define the path fixes based on the organized structure
-    path_fixes = {
-        'images/banner.jpg': 'images/backgrounds/banner.jpg',
-        'images/metro-metro.webp': 'images/payments/Bac_credomatic_logo.svg',  # This was likely renamed
-        'images/loading.gif': 'images/uncategorized/loading.gif',
-        'images/prev.png': 'images/uncategorized/prev.png', 
-        'images/next.png': 'images/uncategorized/next.png',
-        'images/close.png': 'images/uncategorized/close.png',
-        'images/background-1.jpg': 'images/backgrounds/background-1.jpg',
-        'images/background-2.jpg': 'images/backgrounds/background-2.jpg', 
-        'images/background-6.jpg': 'images/backgrounds/background-6.jpg'
-    }
-    
-    changes_made = 0
-    
-    for old_path, new_path in path_fixes.items():
-        if old_path in content:
-            # Check if the new path actually exists
-            full_new_path = project_root / new_path
-            if full_new_path.exists():
-                content = content.replace(old_path, new_path)
-                print(f"✅ Fixed: {old_path} -> {new_path}")
-                changes_made += 1
-            else:
-                print(f"⚠️  Skipped: {old_path} (target {new_path} doesn't exist)")
+    # One index of the images tree answers every lookup
+    resolver = PathResolver(project_root, jobs=jobs).build(save_index=not dry_run)
+    findings = resolver.plan()
     
-    # Special case for metro-metro.webp - check if it should be the SVG file
-    if 'images/metro-metro.webp' in content:
-        svg_path = 'images/payments/Bac_credomatic_logo.svg'
-        if (project_root / svg_path).exists():
-            content = content.replace('images/metro-metro.webp', svg_path)
-            print(f"✅ Fixed: images/metro-metro.webp -> {svg_path}")
-            changes_made += 1
+    for finding in findings:
+        if finding['new_path']:
+            print(f"✅ Fixed: {finding['old_path']} -> {finding['new_path']} "
+                  f"(in {finding['file']}, by {finding['method']})")
+        elif finding['candidates']:
+            print(f"⚠️  Ambiguous: {finding['old_path']} (in {finding['file']}) could be "
+                  f"{', '.join(finding['candidates'])}")
+        else:
+            print(f"⚠️  Skipped: {finding['old_path']} (in {finding['file']}) has no match")
     
-    # Write the updated content
-    if changes_made > 0:
-        with open(main_css, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"\n✅ Applied {changes_made} fixes to main.css")
+    # Apply every fix in a single rewrite pass per file
+    fixes = [finding for finding in findings if finding['new_path']]
+    changed_files = resolver.apply(findings, dry_run=dry_run)
+    if fixes and not dry_run:
+        print(f"\n✅ Applied {len(fixes)} fixes to {', '.join(changed_files)}")
+    elif fixes:
+        print(f"\n📋 Would apply {len(fixes)} fixes to {', '.join(changed_files)}")
     else:
         print("\nℹ️  No fixes were needed or possible")
     
-    # Verify the fixes
-    print("\nVerifying fixes...")
-    verify_image_paths()
+    return findings
 
-def verify_image_paths():
-    """Verify that all image paths in CSS now exist"""
-    project_root = Path(os.getcwd())
+def verify_image_paths(project_root=None):
+    """Verify that all image paths in CSS now exist; returns the missing paths"""
+    project_root = Path(project_root or os.getcwd())
     main_css = project_root / 'main.css'
     
-    with open(main_css, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Find all image references
-    image_refs = re.findall(r'url\(["\']?([^"\')]+\.(jpg|jpeg|png|gif|webp|svg))["\']?\)', content, re.IGNORECASE)
+    # Image references come from the shared CSS index (cached per file)
+    image_refs = [ref['path'] for _, ref in CSSIndex(project_root).image_refs([main_css])]
     
-    missing_count = 0
+    missing = []
     found_count = 0
     
-    for ref in image_refs:
-        image_path = ref[0]
+    for image_path in image_refs:
         if image_path.startswith('images/'):
             full_path = project_root / image_path
             if full_path.exists():
@@ -91,14 +72,26 @@ def verify_image_paths():
                 found_count += 1
             else:
                 print(f"❌ {image_path} (missing)")
-                missing_count += 1
+                missing.append(image_path)
     
-    print(f"\nSummary: {found_count} found, {missing_count} missing")
+    print(f"\nSummary: {found_count} found, {len(missing)} missing")
     
-    if missing_count == 0:
+    if not missing:
         print("🎉 All image paths are now correct!")
     else:
-        print(f"⚠️  {missing_count} image paths still need attention")
+        print(f"⚠️  {len(missing)} image paths still need attention")
+    
+    return missing
+
+def main():
+    project_root = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
+    
+    if fix_remaining_paths(project_root) is None:
+        return 1
+    
+    # Verify the fixes
+    print("\nVerifying fixes...")
+    return 1 if verify_image_paths(project_root) else 0
 
 if __name__ == "__main__":
-    fix_remaining_paths()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Image Category Rules for Church Website
+Defines the image categories and compiles their patterns into a single
+matcher so each path is categorized in one pass.
+"""
+
+import re
+import copy
+import json
+
+FALLBACK_CATEGORY = 'uncategorized'
+
+# Category order is precedence: the first category with a matching pattern wins.
+# display_width is the widest the site shows images of a category, in CSS pixels.
+DEFAULT_CATEGORIES = {
+    'carousel': {
+        'patterns': ['hero-1', 'hero-2', 'hero-3', 'carousel', 'slide'],
+        'description': 'Carousel/Hero section background images',
+        'display_width': 1920,
+    },
+    'backgrounds': {
+        'patterns': ['background', 'banner', 'bg-'],
+        'description': 'General background images',
+        'display_width': 1920,
+    },
+    'logos': {
+        'patterns': ['logo', 'brand'],
+        'description': 'Logo and branding images',
+        'display_width': 240,
+    },
+    'favicons': {
+        'patterns': ['favicon', 'icon', 'apple-touch'],
+        'description': 'Favicon and app icons',
+        'display_width': 512,
+    },
+    'content': {
+        'patterns': ['ministry', 'sermon', 'gallery', 'staff', 'event'],
+        'description': 'Content images (ministries, sermons, gallery, etc.)',
+        'display_width': 600,
+    },
+    'ui': {
+        'patterns': ['ui-', 'button', 'arrow', 'social'],
+        'description': 'UI elements and icons',
+        'display_width': 64,
+    },
+    'payments': {
+        'patterns': ['payment', 'donate', 'bank', 'card'],
+        'description': 'Payment and donation related images',
+        'display_width': 240,
+    },
+    FALLBACK_CATEGORY: {
+        'patterns': [],
+        'description': 'Images that don\'t fit other categories',
+        'display_width': 1200,
+    },
+}
+
+
+def load_rules(rules_file, base=None):
+    """Merge a JSON rule file into the category table
+
+    The file maps category names to {"patterns": [...], "description": "...",
+    "display_width": N}.
+    Patterns for an existing category are appended to it; new categories are
+    placed after the built-in ones but before the uncategorized fallback.
+    """
+    categories = copy.deepcopy(base if base is not None else DEFAULT_CATEGORIES)
+
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+
+    if not isinstance(rules, dict):
+        raise ValueError(f"{rules_file}: expected an object of categories")
+
+    fallback = categories.pop(FALLBACK_CATEGORY, {'patterns': [], 'description': '', 'display_width': 1200})
+    for name, rule in rules.items():
+        patterns = [str(p).lower() for p in rule.get('patterns', [])]
+        if name == FALLBACK_CATEGORY:
+            fallback['description'] = rule.get('description', fallback['description'])
+            fallback['display_width'] = rule.get('display_width', fallback.get('display_width'))
+            continue
+        if name in categories:
+            categories[name]['patterns'].extend(p for p in patterns if p not in categories[name]['patterns'])
+            categories[name]['description'] = rule.get('description', categories[name]['description'])
+            categories[name]['display_width'] = rule.get('display_width', categories[name].get('display_width'))
+        else:
+            categories[name] = {'patterns': patterns, 'description': rule.get('description', ''),
+                                'display_width': rule.get('display_width', fallback.get('display_width'))}
+    categories[FALLBACK_CATEGORY] = fallback
+
+    return categories
+
+
+def build_categories(rules_file=None):
+    """Return a fresh category table with empty file lists"""
+    categories = load_rules(rules_file) if rules_file else copy.deepcopy(DEFAULT_CATEGORIES)
+    for info in categories.values():
+        info['files'] = []
+    return categories
+
+
+class CategoryMatcher:
+    """Compiled categorizer keeping first-match category precedence
+
+    Each category's patterns are compiled once into a single alternation, and
+    categories are tried in table order, so a path is searched at most once
+    per category instead of once per pattern. (A single combined regex was
+    measured slower here: CPython's re engine retries every alternative at
+    every position, while a literal alternation search stays in C.)
+    """
+
+    def __init__(self, categories):
+        self.rules = []
+        for name, info in categories.items():
+            patterns = [p.lower() for p in info.get('patterns', []) if p]
+            if name == FALLBACK_CATEGORY or not patterns:
+                continue
+            # Longest first so overlapping patterns prefer the specific one
+            patterns.sort(key=len, reverse=True)
+            regex = re.compile('|'.join(re.escape(p) for p in patterns))
+            self.rules.append((name, regex.search))
+
+    def match(self, path):
+        """Return the category for a relative image path"""
+        path = path.lower()
+        for name, search in self.rules:
+            if search(path):
+                return name
+        return FALLBACK_CATEGORY
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Image Index for Church Website
+Keeps an on-disk index of every image (path, mtime, size, content hash and
+header metadata) so repeated scans only re-examine the files that changed.
+"""
+
+import os
+import json
+import mmap
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from image_probe import safe_probe
+from profiling import PROFILER
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg'}
+INDEX_FILENAME = '.image_index.json'
+# Generated output living under images/ that must not be scanned as sources
+EXCLUDED_DIRS = {'derived'}
+INDEX_VERSION = 2
+CHUNK_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+
+def hash_file(file_path, chunk_size=CHUNK_SIZE):
+    """Return the hex content hash of a file
+    
+    Small files are streamed in fixed-size chunks; large files are memory
+    mapped so the hash reads straight from the page cache without copies.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        else:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def examine_file(file_path):
+    """Hash a file and probe its header; returns (hash, meta)"""
+    return hash_file(file_path), safe_probe(file_path)
+
+
+def iter_image_entries(images_dir, extensions=IMAGE_EXTENSIONS, excluded_dirs=EXCLUDED_DIRS):
+    """Walk the images tree with os.scandir, yielding (relative_path, DirEntry)"""
+    images_dir = str(images_dir)
+    stack = ['']
+    while stack:
+        relative_dir = stack.pop()
+        current_dir = os.path.join(images_dir, relative_dir) if relative_dir else images_dir
+        try:
+            with os.scandir(current_dir) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if relative_path not in excluded_dirs:
+                    subdirs.append(relative_path)
+            elif os.path.splitext(entry.name)[1].lower() in extensions:
+                yield relative_path, entry
+        # Reverse so directories are visited in name order
+        stack.extend(reversed(subdirs))
+
+
+class ImageIndex:
+    def __init__(self, images_dir, index_file=None, jobs=None):
+        self.images_dir = Path(images_dir)
+        self.index_file = Path(index_file) if index_file else self.images_dir.parent / INDEX_FILENAME
+        self.jobs = jobs
+        self.entries = {}
+        self.stats = {'cached': 0, 'rescanned': 0, 'removed': 0}
+
+    def load(self):
+        """Load the previous index from disk, ignoring missing or stale files"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+            return self.entries
+
+        if data.get('version') != INDEX_VERSION:
+            self.entries = {}
+        else:
+            self.entries = data.get('entries', {})
+        return self.entries
+
+    def save(self):
+        """Atomically write the index back to disk"""
+        tmp_file = self.index_file.with_name(self.index_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f, separators=(',', ':'))
+        os.replace(tmp_file, self.index_file)
+
+    def update(self, relative_paths):
+        """Re-examine only the given images; returns their records (None when gone)
+
+        For callers that already know what changed (watch mode), this avoids
+        walking and stat-ing the whole tree the way refresh() does.
+        """
+        if not self.entries:
+            self.load()
+        records = {}
+        stale = []
+        removed = 0
+
+        for relative_path in relative_paths:
+            try:
+                st = (self.images_dir / relative_path).stat()
+            except OSError:
+                removed += self.entries.pop(relative_path, None) is not None
+                records[relative_path] = None
+                continue
+            cached = self.entries.get(relative_path)
+            if cached and cached['mtime'] == st.st_mtime_ns and cached['size'] == st.st_size:
+                records[relative_path] = cached
+            else:
+                record = {'path': relative_path, 'mtime': st.st_mtime_ns, 'size': st.st_size}
+                self.entries[relative_path] = records[relative_path] = record
+                stale.append(record)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                paths = [self.images_dir / record['path'] for record in stale]
+                for record, (digest, meta) in zip(stale, pool.map(examine_file, paths)):
+                    record['hash'] = digest
+                    record['meta'] = meta
+
+        self.stats = {'cached': len(records) - len(stale) - removed, 'rescanned': len(stale), 'removed': removed}
+        return records
+
+    def refresh(self):
+        """Bring the index up to date with the images tree and return its entries"""
+        previous = self.entries or self.load()
+        current = {}
+        stale = []
+
+        for relative_path, entry in iter_image_entries(self.images_dir):
+            st = entry.stat()
+            PROFILER.count('stat')
+            cached = previous.get(relative_path)
+            if cached and cached['mtime'] == st.st_mtime_ns and cached['size'] == st.st_size:
+                current[relative_path] = cached
+            else:
+                record = {'path': relative_path, 'mtime': st.st_mtime_ns, 'size': st.st_size}
+                current[relative_path] = record
+                stale.append(record)
+
+        # Hash and probe changed files concurrently; hashlib releases the GIL on large buffers
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                paths = [self.images_dir / record['path'] for record in stale]
+                for record, (digest, meta) in zip(stale, pool.map(examine_file, paths)):
+                    record['hash'] = digest
+                    record['meta'] = meta
+
+        self.stats = {
+            'cached': len(current) - len(stale),
+            'rescanned': len(stale),
+            'removed': len(set(previous) - set(current)),
+        }
+        self.entries = current
+        return current
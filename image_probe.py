@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Image Header Probing for Church Website
+Reads image format, dimensions and JPEG EXIF orientation from file headers
+only (JPEG SOF markers, PNG IHDR, GIF screen descriptor, WebP VP8/VP8L/VP8X
+chunks, SVG width/height/viewBox) without decoding any pixels.
+"""
+
+import re
+import struct
+
+# Upper bound on bytes read for any single probe
+MAX_PROBE_BYTES = 256 * 1024
+HEADER_BYTES = 32
+SVG_HEAD_BYTES = 4096
+
+# JPEG start-of-frame markers carrying the frame size (not DHT/JPG/DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+EXIF_ORIENTATION_TAG = 0x0112
+
+SVG_TAG_PATTERN = re.compile(rb'<svg\b[^>]*>', re.IGNORECASE | re.DOTALL)
+SVG_ATTR_PATTERN = re.compile(rb'''\b(width|height|viewBox)\s*=\s*["']([^"']*)["']''', re.IGNORECASE)
+SVG_LENGTH_PATTERN = re.compile(rb'^\s*([\d.]+)\s*(px)?\s*$')
+
+
+def probe_image(file_path):
+    """Return {'format', 'width', 'height'} (plus 'orientation' for JPEG EXIF)
+
+    Width and height are None when the header does not state them (e.g. an
+    SVG sized only by CSS). Returns None for files that are not recognised.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(HEADER_BYTES)
+        if head.startswith(b'\xff\xd8'):
+            return _probe_jpeg(f)
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            width, height = struct.unpack('>II', head[16:24])
+            return {'format': 'png', 'width': width, 'height': height}
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            width, height = struct.unpack('<HH', head[6:10])
+            return {'format': 'gif', 'width': width, 'height': height}
+        if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+            return _probe_webp(head, f)
+        f.seek(0)
+        return _probe_svg(f.read(SVG_HEAD_BYTES))
+
+
+def _probe_jpeg(f):
+    """Walk the marker segments, seeking over their payloads, until a SOF"""
+    f.seek(2)
+    info = {'format': 'jpeg', 'width': None, 'height': None}
+    while f.tell() < MAX_PROBE_BYTES:
+        byte = f.read(1)
+        if not byte:
+            break
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        # Fill bytes: any number of 0xFF may precede a marker
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            break
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            # End of image or start of scan: no frame header follows
+            break
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            break
+        length = struct.unpack('>H', length_bytes)[0]
+        if length < 2:
+            break
+        if marker in JPEG_SOF_MARKERS:
+            segment = f.read(5)
+            if len(segment) == 5:
+                info['height'], info['width'] = struct.unpack('>HH', segment[1:5])
+            break
+        if marker == 0xE1:
+            segment = f.read(length - 2)
+            orientation = _exif_orientation(segment)
+            if orientation:
+                info['orientation'] = orientation
+            continue
+        f.seek(length - 2, 1)
+
+    # EXIF orientations 5-8 rotate by 90 degrees: the displayed size is swapped
+    if info.get('orientation', 1) >= 5 and info['width'] is not None:
+        info['width'], info['height'] = info['height'], info['width']
+    return info
+
+
+def _exif_orientation(segment):
+    """Read the Orientation tag from the first IFD of an APP1 Exif segment"""
+    if not segment.startswith(b'Exif\x00\x00') or len(segment) < 14:
+        return None
+    tiff = segment[6:]
+    endian = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if endian is None:
+        return None
+    try:
+        ifd_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+        count = struct.unpack(endian + 'H', tiff[ifd_offset:ifd_offset + 2])[0]
+        for i in range(count):
+            entry = ifd_offset + 2 + i * 12
+            tag, _, _, value = struct.unpack(endian + 'HHIH', tiff[entry:entry + 10])
+            if tag == EXIF_ORIENTATION_TAG:
+                return value if 1 <= value <= 8 else None
+    except struct.error:
+        return None
+    return None
+
+
+def _probe_webp(head, f):
+    """Read the size from the first VP8 / VP8L / VP8X chunk"""
+    chunk = head[12:16]
+    if chunk == b'VP8 ':
+        data = head[20:32] if len(head) >= 32 else head[20:] + f.read(32 - len(head))
+        # Frame tag (3 bytes) + start code 9d 01 2a, then 14-bit width/height
+        if data[3:6] == b'\x9d\x01\x2a':
+            width, height = struct.unpack('<HH', data[6:10])
+            return {'format': 'webp', 'width': width & 0x3FFF, 'height': height & 0x3FFF}
+    elif chunk == b'VP8L':
+        data = head[20:25]
+        if data[:1] == b'\x2f':
+            bits = int.from_bytes(data[1:5], 'little')
+            return {'format': 'webp', 'width': (bits & 0x3FFF) + 1, 'height': ((bits >> 14) & 0x3FFF) + 1}
+    elif chunk == b'VP8X':
+        data = head[24:30]
+        return {'format': 'webp',
+                'width': int.from_bytes(data[0:3], 'little') + 1,
+                'height': int.from_bytes(data[3:6], 'little') + 1}
+    return {'format': 'webp', 'width': None, 'height': None}
+
+
+def _probe_svg(head):
+    """Size from the root <svg> width/height, falling back to its viewBox"""
+    match = SVG_TAG_PATTERN.search(head)
+    if not match:
+        return None
+    attrs = {name.lower(): value for name, value in SVG_ATTR_PATTERN.findall(match.group(0))}
+
+    width = height = None
+    for name in (b'width', b'height'):
+        length = SVG_LENGTH_PATTERN.match(attrs.get(name, b''))
+        if length:
+            value = round(float(length.group(1)))
+            if name == b'width':
+                width = value
+            else:
+                height = value
+
+    view_box = attrs.get(b'viewbox', b'').replace(b',', b' ').split()
+    if (width is None or height is None) and len(view_box) == 4:
+        try:
+            box_width, box_height = float(view_box[2]), float(view_box[3])
+        except ValueError:
+            box_width = box_height = 0
+        if box_width > 0 and box_height > 0:
+            # Scale the viewBox when only one dimension is given
+            if width is not None:
+                height = round(width * box_height / box_width)
+            elif height is not None:
+                width = round(height * box_width / box_height)
+            else:
+                width, height = round(box_width), round(box_height)
+    return {'format': 'svg', 'width': width, 'height': height}
+
+
+def safe_probe(file_path):
+    """probe_image() that reports unreadable files as None instead of raising"""
+    try:
+        return probe_image(file_path)
+    except (OSError, ValueError, struct.error):
+        return None
@@ -18,14 +18,14 @@ const updateDate = () => {
 updateDate();
 
 
-var reqURL = "https://api.rss2json.com/v1/api.json?rss_url=" + encodeURIComponent("https://www.youtube.com/feeds/videos.xml?channel_id=");
-
+// The latest video title is baked into the page at build time (video_feed.py);
+// latest-video.json, written by the same step, fills it in if the page is blank.
 function loadVideo() {
-    $.getJSON(reqURL + "UC3dKXfaGzFL_YvslCMCUtdg",
+    var titleEl = document.getElementById("lastEvent-title");
+    if (titleEl.textContent.trim()) return;
+    $.getJSON("latest-video.json",
         function(data) {
-            var videoNumber = 0;
-            var title=data.items[videoNumber].title;
-            document.getElementById("lastEvent-title").innerText = title;
+            titleEl.innerText = data.title;
         }
     );
 }
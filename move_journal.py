@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Journaled File Moves for Church Website
+Applies a batch of file moves and the matching CSS/HTML rewrites as one
+transaction. The full plan is written to an fsync'ed intent journal before
+anything is touched, so an interrupted run can be resumed or rolled back.
+"""
+
+import os
+import json
+import errno
+import shutil
+from pathlib import Path
+
+JOURNAL_DIRNAME = '.organize-journal'
+JOURNAL_NAME = 'journal.json'
+JOURNAL_VERSION = 1
+
+
+def fsync_dir(directory):
+    """Flush a directory entry (new, renamed or removed names) to disk"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_durable(file_path, data):
+    """Write bytes to a temp file, fsync it and rename it into place"""
+    file_path = Path(file_path)
+    tmp_path = file_path.with_name(file_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+    fsync_dir(file_path.parent)
+
+
+def move_file(source, target):
+    """Rename on the same filesystem; copy and unlink only across filesystems"""
+    try:
+        os.rename(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.copy2(source, target)
+        os.unlink(source)
+
+
+class MoveTransaction:
+    """One journaled batch of moves plus file content replacements
+
+    Paths in the journal are relative to project_root. State on disk is the
+    source of truth for progress: a move is done when its source is gone and
+    its target exists, a rewrite is done when the file holds the new content.
+    That keeps the hot path to one rename per file and one journal fsync.
+    """
+
+    def __init__(self, project_root, journal_dir=None):
+        self.project_root = Path(project_root)
+        self.journal_dir = Path(journal_dir) if journal_dir else self.project_root / JOURNAL_DIRNAME
+        self.journal_file = self.journal_dir / JOURNAL_NAME
+        self.journal = None
+        self.stats = {'moved': 0, 'already_moved': 0, 'rewritten': 0, 'directories': 0}
+
+    def pending(self):
+        """True if an unfinished transaction is recorded on disk"""
+        return self.journal_file.exists()
+
+    def load(self):
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            self.journal = json.load(f)
+        if self.journal.get('version') != JOURNAL_VERSION:
+            raise ValueError(f"Unsupported journal version in {self.journal_file}")
+        return self.journal
+
+    def conflicts(self, moves):
+        """Return problems that would make the plan unsafe, before anything is written"""
+        problems = []
+        targets = {}
+        for source, target in moves:
+            if not (self.project_root / source).exists():
+                problems.append(f"Missing source: {source}")
+            if target in targets:
+                problems.append(f"Both {targets[target]} and {source} would move to {target}")
+            elif (self.project_root / target).exists():
+                problems.append(f"Target already exists: {target}")
+            targets[target] = source
+        return problems
+
+    def begin(self, moves, rewrites=None):
+        """Record the intent: moves [(source, target)], rewrites {path: new_text}
+
+        Original and new contents of rewritten files are stored beside the
+        journal so both directions can be replayed after a crash.
+        """
+        if self.pending():
+            raise RuntimeError(f"An unfinished transaction exists in {self.journal_dir}; resume or roll it back")
+
+        problems = self.conflicts(moves)
+        if problems:
+            raise ValueError('; '.join(problems))
+
+        self.journal_dir.mkdir(exist_ok=True)
+        rewrite_entries = []
+        for index, (relative_path, new_text) in enumerate(sorted((rewrites or {}).items())):
+            original = (self.project_root / relative_path).read_bytes()
+            backup, staged = f"{index}.orig", f"{index}.new"
+            write_durable(self.journal_dir / backup, original)
+            write_durable(self.journal_dir / staged, new_text.encode('utf-8'))
+            rewrite_entries.append({'path': relative_path, 'backup': backup, 'staged': staged})
+
+        # Parent directories that do not exist yet, created once each, shallowest first
+        directories = sorted(
+            {Path(target).parent.as_posix() for _, target in moves} - {'.'},
+            key=lambda d: (d.count('/'), d))
+        missing = []
+        for directory in directories:
+            parts = directory.split('/')
+            for depth in range(1, len(parts) + 1):
+                prefix = '/'.join(parts[:depth])
+                if prefix not in missing and not (self.project_root / prefix).is_dir():
+                    missing.append(prefix)
+
+        self.journal = {
+            'version': JOURNAL_VERSION,
+            'state': 'pending',
+            'moves': [[source, target] for source, target in moves],
+            'rewrites': rewrite_entries,
+            'created_dirs': missing,
+        }
+        write_durable(self.journal_file, json.dumps(self.journal).encode('utf-8'))
+        return self.journal
+
+    def apply(self):
+        """Carry out (or finish) the recorded transaction, then discard the journal"""
+        journal = self.journal or self.load()
+        root = self.project_root
+
+        for directory in journal['created_dirs']:
+            try:
+                os.mkdir(root / directory)
+                self.stats['directories'] += 1
+            except FileExistsError:
+                pass
+
+        touched_dirs = set()
+        for source, target in journal['moves']:
+            source_path, target_path = root / source, root / target
+            if not source_path.exists() and target_path.exists():
+                self.stats['already_moved'] += 1
+                continue
+            move_file(source_path, target_path)
+            touched_dirs.update((source_path.parent, target_path.parent))
+            self.stats['moved'] += 1
+
+        for entry in journal['rewrites']:
+            staged = (self.journal_dir / entry['staged']).read_bytes()
+            target_path = root / entry['path']
+            if target_path.read_bytes() != staged:
+                # Copy rather than rename so the staged file survives until the journal is dropped
+                write_durable(target_path, staged)
+                self.stats['rewritten'] += 1
+
+        for directory in touched_dirs:
+            fsync_dir(directory)
+        self.finish()
+        return self.stats
+
+    def rollback(self):
+        """Undo whatever part of the recorded transaction was applied"""
+        journal = self.journal or self.load()
+        root = self.project_root
+
+        for entry in journal['rewrites']:
+            backup = (self.journal_dir / entry['backup']).read_bytes()
+            target_path = root / entry['path']
+            if not target_path.exists() or target_path.read_bytes() != backup:
+                write_durable(target_path, backup)
+                self.stats['rewritten'] += 1
+
+        for source, target in reversed(journal['moves']):
+            source_path, target_path = root / source, root / target
+            if target_path.exists() and not source_path.exists():
+                move_file(target_path, source_path)
+                self.stats['moved'] += 1
+
+        # Only directories this transaction created, deepest first, and only if empty
+        for directory in sorted(journal['created_dirs'], key=lambda d: d.count('/'), reverse=True):
+            try:
+                os.rmdir(root / directory)
+                self.stats['directories'] += 1
+            except OSError:
+                pass
+
+        self.finish()
+        return self.stats
+
+    def finish(self):
+        """Drop the journal once the tree is consistent"""
+        shutil.rmtree(self.journal_dir, ignore_errors=True)
+        fsync_dir(self.project_root)
+        self.journal = None
@@ -5,10 +5,21 @@ This script helps organize and categorize images in the church website project.
 """
 
 import os
-import shutil
+import sys
 from pathlib import Path
-import json
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from image_index import ImageIndex, hash_file, iter_image_entries
+from image_probe import safe_probe
+from image_categories import CategoryMatcher, build_categories
+from update_css_paths import CSSPathUpdater
+from css_index import CSSIndex, is_image_ref
+from move_journal import MoveTransaction
+from report_stream import ReportWriter, REPORT_FILENAME, LEGACY_REPORT_FILENAME, load_images, diff_images
+from profiling import PROFILER, profiled, profile_session
+
+# Highest device pixel ratio an image is expected to serve
+MAX_PIXEL_RATIO = 2
 
 class ImageOrganizer:
     def __init__(self, project_root):
@@ -21,175 +32,382 @@ class ImageOrganizer:
             'issues': []
         }
         
-    def scan_images(self):
-        """Scan all images in the project and categorize them"""
-        print("Scanning images directory...")
+    @profiled()
+    def scan_images(self, incremental=False, jobs=None, rules_file=None):
+        """Scan all images in the project and categorize them
+        
+        With incremental=True, unchanged files are served from the on-disk
+        image index and only new or modified files are hashed and probed.
+        Either way, format and dimensions are read from file headers only.
+        rules_file is an optional JSON file of extra category rules.
+        """
+        print(f"Scanning images directory{' (incremental)' if incremental else ''}...")
         
         if not self.images_dir.exists():
             print(f"Images directory not found: {self.images_dir}")
             return
             
-        # Define image categories and their patterns
-        categories = {
-            'carousel': {
-                'patterns': ['hero-1', 'hero-2', 'hero-3', 'carousel', 'slide'],
-                'description': 'Carousel/Hero section background images',
-                'files': []
-            },
-            'backgrounds': {
-                'patterns': ['background', 'banner', 'bg-'],
-                'description': 'General background images',
-                'files': []
-            },
-            'logos': {
-                'patterns': ['logo', 'brand'],
-                'description': 'Logo and branding images',
-                'files': []
-            },
-            'favicons': {
-                'patterns': ['favicon', 'icon', 'apple-touch'],
-                'description': 'Favicon and app icons',
-                'files': []
-            },
-            'content': {
-                'patterns': ['ministry', 'sermon', 'gallery', 'staff', 'event'],
-                'description': 'Content images (ministries, sermons, gallery, etc.)',
-                'files': []
-            },
-            'ui': {
-                'patterns': ['ui-', 'button', 'arrow', 'social'],
-                'description': 'UI elements and icons',
-                'files': []
-            },
-            'payments': {
-                'patterns': ['payment', 'donate', 'bank', 'card'],
-                'description': 'Payment and donation related images',
-                'files': []
-            },
-            'uncategorized': {
-                'patterns': [],
-                'description': 'Images that don\'t fit other categories',
-                'files': []
-            }
-        }
+        # Define image categories and compile their patterns into one matcher
+        categories = build_categories(rules_file)
+        matcher = CategoryMatcher(categories)
         
-        # Scan all image files
-        image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg'}
+        # Collect (relative_path, size, meta), from the on-disk index when incremental
+        if incremental:
+            index = ImageIndex(self.images_dir, jobs=jobs)
+            entries = index.refresh()
+            index.save()
+            scanned = [(path, record['size'], record.get('meta')) for path, record in entries.items()]
+            self.report['scan'] = dict(index.stats, mode='incremental')
+        else:
+            found = [(path, entry.stat().st_size) for path, entry in iter_image_entries(self.images_dir)]
+            PROFILER.count('stat', len(found))
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                metas = pool.map(safe_probe, [self.images_dir / path for path, _ in found])
+                scanned = [(path, size, meta) for (path, size), meta in zip(found, metas)]
+            self.report['scan'] = {'mode': 'full', 'cached': 0, 'rescanned': len(scanned), 'removed': 0}
         
-        for root, dirs, files in os.walk(self.images_dir):
-            for file in files:
-                if Path(file).suffix.lower() in image_extensions:
-                    file_path = Path(root) / file
-                    relative_path = file_path.relative_to(self.images_dir)
-                    
-                    # Categorize the image
-                    categorized = False
-                    file_lower = file.lower()
-                    
-                    for category, info in categories.items():
-                        if category == 'uncategorized':
-                            continue
-                            
-                        for pattern in info['patterns']:
-                            if pattern in file_lower or pattern in str(relative_path).lower():
-                                info['files'].append({
-                                    'filename': file,
-                                    'current_path': str(relative_path),
-                                    'full_path': str(file_path),
-                                    'size': file_path.stat().st_size if file_path.exists() else 0
-                                })
-                                categorized = True
-                                break
-                        
-                        if categorized:
-                            break
-                    
-                    # If not categorized, add to uncategorized
-                    if not categorized:
-                        categories['uncategorized']['files'].append({
-                            'filename': file,
-                            'current_path': str(relative_path),
-                            'full_path': str(file_path),
-                            'size': file_path.stat().st_size if file_path.exists() else 0
-                        })
+        for relative_path, size, meta in scanned:
+            file = relative_path.rsplit('/', 1)[-1]
+            meta = meta or {}
+            file_info = {
+                'filename': file,
+                'current_path': relative_path,
+                'size': size,
+                'format': meta.get('format'),
+                'width': meta.get('width'),
+                'height': meta.get('height')
+            }
+            
+            # Categorize the image in a single pass over its path
+            categories[matcher.match(relative_path)]['files'].append(file_info)
         
         self.report['categories'] = categories
         return categories
     
+    @profiled()
+    def plan_moves(self):
+        """List (from, to) image moves, relative to images/, that put each file in its category dir"""
+        moves = []
+        for category, info in self.report['categories'].items():
+            for file_info in info['files']:
+                new_path = f"{category}/{file_info['filename']}"
+                if file_info['current_path'] != new_path:
+                    moves.append((file_info['current_path'], new_path))
+        return moves
+    
+    @profiled()
     def create_organized_structure(self, dry_run=True):
-        """Create organized directory structure and optionally move files"""
+        """Move every image into its category directory as one journaled transaction
+        
+        The moves and the CSS/HTML reference rewrites are recorded in an
+        fsync'ed journal first, then applied with same-filesystem renames. If
+        the run is interrupted, resume_organization() finishes it and
+        rollback_organization() restores the previous tree.
+        """
         print(f"\n{'DRY RUN: ' if dry_run else ''}Creating organized structure...")
         
-        categories = self.report['categories']
+        moves = self.plan_moves()
+        mappings = {f"images/{old}": f"images/{new}" for old, new in moves}
+        updater = CSSPathUpdater(self.project_root)
+        planned = updater.plan_rewrites(mappings)
+        
+        if dry_run:
+            for category in sorted({new.split('/', 1)[0] for _, new in moves}):
+                if not (self.images_dir / category).is_dir():
+                    print(f"Would create directory: {self.images_dir / category}")
+            for old, new in moves:
+                print(f"Would move: {self.images_dir / old} -> {self.images_dir / new}")
+            for file_name, (_, changes) in planned.items():
+                print(f"Would update {file_name} with {len(changes)} reference changes")
+            return moves
+        
+        transaction = MoveTransaction(self.project_root)
+        relative_moves = [(f"images/{old}", f"images/{new}") for old, new in moves]
+        try:
+            transaction.begin(relative_moves, {name: content for name, (content, _) in planned.items()})
+        except (ValueError, RuntimeError, OSError) as e:
+            error_msg = f"Organization not started: {e}"
+            print(f"❌ {error_msg}")
+            self.report['issues'].append(error_msg)
+            return []
+        
+        stats = self.apply_transaction(transaction)
+        if stats is None:
+            return []
+        
+        updater.record_changes(planned)
+        self.report['moved_files'].extend({'from': old, 'to': new} for old, new in moves)
+        return moves
+    
+    @profiled()
+    def apply_transaction(self, transaction):
+        """Apply a journaled transaction, leaving the journal for resume on failure"""
+        try:
+            stats = transaction.apply()
+        except OSError as e:
+            error_msg = f"Organization interrupted ({e}); run resume or rollback"
+            print(f"❌ {error_msg}")
+            self.report['issues'].append(error_msg)
+            return None
+        print(f"✅ Moved {stats['moved']} files ({stats['already_moved']} already in place), "
+              f"created {stats['directories']} directories, updated {stats['rewritten']} CSS/HTML files")
+        return stats
+    
+    @profiled()
+    def resume_organization(self):
+        """Finish an interrupted create_organized_structure run"""
+        transaction = MoveTransaction(self.project_root)
+        if not transaction.pending():
+            print("No interrupted organization to resume.")
+            return None
+        return self.apply_transaction(transaction)
+    
+    @profiled()
+    def rollback_organization(self):
+        """Undo an interrupted create_organized_structure run"""
+        transaction = MoveTransaction(self.project_root)
+        if not transaction.pending():
+            print("No interrupted organization to roll back.")
+            return None
+        stats = transaction.rollback()
+        print(f"✅ Rolled back {stats['moved']} moves and {stats['rewritten']} CSS/HTML files")
+        return stats
+    
+    @profiled()
+    def find_oversized_images(self, factor=MAX_PIXEL_RATIO):
+        """Flag raster images wider than their category's display width allows
+        
+        An image may be up to factor times the widest it is displayed (for
+        high-density screens); anything wider is pixels nobody sees.
+        """
+        print("\nOVERSIZED IMAGES:")
+        print("-" * 40)
         
-        for category, info in categories.items():
-            if not info['files']:
+        oversized = []
+        for category, info in self.report['categories'].items():
+            display_width = info.get('display_width')
+            if not display_width:
                 continue
-                
-            category_dir = self.images_dir / category
-            
-            if not dry_run:
-                category_dir.mkdir(exist_ok=True)
-                print(f"Created directory: {category_dir}")
-            else:
-                print(f"Would create directory: {category_dir}")
-            
+            limit = display_width * factor
             for file_info in info['files']:
-                current_path = Path(file_info['full_path'])
-                new_path = category_dir / file_info['filename']
+                width = file_info.get('width')
+                if file_info.get('format') == 'svg' or not width or width <= limit:
+                    continue
+                oversized.append({
+                    'path': file_info['current_path'],
+                    'category': category,
+                    'width': width,
+                    'height': file_info['height'],
+                    'display_width': display_width,
+                    'ratio': round(width / display_width, 2)
+                })
+        
+        oversized.sort(key=lambda item: item['ratio'], reverse=True)
+        for item in oversized:
+            print(f"  ⚠️  {item['path']}: {item['width']}x{item['height']} shown at most "
+                  f"{item['display_width']}px wide ({item['ratio']}x)")
+        print(f"Found {len(oversized)} oversized images")
+        
+        self.report['oversized'] = oversized
+        return oversized
+    
+    @profiled()
+    def find_duplicates(self, jobs=None):
+        """Find byte-identical images: group by size first, then by content hash"""
+        print("\nDUPLICATE IMAGES:")
+        print("-" * 40)
+        
+        by_size = {}
+        for info in self.report['categories'].values():
+            for file_info in info['files']:
+                by_size.setdefault(file_info['size'], []).append(file_info)
+        
+        # Hard links to one inode are a single copy on disk: collapse them
+        # first, so each inode is hashed once and never counted as waste
+        by_inode = {}
+        for files in by_size.values():
+            if len(files) < 2 or files[0]['size'] == 0:
+                continue
+            for file_info in files:
+                try:
+                    st = (self.images_dir / file_info['current_path']).stat()
+                except OSError:
+                    continue
+                by_inode.setdefault((st.st_dev, st.st_ino), []).append(file_info)
+        
+        # Only inodes sharing a size can be identical, so only those get hashed
+        inode_sizes = {}
+        for links in by_inode.values():
+            inode_sizes[links[0]['size']] = inode_sizes.get(links[0]['size'], 0) + 1
+        candidates = [links for links in by_inode.values() if inode_sizes[links[0]['size']] > 1]
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            hashes = list(pool.map(hash_file, [self.images_dir / links[0]['current_path'] for links in candidates]))
+        
+        by_hash = {}
+        for links, digest in zip(candidates, hashes):
+            by_hash.setdefault(digest, []).append(links)
+        
+        # Keep the shortest, then alphabetically first, path as the canonical copy
+        key = lambda path: (len(path), path)
+        duplicates = []
+        for digest, inodes in by_hash.items():
+            # A group whose copies are all links to one inode is already deduplicated
+            if len(inodes) < 2:
+                continue
+            canonical_links = min(inodes, key=lambda links: min(key(f['current_path']) for f in links))
+            canonical = min((f['current_path'] for f in canonical_links), key=key)
+            # Extra links of the canonical inode stay in the group, so a canonical
+            # dedupe still removes them; they just waste no space
+            paths = sorted((f['current_path'] for links in inodes for f in links
+                            if f['current_path'] != canonical), key=key)
+            duplicates.append({
+                'hash': digest,
+                'size': canonical_links[0]['size'],
+                'canonical': canonical,
+                'duplicates': paths,
+                'wasted_bytes': canonical_links[0]['size'] * (len(inodes) - 1)
+            })
+        
+        wasted = sum(group['wasted_bytes'] for group in duplicates)
+        for group in duplicates:
+            print(f"  • {group['canonical']} ({self.format_size(group['size'])})")
+            for path in group['duplicates']:
+                print(f"    = {path}")
+        print(f"Found {len(duplicates)} duplicate groups, {self.format_size(wasted)} wasted")
+        
+        self.report['duplicates'] = {'groups': duplicates, 'wasted_bytes': wasted}
+        return duplicates
+    
+    @profiled()
+    def dedupe_images(self, mode='hardlink', dry_run=True):
+        """Collapse duplicate images found by find_duplicates
+        
+        mode='hardlink' replaces each duplicate with a hard link to the
+        canonical file; mode='canonical' deletes the duplicates and rewrites
+        CSS/HTML references to point at the canonical file instead.
+        """
+        if mode not in ('hardlink', 'canonical'):
+            raise ValueError(f"Unknown dedupe mode: {mode}")
+            
+        print(f"\n{'DRY RUN: ' if dry_run else ''}Deduplicating images ({mode})...")
+        
+        groups = self.report.get('duplicates', {}).get('groups')
+        if groups is None:
+            groups = self.find_duplicates()
+        
+        mappings = {}
+        for group in groups:
+            canonical = self.images_dir / group['canonical']
+            for path in group['duplicates']:
+                duplicate = self.images_dir / path
+                mappings[f"images/{path}"] = f"images/{group['canonical']}"
                 
-                if current_path.parent != category_dir:
-                    if not dry_run:
-                        try:
-                            # Create subdirectories if needed
-                            new_path.parent.mkdir(parents=True, exist_ok=True)
-                            shutil.move(str(current_path), str(new_path))
-                            self.report['moved_files'].append({
-                                'from': str(current_path),
-                                'to': str(new_path)
-                            })
-                            print(f"Moved: {current_path} -> {new_path}")
-                        except Exception as e:
-                            error_msg = f"Error moving {current_path}: {str(e)}"
-                            print(error_msg)
-                            self.report['issues'].append(error_msg)
+                if dry_run:
+                    action = 'link' if mode == 'hardlink' else 'remove'
+                    print(f"Would {action}: {duplicate} -> {canonical}")
+                    continue
+                    
+                try:
+                    if mode == 'hardlink':
+                        if os.path.samefile(canonical, duplicate):
+                            continue
+                        # Link beside the duplicate, then swap it in atomically
+                        tmp_link = duplicate.with_name(duplicate.name + '.dedupe')
+                        os.link(canonical, tmp_link)
+                        os.replace(tmp_link, duplicate)
+                        print(f"Linked: {duplicate} -> {canonical}")
                     else:
-                        print(f"Would move: {current_path} -> {new_path}")
+                        duplicate.unlink()
+                        print(f"Removed: {duplicate} (use {canonical})")
+                except OSError as e:
+                    error_msg = f"Error deduplicating {duplicate}: {str(e)}"
+                    print(error_msg)
+                    self.report['issues'].append(error_msg)
+                    mappings.pop(f"images/{path}", None)
+        
+        if mode == 'canonical' and mappings:
+            updater = CSSPathUpdater(self.project_root)
+            updater.rewrite_references(mappings, dry_run=dry_run)
+        
+        return mappings
     
+    @profiled()
     def generate_report(self):
-        """Generate a detailed report of the image organization"""
+        """Print the organization report and stream it to a JSON Lines file
+        
+        Records are written as they are printed, with image paths relative to
+        images/, and the file is compared with the previous run's report.
+        """
         print("\n" + "="*60)
         print("IMAGE ORGANIZATION REPORT")
         print("="*60)
         
+        report_file = self.project_root / REPORT_FILENAME
+        legacy_file = self.project_root / LEGACY_REPORT_FILENAME
+        previous_file = report_file if report_file.exists() else legacy_file
+        previous = load_images(previous_file) if previous_file.exists() else None
+        
         total_images = 0
         total_size = 0
         
-        for category, info in self.report['categories'].items():
-            if info['files']:
-                category_size = sum(f['size'] for f in info['files'])
-                total_size += category_size
-                total_images += len(info['files'])
-                
-                print(f"\n{category.upper()} ({len(info['files'])} files, {self.format_size(category_size)})")
-                print(f"Description: {info['description']}")
-                print("-" * 40)
-                
-                for file_info in info['files']:
-                    print(f"  • {file_info['filename']} ({self.format_size(file_info['size'])})")
-                    print(f"    Path: {file_info['current_path']}")
-        
-        print(f"\nTOTAL: {total_images} images, {self.format_size(total_size)}")
-        
-        if self.report['issues']:
-            print("\nISSUES:")
-            for issue in self.report['issues']:
-                print(f"  ! {issue}")
+        with ReportWriter(report_file, root='images') as writer:
+            for category, info in self.report['categories'].items():
+                if info['files']:
+                    category_size = sum(f['size'] for f in info['files'])
+                    total_size += category_size
+                    total_images += len(info['files'])
+                    writer.write('category', name=category, description=info['description'],
+                                 files=len(info['files']), bytes=category_size)
+                    
+                    print(f"\n{category.upper()} ({len(info['files'])} files, {self.format_size(category_size)})")
+                    print(f"Description: {info['description']}")
+                    print("-" * 40)
+                    
+                    for file_info in info['files']:
+                        writer.write('image', path=file_info['current_path'], category=category,
+                                     size=file_info['size'], format=file_info.get('format'),
+                                     width=file_info.get('width'), height=file_info.get('height'))
+                        dimensions = f", {file_info['width']}x{file_info['height']}" if file_info.get('width') else ''
+                        print(f"  • {file_info['filename']} ({self.format_size(file_info['size'])}{dimensions})")
+                        print(f"    Path: {file_info['current_path']}")
+            
+            print(f"\nTOTAL: {total_images} images, {self.format_size(total_size)}")
+            
+            scan = self.report.get('scan')
+            if scan:
+                writer.write('scan', **scan)
+                print(f"SCAN ({scan['mode']}): {scan['cached']} from cache, "
+                      f"{scan['rescanned']} rescanned, {scan['removed']} removed")
+            
+            duplicates = self.report.get('duplicates')
+            if duplicates and duplicates['groups']:
+                for group in duplicates['groups']:
+                    writer.write('duplicate', **group)
+                print(f"DUPLICATES: {len(duplicates['groups'])} groups, "
+                      f"{self.format_size(duplicates['wasted_bytes'])} wasted")
+            
+            oversized = self.report.get('oversized')
+            if oversized:
+                for item in oversized:
+                    writer.write('oversized', **item)
+                print(f"OVERSIZED: {len(oversized)} images wider than {MAX_PIXEL_RATIO}x their display width")
+            
+            for move in self.report['moved_files']:
+                writer.write('move', **move)
+            
+            if self.report['issues']:
+                print("\nISSUES:")
+                for issue in self.report['issues']:
+                    writer.write('issue', message=issue)
+                    print(f"  ! {issue}")
+            
+            writer.write('summary', images=total_images, bytes=total_size)
         
-        # Save report to file
-        report_file = self.project_root / 'image_organization_report.json'
-        with open(report_file, 'w') as f:
-            json.dump(self.report, f, indent=2)
+        if previous is not None:
+            diff = diff_images(previous, report_file)
+            self.report['changes'] = diff
+            print(f"CHANGES SINCE LAST REPORT: {len(diff['added'])} added, {len(diff['removed'])} removed, "
+                  f"{len(diff['changed'])} changed, {len(diff['recategorized'])} recategorized")
         print(f"\nDetailed report saved to: {report_file}")
     
     def format_size(self, size_bytes):
@@ -203,6 +421,7 @@ class ImageOrganizer:
             size_bytes /= 1024.0
         return f"{size_bytes:.1f} TB"
     
+    @profiled()
     def find_carousel_images(self):
         """Specifically identify carousel/hero images"""
         print("\nCARROUSEL IMAGES ANALYSIS:")
@@ -227,31 +446,28 @@ class ImageOrganizer:
         
         return carousel_candidates
     
+    @profiled()
     def check_css_references(self):
         """Check CSS files for image references"""
         print("\nCSS IMAGE REFERENCES:")
         print("-" * 40)
         
-        css_files = list(self.project_root.glob('*.css'))
         image_refs = set()
         
-        for css_file in css_files:
+        css_index = CSSIndex(self.project_root)
+        for css_file in sorted(self.project_root.glob('*.css')):
             try:
-                with open(css_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                # Look for image references
-                import re
-                matches = re.findall(r'url\(["\']?([^"\')]+\.(jpg|jpeg|png|gif|webp|svg))["\']?\)', content, re.IGNORECASE)
-                
-                for match in matches:
-                    image_path = match[0]
-                    if 'images/' in image_path:
-                        image_refs.add(image_path)
-                        print(f"  • {image_path} (in {css_file.name})")
-                        
+                refs = [ref for ref in css_index.refs(css_file) if is_image_ref(ref['path'])]
             except Exception as e:
                 print(f"Error reading {css_file}: {e}")
+                continue
+            
+            for ref in refs:
+                image_path = ref['path']
+                if 'images/' in image_path:
+                    image_refs.add(image_path)
+                    print(f"  • {image_path} (in {css_file.name})")
+        css_index.save()
         
         return image_refs
 
@@ -264,8 +480,16 @@ def main():
     
     organizer = ImageOrganizer(project_root)
     
-    # Scan images
-    categories = organizer.scan_images()
+    # Finish or undo a previous run that was interrupted mid-move
+    if MoveTransaction(project_root).pending():
+        response = input("An interrupted organization was found. Resume (r) or roll back (b)? ").lower().strip()
+        if response == 'r':
+            organizer.resume_organization()
+        elif response == 'b':
+            organizer.rollback_organization()
+    
+    # Scan images, reusing the on-disk index for unchanged files
+    categories = organizer.scan_images(incremental=True)
     
     # Find carousel images specifically
     organizer.find_carousel_images()
@@ -273,6 +497,12 @@ def main():
     # Check CSS references
     organizer.check_css_references()
     
+    # Flag images far larger than they are displayed
+    organizer.find_oversized_images()
+    
+    # Look for byte-identical images
+    organizer.find_duplicates()
+    
     # Generate report
     organizer.generate_report()
     
@@ -293,4 +523,5 @@ def main():
         print("\nImage scan complete. No files were moved.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with profile_session('--profile' in sys.argv[1:]):
+        main()
\ No newline at end of file
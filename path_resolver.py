@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Broken Image Reference Resolver for Church Website
+Indexes the images tree once by basename, by stem without its @Nx density
+suffix and extension, and by content hash, then maps each missing image
+reference in the root CSS and HTML files to the most likely current file
+with dictionary lookups. References with several distinct candidates are
+reported as ambiguous rather than guessed.
+"""
+
+import os
+import re
+import posixpath
+from pathlib import Path
+
+from image_index import ImageIndex, IMAGE_EXTENSIONS
+from css_index import CSSIndex
+from asset_graph import AssetGraph, resolve
+from update_css_paths import PathRewriter
+from move_journal import write_durable
+
+# '@1.5x' / '@2x' before the extension
+DENSITY_SUFFIX = re.compile(r'@\d+(?:\.\d+)?x$')
+REFERRER_PATTERNS = ('*.css', '*.html')
+
+
+def stem_key(path):
+    """Lowercased file name without extension or density suffix: 'Hero-1@2x.jpg' -> 'hero-1'"""
+    stem = os.path.splitext(posixpath.basename(path))[0].lower()
+    return DENSITY_SUFFIX.sub('', stem)
+
+
+class PathResolver:
+    def __init__(self, project_root, jobs=None):
+        self.project_root = Path(project_root)
+        self.images_dir = self.project_root / 'images'
+        self.jobs = jobs
+        self.hashes = {}
+        self.previous_hashes = {}
+        self.by_name = {}
+        self.by_stem = {}
+        self.by_hash = {}
+
+    def build(self, save_index=True):
+        """Refresh the image index and build the lookup tables in one pass over it
+
+        Hashes saved by the previous scan remember where moved or renamed
+        files used to be; pass save_index=False (dry runs) to keep that
+        snapshot for the real run.
+        """
+        index = ImageIndex(self.images_dir, jobs=self.jobs)
+        self.previous_hashes = {f"images/{path}": record['hash'] for path, record in dict(index.load()).items()}
+        entries = index.refresh()
+        if save_index:
+            index.save()
+
+        self.hashes, self.by_name, self.by_stem, self.by_hash = {}, {}, {}, {}
+        for relative_path, record in entries.items():
+            path = f"images/{relative_path}"
+            self.hashes[path] = record['hash']
+            self.by_name.setdefault(posixpath.basename(path).lower(), []).append(path)
+            self.by_stem.setdefault(stem_key(path), []).append(path)
+            self.by_hash.setdefault(record['hash'], []).append(path)
+        return self
+
+    def _pick(self, candidates):
+        """One path if all candidates are byte-identical copies, else None (ambiguous)"""
+        if len({self.hashes[path] for path in candidates}) == 1:
+            return min(candidates, key=lambda path: (len(path), path))
+        return None
+
+    def resolve(self, missing_path):
+        """Best current location of a missing project path: (path or None, method, candidates)"""
+        old_hash = self.previous_hashes.get(missing_path)
+        if old_hash in self.by_hash:
+            candidates = self.by_hash[old_hash]
+            return self._pick(candidates), 'hash', sorted(candidates)
+
+        for method, candidates in (('basename', self.by_name.get(posixpath.basename(missing_path).lower())),
+                                   ('stem', self.by_stem.get(stem_key(missing_path)))):
+            if candidates:
+                return self._pick(candidates), method, sorted(candidates)
+        return None, None, []
+
+    def missing_references(self):
+        """Yield (referrer, written path, project path) for each missing image reference"""
+        existing = set(self.hashes)
+        css_index = CSSIndex(self.project_root)
+        graph = AssetGraph(self.project_root)
+        for pattern in REFERRER_PATTERNS:
+            for file_path in sorted(self.project_root.glob(pattern)):
+                referrer = file_path.name
+                if pattern == '*.css':
+                    targets = [ref['path'] for ref in css_index.refs(file_path)]
+                else:
+                    targets = graph.html_refs(referrer)
+                for target in targets:
+                    written = target.split('#', 1)[0].split('?', 1)[0]
+                    path = resolve(referrer, written)
+                    if (path and path.startswith('images/') and path not in existing
+                            and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+                            and not (self.project_root / path).exists()):
+                        yield referrer, written, path
+        css_index.save()
+
+    def plan(self):
+        """Resolve every missing reference once; returns one finding per (file, written path)"""
+        findings = []
+        resolved = {}
+        seen = set()
+        for referrer, written, path in self.missing_references():
+            if (referrer, written) in seen:
+                continue
+            seen.add((referrer, written))
+            if path not in resolved:
+                resolved[path] = self.resolve(path)
+            new_path, method, candidates = resolved[path]
+            new_written = None
+            if new_path:
+                new_written = '/' + new_path if written.startswith('/') else \
+                    posixpath.relpath(new_path, posixpath.dirname(referrer) or '.')
+            findings.append({'file': referrer, 'old_path': written, 'new_path': new_written,
+                             'method': method, 'candidates': candidates if new_path is None else []})
+        return findings
+
+    def apply(self, findings, dry_run=True):
+        """Rewrite every fixed reference, one literal pass per file; returns the files changed"""
+        fixes_by_file = {}
+        for finding in findings:
+            if finding['new_path']:
+                fixes_by_file.setdefault(finding['file'], {})[finding['old_path']] = finding['new_path']
+
+        changed = []
+        for referrer, mappings in sorted(fixes_by_file.items()):
+            file_path = self.project_root / referrer
+            content = file_path.read_text(encoding='utf-8')
+            new_content = PathRewriter(mappings, literal=True).rewrite(content)
+            if new_content != content:
+                changed.append(referrer)
+                if not dry_run:
+                    write_durable(file_path, new_content.encode('utf-8'))
+        return changed
+
@@ -4,49 +4,198 @@ Script to prettify all HTML files in the churchsite project
 """
 
 import os
+import sys
+import json
 import glob
+import time
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
+from profiling import PROFILER, profiled, profile_session
+from backup_store import BackupStore
 
-def prettify_html_file(file_path):
-    """Prettify a single HTML file"""
+try:
+    import lxml  # noqa: F401 -- only checked for availability
+    FAST_PARSER = 'lxml'
+except ImportError:
+    FAST_PARSER = None
+
+CACHE_FILENAME = '.prettify_cache.json'
+
+
+def content_hash(text):
+    """Hash of the UTF-8 encoded text"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def choose_parser(content, parser=None):
+    """Pick the parser for a document
+
+    lxml is much faster but wraps fragments (nav-bar.html, footer.html) in
+    <html><body>, so it is only used for complete documents.
+    """
+    if parser:
+        return parser
+    if FAST_PARSER and '<html' in content[:2048].lower():
+        return FAST_PARSER
+    return 'html.parser'
+
+
+def atomic_write(file_path, content):
+    """Write via a temp file in the same directory and rename it into place"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.prettify-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+@profiled()
+def process_file(file_path, parser=None, known_hash=None, dry_run=False):
+    """Prettify one file and report what happened; safe to run in a worker process
+
+    With dry_run the output is computed but not written; 'changed' then
+    means the file would change.
+    """
+    result = {'file': file_path, 'changed': False, 'skipped': False,
+              'parse_ms': 0.0, 'serialize_ms': 0.0, 'error': None}
     try:
         with open(file_path, 'r', encoding='utf-8') as file:
             content = file.read()
-        
-        # Parse with BeautifulSoup
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        # Prettify the HTML
+
+        current_hash = content_hash(content)
+        if current_hash == known_hash:
+            # Already the output of a previous run: nothing to parse
+            result['skipped'] = True
+            result['hash'] = current_hash
+            return result
+
+        start = time.perf_counter()
+        soup = BeautifulSoup(content, choose_parser(content, parser))
+        parsed = time.perf_counter()
         prettified = soup.prettify()
-        
-        # Write back to file
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.write(prettified)
-        
-        print(f"✓ Prettified: {file_path}")
-        return True
-        
+        serialized = time.perf_counter()
+
+        result['parse_ms'] = (parsed - start) * 1000
+        result['serialize_ms'] = (serialized - parsed) * 1000
+        result['hash'] = content_hash(prettified)
+
+        # Only touch the file (and its mtime) when the output differs
+        if result['hash'] != current_hash:
+            if not dry_run:
+                atomic_write(file_path, prettified)
+            result['changed'] = True
+
     except Exception as e:
-        print(f"✗ Error prettifying {file_path}: {str(e)}")
+        result['error'] = str(e)
+
+    return result
+
+
+@profiled()
+def prettify_html_file(file_path, parser=None):
+    """Prettify a single HTML file"""
+    result = process_file(file_path, parser)
+    if result['error']:
+        print(f"✗ Error prettifying {file_path}: {result['error']}")
         return False
 
+    if result['changed']:
+        print(f"✓ Prettified: {file_path}")
+    else:
+        print(f"= Unchanged: {file_path}")
+    return True
+
+
+def load_cache(cache_file):
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache_file, cache):
+    with open(cache_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+@profiled()
+def prettify_files(html_files, jobs=None, parser=None, cache_file=CACHE_FILENAME, backup_store=None, dry_run=False):
+    """Prettify many files across a process pool
+
+    The cache remembers the hash of each file's last prettified output, so
+    files that have not been edited since are skipped without parsing.
+    With a backup_store (backup_store.BackupStore), the pages are
+    snapshotted first; versions it already holds are not stored again.
+    A dry run writes no pages, backups or cache.
+    """
+    if backup_store is not None and not dry_run:
+        backup_store.snapshot(html_files, label='html')
+    cache = load_cache(cache_file) if cache_file else {}
+    parser_key = parser or FAST_PARSER or 'html.parser'
+    known = {f: cache[f]['hash'] for f in html_files
+             if f in cache and cache[f].get('parser') == parser_key}
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(process_file, f, parser, known.get(f), dry_run) for f in html_files]
+        results = [future.result() for future in futures]
+
+    if PROFILER.enabled:
+        # The workers are not instrumented; record the timings they report
+        PROFILER.add('prettify (workers): parse', sum(r['parse_ms'] for r in results) / 1000, len(results))
+        PROFILER.add('prettify (workers): serialize', sum(r['serialize_ms'] for r in results) / 1000, len(results))
+
+    if cache_file and not dry_run:
+        for result in results:
+            if not result['error']:
+                cache[result['file']] = {'hash': result['hash'], 'parser': parser_key}
+        save_cache(cache_file, cache)
+
+    return results
+
+
 def main():
     """Main function to prettify all HTML files"""
     # Get all HTML files in the current directory
-    html_files = glob.glob('*.html')
-    
+    html_files = sorted(glob.glob('*.html'))
+
     if not html_files:
         print("No HTML files found in the current directory.")
         return
-    
-    print(f"Found {len(html_files)} HTML files to prettify...\n")
-    
-    success_count = 0
-    for html_file in sorted(html_files):
-        if prettify_html_file(html_file):
-            success_count += 1
-    
-    print(f"\nCompleted! Successfully prettified {success_count}/{len(html_files)} files.")
+
+    print(f"Found {len(html_files)} HTML files to prettify "
+          f"(parser: {FAST_PARSER or 'html.parser'} for full documents)...\n")
+
+    results = prettify_files(html_files, backup_store=BackupStore(os.getcwd()))
+
+    print(f"{'File':<28}{'Status':<12}{'Parse ms':>10}{'Serialize ms':>14}")
+    for result in results:
+        if result['error']:
+            status = 'error'
+        elif result['skipped']:
+            status = 'cached'
+        else:
+            status = 'rewritten' if result['changed'] else 'unchanged'
+        print(f"{result['file']:<28}{status:<12}{result['parse_ms']:>10.1f}{result['serialize_ms']:>14.1f}")
+        if result['error']:
+            print(f"  ✗ {result['error']}")
+
+    success_count = sum(1 for r in results if not r['error'])
+    changed_count = sum(1 for r in results if r['changed'])
+    print(f"\nCompleted! Successfully prettified {success_count}/{len(html_files)} files "
+          f"({changed_count} rewritten).")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with profile_session('--profile' in sys.argv[1:]):
+        main()
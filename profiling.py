@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Stage Profiling for Church Website Tools
+Opt-in instrumentation for the organizer, CSS updater and prettifier. Stages
+are marked with @profiled; when profiling is enabled each stage records its
+call count, wall and CPU time, and how many open/stat/scandir/rename/unlink/
+mkdir and print calls it made, and an optional cProfile dump can be written
+for pstats, snakeviz or flameprof. When disabled, a stage costs one
+attribute check and no builtins are patched. DirEntry.stat() cannot be
+patched, so the scandir walkers count those calls with PROFILER.count().
+"""
+
+import io
+import os
+import sys
+import time
+import cProfile
+import builtins
+import functools
+import contextlib
+
+# Counter name -> the (module, attribute) functions counted under it
+COUNTED_CALLS = {
+    'open': [(builtins, 'open'), (io, 'open')],
+    'stat': [(os, 'stat'), (os, 'lstat')],
+    'scandir': [(os, 'scandir'), (os, 'listdir')],
+    'rename': [(os, 'rename'), (os, 'replace')],
+    'unlink': [(os, 'unlink')],
+    'mkdir': [(os, 'mkdir')],
+    'print': [(builtins, 'print')],
+}
+COUNTERS = tuple(COUNTED_CALLS)
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}
+        self.stack = []
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.counters['print_s'] = 0.0
+        self.cprofile = None
+        self._originals = []
+
+    def enable(self, cprofile=False):
+        """Start counting calls (and cProfile, if asked); idempotent"""
+        if self.enabled:
+            return
+        for counter, targets in COUNTED_CALLS.items():
+            for module, name in targets:
+                original = getattr(module, name)
+                self._originals.append((module, name, original))
+                setattr(module, name, self._counting(counter, original))
+        if cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.enabled = True
+
+    def disable(self):
+        """Restore the patched functions and stop cProfile"""
+        if not self.enabled:
+            return
+        if self.cprofile:
+            self.cprofile.disable()
+        for module, name, original in reversed(self._originals):
+            setattr(module, name, original)
+        self._originals = []
+        self.enabled = False
+
+    def _counting(self, counter, func):
+        counters = self.counters
+        if counter == 'print':
+            # print is also timed: the tools print once per file
+            @functools.wraps(func)
+            def timed(*args, **kwargs):
+                counters['print'] += 1
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    counters['print_s'] += time.perf_counter() - start
+            return timed
+
+        @functools.wraps(func)
+        def counted(*args, **kwargs):
+            counters[counter] += 1
+            return func(*args, **kwargs)
+        return counted
+
+    def count(self, counter, calls=1):
+        """Count calls the patches cannot see, e.g. DirEntry.stat()"""
+        if self.enabled:
+            self.counters[counter] += calls
+
+    def _record(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'depth': len(self.stack), 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                 **dict.fromkeys(self.counters, 0)}
+        return self.stages[name]
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a block and attribute the calls made inside it (inclusive of nested stages)"""
+        record = self._record(name)
+        self.stack.append(name)
+        before = dict(self.counters)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['calls'] += 1
+            record['wall_s'] += time.perf_counter() - wall
+            record['cpu_s'] += time.process_time() - cpu
+            for counter, value in self.counters.items():
+                record[counter] += value - before[counter]
+            self.stack.pop()
+
+    def add(self, name, seconds, calls=1):
+        """Record time measured elsewhere, e.g. reported back by worker processes"""
+        record = self._record(name)
+        record['calls'] += calls
+        record['wall_s'] += seconds
+
+    def summary(self):
+        """One row per stage, in the order the stages first ran"""
+        return [{'stage': name, **record} for name, record in self.stages.items()]
+
+    def print_summary(self, stream=None):
+        stream = stream or sys.stdout
+        header = f"{'Stage':<44}{'Calls':>6}{'Wall ms':>10}{'CPU ms':>10}"
+        header += ''.join(f"{counter:>9}" for counter in COUNTERS) + f"{'print ms':>10}"
+        stream.write("\nPROFILE:\n" + header + "\n" + "-" * len(header) + "\n")
+        for row in self.summary():
+            name = '  ' * row['depth'] + row['stage']
+            line = f"{name[:43]:<44}{row['calls']:>6}{row['wall_s'] * 1000:>10.1f}{row['cpu_s'] * 1000:>10.1f}"
+            line += ''.join(f"{row[counter]:>9}" for counter in COUNTERS) + f"{row['print_s'] * 1000:>10.1f}"
+            stream.write(line + "\n")
+
+    def dump(self, profile_file):
+        """Write the cProfile stats (pstats format) if cProfile was enabled"""
+        if self.cprofile:
+            self.cprofile.dump_stats(profile_file)
+            return True
+        return False
+
+
+PROFILER = Profiler()
+
+
+def profiled(name=None):
+    """Mark a function as a profiled stage (named after its qualified name by default)"""
+    def decorate(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with PROFILER.stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def profile_session(enabled, profile_file=None, stream=None):
+    """Profile a whole run: enable, run the block, then print the table and dump"""
+    if not enabled:
+        yield None
+        return
+    PROFILER.enable(cprofile=bool(profile_file))
+    try:
+        yield PROFILER
+    finally:
+        PROFILER.disable()
+        PROFILER.print_summary(stream)
+        if profile_file and PROFILER.dump(profile_file):
+            (stream or sys.stdout).write(f"cProfile stats written to {profile_file}\n")
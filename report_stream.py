@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Streaming Report Format for Church Website
+Writes the image organization report as JSON Lines: one compact record per
+image, duplicate group, move or issue, each written as soon as it is known,
+with paths relative to a single root recorded in the header. Readers stream
+the file back record by record, so neither side holds the whole report.
+"""
+
+import os
+import sys
+import json
+from datetime import datetime
+from pathlib import Path
+
+REPORT_FILENAME = 'image_organization_report.jsonl'
+# The indented JSON report written by earlier versions; still readable
+LEGACY_REPORT_FILENAME = 'image_organization_report.json'
+REPORT_VERSION = 1
+
+
+class ReportWriter:
+    """Append-only JSON Lines writer; the file is swapped into place on close"""
+
+    def __init__(self, report_file, root):
+        self.report_file = Path(report_file)
+        self.tmp_file = self.report_file.with_name(self.report_file.name + '.tmp')
+        self.file = open(self.tmp_file, 'w', encoding='utf-8')
+        self.counts = {}
+        self.write('header', version=REPORT_VERSION, root=root, timestamp=datetime.now().isoformat())
+
+    def write(self, record_type, **fields):
+        self.file.write(json.dumps({'type': record_type, **fields}, separators=(',', ':'), default=str))
+        self.file.write('\n')
+        self.counts[record_type] = self.counts.get(record_type, 0) + 1
+
+    def close(self):
+        self.file.close()
+        os.replace(self.tmp_file, self.report_file)
+
+    def abort(self):
+        self.file.close()
+        self.tmp_file.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def iter_report(report_file, record_type=None):
+    """Yield report records one at a time, optionally only those of one type
+
+    Reports written before the streaming format (one indented JSON object)
+    are converted to the same records on the fly.
+    """
+    with open(report_file, 'r', encoding='utf-8') as f:
+        first = f.readline()
+        if first.strip() == '{':
+            f.seek(0)
+            records = _legacy_records(json.load(f))
+        else:
+            f.seek(0)
+            records = (json.loads(line) for line in f if line.strip())
+        for record in records:
+            if record_type is None or record['type'] == record_type:
+                yield record
+
+
+def _legacy_records(report):
+    """Records equivalent to an old whole-document report"""
+    yield {'type': 'header', 'version': 0, 'root': 'images', 'timestamp': report.get('timestamp')}
+    for category, info in report.get('categories', {}).items():
+        for file_info in info.get('files', []):
+            yield {'type': 'image', 'path': file_info['current_path'], 'category': category,
+                   'size': file_info['size']}
+    for issue in report.get('issues', []):
+        yield {'type': 'issue', 'message': issue}
+
+
+def load_images(report_file):
+    """Map image path -> (category, size, width, height) from a report, or {} if there is none"""
+    try:
+        return {
+            record['path']: (record['category'], record['size'], record.get('width'), record.get('height'))
+            for record in iter_report(report_file, 'image')
+        }
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def diff_images(previous, report_file):
+    """Compare a previous load_images() result with a report, streaming the new one
+
+    Returns {'added': [...], 'removed': [...], 'changed': [...], 'recategorized': [...]}.
+    """
+    diff = {'added': [], 'removed': [], 'changed': [], 'recategorized': []}
+    seen = set()
+    for record in iter_report(report_file, 'image'):
+        path = record['path']
+        seen.add(path)
+        old = previous.get(path)
+        if old is None:
+            diff['added'].append(path)
+            continue
+        if old[0] != record['category']:
+            diff['recategorized'].append({'path': path, 'from': old[0], 'to': record['category']})
+        # Older reports carry no dimensions; only compare them when both sides have them
+        dimensions = (record.get('width'), record.get('height'))
+        if old[1] != record['size'] or (old[2] is not None and old[2:] != dimensions):
+            diff['changed'].append(path)
+    diff['removed'] = sorted(set(previous) - seen)
+    return diff
+
+
+def main():
+    """Print the differences between two reports: report_stream.py OLD NEW"""
+    if len(sys.argv) != 3:
+        print("Usage: report_stream.py OLD_REPORT NEW_REPORT")
+        return 2
+
+    diff = diff_images(load_images(sys.argv[1]), sys.argv[2])
+    for path in diff['added']:
+        print(f"  + {path}")
+    for path in diff['removed']:
+        print(f"  - {path}")
+    for path in diff['changed']:
+        print(f"  ~ {path}")
+    for item in diff['recategorized']:
+        print(f"  > {item['path']}: {item['from']} -> {item['to']}")
+    print(f"\n{len(diff['added'])} added, {len(diff['removed'])} removed, "
+          f"{len(diff['changed'])} changed, {len(diff['recategorized'])} recategorized")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Local Static Server for Church Website
+An asyncio HTTP/1.1 server for previewing the site (or the built dist/) with
+production-like behaviour: precompressed .br/.gz variants, ETag and
+Last-Modified validators with 304 responses, immutable caching for
+fingerprinted files, byte ranges, keep-alive and sendfile() for bodies.
+
+Usage: python serve_site.py [--dist] [--host 127.0.0.1] [--port 8000]
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import mimetypes
+import posixpath
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from email.utils import formatdate, parsedate_to_datetime
+
+from image_index import ImageIndex, hash_file
+from fingerprint_assets import HASHED_NAME_PATTERN
+from build_dist import DIST_DIRNAME
+
+DEFAULT_PORT = 8000
+MAX_HEADER_BYTES = 16 * 1024
+KEEPALIVE_TIMEOUT = 15
+# Encodings in order of preference, with the sibling file suffix they use
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+EXTRA_TYPES = {
+    '.webp': 'image/webp',
+    '.avif': 'image/avif',
+    '.svg': 'image/svg+xml',
+    '.woff2': 'font/woff2',
+    '.webapp': 'application/x-web-app-manifest+json',
+    '.js': 'text/javascript',
+}
+REASONS = {200: 'OK', 206: 'Partial Content', 304: 'Not Modified', 400: 'Bad Request',
+           403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed', 416: 'Range Not Satisfiable'}
+
+
+def content_type(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in EXTRA_TYPES:
+        mime = EXTRA_TYPES[extension]
+    else:
+        mime = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if mime.startswith('text/') or mime in ('application/json', 'image/svg+xml'):
+        mime += '; charset=utf-8'
+    return mime
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single 'bytes=' range, None to ignore, or False if unsatisfiable"""
+    if not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[6:].strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                return False
+            start, end = max(size - length, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, min(end, size - 1)
+
+
+class ETagCache:
+    """Content-hash ETags keyed by (path, mtime, size)
+
+    Images are seeded from the on-disk image index so they are never hashed
+    here; anything else is hashed once on first request and then reused
+    until its stat changes.
+    """
+
+    def __init__(self, site_dir):
+        self.site_dir = Path(site_dir)
+        self.entries = {}
+
+    def seed_from_image_index(self):
+        images_dir = self.site_dir / 'images'
+        if not images_dir.is_dir():
+            return 0
+        index = ImageIndex(images_dir)
+        for relative_path, record in index.load().items():
+            if record.get('hash'):
+                key = (str(images_dir / relative_path), record['mtime'], record['size'])
+                self.entries[key] = record['hash'][:20]
+        return len(self.entries)
+
+    def cached(self, file_path, st):
+        return self.entries.get((str(file_path), st.st_mtime_ns, st.st_size))
+
+    def compute(self, file_path, st):
+        etag = self.entries[(str(file_path), st.st_mtime_ns, st.st_size)] = hash_file(file_path)[:20]
+        return etag
+
+
+class StaticServer:
+    def __init__(self, site_dir, host='127.0.0.1', port=DEFAULT_PORT, log=False):
+        self.site_dir = Path(site_dir).resolve()
+        self.host = host
+        self.port = port
+        self.log = log
+        self.etags = ETagCache(self.site_dir)
+        self.server = None
+        # Open connection writer -> handler task, so close() can end idle keep-alive handlers
+        self.connections = {}
+        self.stats = {'requests': 0, 'bytes': 0, 'not_modified': 0}
+
+    async def start(self):
+        self.etags.seed_from_image_index()
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                 limit=MAX_HEADER_BYTES, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def close(self):
+        """Stop listening, close every open connection and wait for the handlers to finish"""
+        self.server.close()
+        handlers = list(self.connections.values())
+        for writer in list(self.connections):
+            writer.close()
+        # Before Python 3.12 wait_closed() does not wait for the handlers themselves
+        await asyncio.gather(*handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def resolve_path(self, target):
+        """Map a request target to a file inside the site, or None"""
+        path = posixpath.normpath(unquote(urlsplit(target).path))
+        if not path.startswith('/'):
+            return None
+        # Dotfiles (.git, tool caches, journals) are never served
+        if any(part.startswith('.') for part in path.split('/') if part):
+            return None
+        file_path = (self.site_dir / path.lstrip('/')).resolve()
+        if file_path != self.site_dir and self.site_dir not in file_path.parents:
+            return None
+        if file_path.is_dir():
+            file_path = file_path / 'index.html'
+        return file_path
+
+    async def handle_connection(self, reader, writer):
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send_error(writer, 400, close=True)
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split()
+                if len(parts) != 3:
+                    await self.send_error(writer, 400, close=True)
+                    break
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                await self.handle_request(writer, method, target, headers, keep_alive)
+                self.stats['requests'] += 1
+                if not keep_alive:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.connections.pop(writer, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def handle_request(self, writer, method, target, headers, keep_alive):
+        if method not in ('GET', 'HEAD'):
+            await self.send_error(writer, 405, keep_alive, extra={'Allow': 'GET, HEAD'})
+            return
+
+        file_path = self.resolve_path(target)
+        if file_path is None:
+            await self.send_error(writer, 403, keep_alive)
+            return
+        try:
+            st = file_path.stat()
+        except OSError:
+            await self.send_error(writer, 404, keep_alive)
+            return
+
+        relative_path = file_path.relative_to(self.site_dir).as_posix()
+        etag = self.etags.cached(file_path, st)
+        if etag is None:
+            # First request for this version of the file: hash off the event loop
+            etag = await asyncio.get_running_loop().run_in_executor(None, self.etags.compute, file_path, st)
+        response_headers = {
+            'Content-Type': content_type(file_path.name),
+            'Last-Modified': formatdate(st.st_mtime, usegmt=True),
+            'Cache-Control': IMMUTABLE_CACHE if HASHED_NAME_PATTERN.match(file_path.name) else REVALIDATE_CACHE,
+            'Accept-Ranges': 'bytes',
+        }
+
+        # Pick a precompressed sibling when the client accepts it (not for ranges)
+        body_path, size, encoding = file_path, st.st_size, None
+        accepted = headers.get('accept-encoding', '')
+        if 'range' not in headers:
+            for name, suffix in ENCODINGS:
+                if name in accepted:
+                    candidate = file_path.with_name(file_path.name + suffix)
+                    try:
+                        encoded_st = candidate.stat()
+                    except OSError:
+                        continue
+                    if encoded_st.st_mtime_ns >= st.st_mtime_ns:
+                        body_path, size, encoding = candidate, encoded_st.st_size, name
+                        break
+        if encoding:
+            response_headers['Content-Encoding'] = encoding
+            etag = f"{etag}-{encoding}"
+        if any(path.exists() for path in (file_path.with_name(file_path.name + s) for _, s in ENCODINGS)):
+            response_headers['Vary'] = 'Accept-Encoding'
+        response_headers['ETag'] = f'"{etag}"'
+
+        if self.not_modified(headers, f'"{etag}"', st.st_mtime):
+            self.stats['not_modified'] += 1
+            await self.send_head(writer, 304, response_headers, None, keep_alive)
+            return
+
+        status, offset, length = 200, 0, size
+        range_header = headers.get('range')
+        if range_header and headers.get('if-range', f'"{etag}"') == f'"{etag}"':
+            byte_range = parse_range(range_header, size)
+            if byte_range is False:
+                response_headers['Content-Range'] = f"bytes */{size}"
+                await self.send_error(writer, 416, keep_alive, extra=response_headers)
+                return
+            if byte_range:
+                offset, end = byte_range
+                status, length = 206, end - offset + 1
+                response_headers['Content-Range'] = f"bytes {offset}-{end}/{size}"
+
+        await self.send_head(writer, status, response_headers, length, keep_alive)
+        if method == 'GET' and length:
+            await self.send_body(writer, body_path, offset, length)
+        if self.log:
+            print(f"{method} {target} {status} {length} {relative_path}")
+
+    @staticmethod
+    def not_modified(headers, etag, mtime):
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+        since = headers.get('if-modified-since')
+        if since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def send_head(self, writer, status, headers, length, keep_alive):
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Date: {formatdate(usegmt=True)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+        lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+    async def send_body(self, writer, body_path, offset, length):
+        """Zero-copy send of a file slice; asyncio falls back to read/write if needed"""
+        loop = asyncio.get_running_loop()
+        with open(body_path, 'rb') as f:
+            await loop.sendfile(writer.transport, f, offset, length)
+        self.stats['bytes'] += length
+
+    async def send_error(self, writer, status, keep_alive=False, close=False, extra=None):
+        body = f"{status} {REASONS[status]}\n".encode('utf-8')
+        headers = dict(extra or {})
+        headers.pop('Content-Encoding', None)
+        headers['Content-Type'] = 'text/plain; charset=utf-8'
+        await self.send_head(writer, status, headers, len(body), keep_alive and not close)
+        writer.write(body)
+        await writer.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the church website locally")
+    parser.add_argument('--dist', action='store_true', help=f"serve the built {DIST_DIRNAME}/ tree")
+    parser.add_argument('--root', default=os.getcwd(), help="project root (default: current directory)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--log', action='store_true', help="print one line per request")
+    args = parser.parse_args()
+
+    site_dir = Path(args.root) / DIST_DIRNAME if args.dist else Path(args.root)
+    if not site_dir.is_dir():
+        print(f"{site_dir} not found. Run build_dist.py first.")
+        return 1
+
+    server = StaticServer(site_dir, args.host, args.port, log=args.log)
+    print("Church Website Local Server")
+    print(f"Serving {site_dir} at http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    print(f"\nServed {server.stats['requests']} requests")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,72 +6,167 @@ This script updates CSS files to reference the newly organized image paths.
 
 import os
 import re
+import sys
 from pathlib import Path
-import shutil
-from datetime import datetime
+from css_index import CSSIndex, parse_stylesheet, is_image_ref
+from backup_store import BackupStore
+from profiling import profiled, profile_session
+
+# Path mappings for organized images (regex pattern -> replacement)
+PATH_MAPPINGS = {
+    # Carousel images
+    r'images/backgrounds/hero-1\.jpg': 'images/carousel/hero-1.jpg',
+    r'images/backgrounds/hero-2\.jpg': 'images/carousel/hero-2.jpg', 
+    r'images/backgrounds/hero-3\.jpg': 'images/carousel/hero-3.jpg',
+    r'images/hero-1\.jpg': 'images/carousel/hero-1.jpg',
+    r'images/hero-2\.jpg': 'images/carousel/hero-2.jpg',
+    r'images/hero-3\.jpg': 'images/carousel/hero-3.jpg',
+    
+    # Logo images
+    r'images/logo': 'images/logos/logo',
+    r'images/brand': 'images/logos/brand',
+    
+    # Content images - ministries
+    r'images/content/ministries/': 'images/content/',
+    
+    # Content images - sermons  
+    r'images/content/sermons/': 'images/content/',
+    
+    # Content images - gallery
+    r'images/content/gallery/': 'images/content/',
+    
+    # Payment images
+    r'images/payments/': 'images/payments/',
+    
+    # Favicon images
+    r'images/favicons/': 'images/favicons/',
+}
+
+# A CSS url() token; group 2 is the referenced path without quotes
+URL_PATTERN = re.compile(r'''url\(\s*(["']?)([^"')]*)\1\s*\)''', re.IGNORECASE)
+
+
+class PathRewriter:
+    """Apply many path mappings to a text in a single linear pass
+    
+    All mappings are compiled into one alternation, so every position of the
+    input is examined once no matter how many mappings there are. A match
+    whose text already starts with its (equal or longer) replacement is left
+    alone, which keeps rewrites idempotent when a replacement extends its
+    own pattern (e.g. images/logo -> images/logos/logo).
+    
+    With literal=True the mapping keys are plain paths, matched exactly
+    (case included) and only as whole paths (not inside a longer file name).
+    """
+    
+    def __init__(self, mappings, literal=False):
+        self.literal = literal
+        if literal:
+            # Case-sensitive: Logo.png and logo.png may be two different files
+            self.mappings = dict(mappings)
+            keys = sorted(self.mappings, key=len, reverse=True)
+            pattern = r'(?<![\w.-])(?:' + '|'.join(re.escape(k) for k in keys) + r')(?![\w.-])'
+            flags = 0
+        else:
+            self.replacements = list(mappings.values())
+            pattern = '|'.join(f'(?P<m{i}>{old})' for i, old in enumerate(mappings))
+            flags = re.IGNORECASE
+        self.regex = re.compile(pattern, flags) if mappings else None
+        
+    def _replacement(self, match):
+        if self.literal:
+            return self.mappings[match.group(0)]
+        return self.replacements[int(match.lastgroup[1:])]
+        
+    def rewrite(self, text, changes=None):
+        """Rewrite every mapped path in text; append (old, new) pairs to changes"""
+        if self.regex is None:
+            return text
+            
+        def replace(match):
+            old = match.group(0)
+            new = self._replacement(match)
+            # Already rewritten (or an identity mapping): leave it untouched
+            start = match.start()
+            following = match.string[start:start + len(new)]
+            if len(new) >= len(old) and (following == new if self.literal else following.lower() == new.lower()):
+                return old
+            if changes is not None:
+                changes.append((old, new))
+            return new
+            
+        return self.regex.sub(replace, text)
+        
+    def rewrite_css(self, content, changes=None):
+        """Rewrite mapped paths inside CSS url() tokens only"""
+        if self.regex is None:
+            return content
+            
+        def replace(match):
+            path = match.group(2)
+            new_path = self.rewrite(path, changes)
+            if new_path == path:
+                return match.group(0)
+            start, end = match.start(2) - match.start(), match.end(2) - match.start()
+            return match.group(0)[:start] + new_path + match.group(0)[end:]
+            
+        return URL_PATTERN.sub(replace, content)
+
 
 class CSSPathUpdater:
     def __init__(self, project_root):
         self.project_root = Path(project_root)
         self.backup_dir = self.project_root / 'css_backups'
         self.changes_made = []
+        # Per-file read/write failures, reported after the run
+        self.errors = []
+        self.path_rewriter = PathRewriter(PATH_MAPPINGS)
+        self.stylesheets = None
+        self.backup_snapshot = None
         
+    @profiled()
     def backup_css_files(self):
-        """Create backups of CSS files before modification"""
-        css_files = list(self.project_root.glob('*.css'))
+        """Snapshot the CSS files into the backup store before modification
+        
+        Unchanged stylesheets are not copied again: the store keeps each
+        version once and the snapshot only records which versions it has.
+        """
+        css_files = sorted(self.project_root.glob('*.css'))
         
         if not css_files:
             print("No CSS files found in project root.")
             return []
             
-        # Create backup directory
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_path = self.backup_dir / f'backup_{timestamp}'
-        backup_path.mkdir(parents=True, exist_ok=True)
+        store = BackupStore(self.project_root, self.backup_dir)
+        snapshot_id, stats = store.snapshot(css_files, label='css')
+        self.backup_snapshot = snapshot_id
         
-        backed_up_files = []
         for css_file in css_files:
-            backup_file = backup_path / css_file.name
-            shutil.copy2(css_file, backup_file)
-            backed_up_files.append(backup_file)
-            print(f"Backed up: {css_file.name} -> {backup_file}")
+            print(f"Backed up: {css_file.name} -> snapshot {snapshot_id}")
+        print(f"  {stats['new_objects']} new versions stored ({stats['stored_bytes']:,} bytes compressed)")
             
-        return backed_up_files
+        return css_files
     
+    @profiled()
+    def load_stylesheets(self):
+        """Read and parse every root CSS file once; later calls reuse the result"""
+        if self.stylesheets is None:
+            self.stylesheets = {}
+            for css_file in sorted(self.project_root.glob('*.css')):
+                with open(css_file, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                self.stylesheets[css_file.name] = {
+                    'path': css_file,
+                    'size': len(text.encode('utf-8')),
+                    'rules': parse_stylesheet(text)
+                }
+        return self.stylesheets
+    
+    @profiled()
     def update_image_paths(self, dry_run=True):
         """Update image paths in CSS files"""
         css_files = list(self.project_root.glob('*.css'))
         
-        # Define path mappings for organized images
-        path_mappings = {
-            # Carousel images
-            r'images/backgrounds/hero-1\.jpg': 'images/carousel/hero-1.jpg',
-            r'images/backgrounds/hero-2\.jpg': 'images/carousel/hero-2.jpg', 
-            r'images/backgrounds/hero-3\.jpg': 'images/carousel/hero-3.jpg',
-            r'images/hero-1\.jpg': 'images/carousel/hero-1.jpg',
-            r'images/hero-2\.jpg': 'images/carousel/hero-2.jpg',
-            r'images/hero-3\.jpg': 'images/carousel/hero-3.jpg',
-            
-            # Logo images
-            r'images/logo': 'images/logos/logo',
-            r'images/brand': 'images/logos/brand',
-            
-            # Content images - ministries
-            r'images/content/ministries/': 'images/content/',
-            
-            # Content images - sermons  
-            r'images/content/sermons/': 'images/content/',
-            
-            # Content images - gallery
-            r'images/content/gallery/': 'images/content/',
-            
-            # Payment images
-            r'images/payments/': 'images/payments/',
-            
-            # Favicon images
-            r'images/favicons/': 'images/favicons/',
-        }
-        
         for css_file in css_files:
             print(f"\n{'DRY RUN: ' if dry_run else ''}Processing {css_file.name}...")
             
@@ -79,31 +174,22 @@ class CSSPathUpdater:
                 with open(css_file, 'r', encoding='utf-8') as f:
                     content = f.read()
                     
-                original_content = content
-                changes_in_file = 0
+                # Rewrite every url() against all mappings in one pass
+                changes = []
+                content = self.path_rewriter.rewrite_css(content, changes)
+                changes_in_file = len(changes)
                 
-                # Apply path mappings
-                for old_pattern, new_path in path_mappings.items():
-                    # Find all matches
-                    matches = re.findall(old_pattern, content, re.IGNORECASE)
-                    if matches:
-                        # Replace the matches
-                        content = re.sub(old_pattern, new_path, content, flags=re.IGNORECASE)
-                        changes_in_file += len(matches)
-                        
-                        for match in matches:
-                            change_info = {
-                                'file': css_file.name,
-                                'old_path': match if isinstance(match, str) else old_pattern,
-                                'new_path': new_path,
-                                'pattern': old_pattern
-                            }
-                            self.changes_made.append(change_info)
-                            
-                            if dry_run:
-                                print(f"  Would change: {old_pattern} -> {new_path}")
-                            else:
-                                print(f"  Changed: {old_pattern} -> {new_path}")
+                for old_path, new_path in changes:
+                    self.changes_made.append({
+                        'file': css_file.name,
+                        'old_path': old_path,
+                        'new_path': new_path
+                    })
+                    
+                    if dry_run:
+                        print(f"  Would change: {old_path} -> {new_path}")
+                    else:
+                        print(f"  Changed: {old_path} -> {new_path}")
                 
                 # Write updated content if changes were made and not dry run
                 if changes_in_file > 0 and not dry_run:
@@ -116,8 +202,73 @@ class CSSPathUpdater:
                     print(f"  ℹ️  No changes needed in {css_file.name}")
                     
             except Exception as e:
-                print(f"  ❌ Error processing {css_file.name}: {e}")
+                error_msg = f"Error processing {css_file.name}: {e}"
+                print(f"  ❌ {error_msg}")
+                self.errors.append(error_msg)
+    
+    @profiled()
+    def plan_rewrites(self, mappings, file_patterns=('*.css', '*.html')):
+        """Compute, without writing, the new content of root CSS and HTML files
+        
+        Returns {file name: (new content, [(old_path, new_path), ...])} for the
+        files that reference any of the literal image paths in mappings.
+        """
+        if not mappings:
+            return {}
+            
+        rewriter = PathRewriter(mappings, literal=True)
+        
+        planned = {}
+        for pattern in file_patterns:
+            for ref_file in sorted(self.project_root.glob(pattern)):
+                try:
+                    with open(ref_file, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                        
+                    changes = []
+                    content = rewriter.rewrite(content, changes)
+                    if changes:
+                        planned[ref_file.name] = (content, changes)
+                        
+                except Exception as e:
+                    error_msg = f"Error processing {ref_file.name}: {e}"
+                    print(f"  ❌ {error_msg}")
+                    self.errors.append(error_msg)
+                    
+        return planned
+    
+    def record_changes(self, planned):
+        """Add planned rewrites to the change report"""
+        for file_name, (_, changes) in planned.items():
+            self.changes_made.extend(
+                {'file': file_name, 'old_path': old_path, 'new_path': new_path}
+                for old_path, new_path in changes
+            )
+    
+    @profiled()
+    def rewrite_references(self, mappings, dry_run=True, file_patterns=('*.css', '*.html')):
+        """Replace literal image paths (old -> new) in root CSS and HTML files"""
+        planned = self.plan_rewrites(mappings, file_patterns)
+        self.record_changes(planned)
+        
+        total_changes = 0
+        for file_name, (content, changes) in planned.items():
+            total_changes += len(changes)
+            if dry_run:
+                print(f"  📋 Would update {file_name} with {len(changes)} reference changes")
+                continue
+            try:
+                with open(self.project_root / file_name, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                print(f"  ✅ Updated {file_name} with {len(changes)} reference changes")
+            except Exception as e:
+                error_msg = f"Error processing {file_name}: {e}"
+                print(f"  ❌ {error_msg}")
+                self.errors.append(error_msg)
+                    
+        return total_changes
     
+    @profiled()
     def add_carousel_css(self, dry_run=True):
         """Add specific CSS rules for carousel backgrounds if they don't exist"""
         main_css = self.project_root / 'main.css'
@@ -173,8 +324,11 @@ class CSSPathUpdater:
                 print("✅ Added carousel background CSS to main.css")
                 
         except Exception as e:
-            print(f"❌ Error adding carousel CSS: {e}")
+            error_msg = f"Error adding carousel CSS: {e}"
+            print(f"❌ {error_msg}")
+            self.errors.append(error_msg)
     
+    @profiled()
     def generate_report(self):
         """Generate a report of changes made"""
         print("\n" + "="*60)
@@ -200,38 +354,36 @@ class CSSPathUpdater:
             for change in changes:
                 print(f"  • {change['old_path']} -> {change['new_path']}")
     
+    @profiled()
     def verify_image_paths(self):
         """Verify that referenced images actually exist"""
         print("\nVERIFYING IMAGE PATHS:")
         print("-" * 40)
         
-        css_files = list(self.project_root.glob('*.css'))
         missing_images = []
         
-        for css_file in css_files:
+        css_index = CSSIndex(self.project_root)
+        for css_file in sorted(self.project_root.glob('*.css')):
             try:
-                with open(css_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                # Find all image references
-                image_refs = re.findall(r'url\(["\']?([^"\')]+\.(jpg|jpeg|png|gif|webp|svg))["\']?\)', content, re.IGNORECASE)
-                
-                for ref in image_refs:
-                    image_path = ref[0]
-                    if image_path.startswith('images/'):
-                        full_path = self.project_root / image_path
-                        if not full_path.exists():
-                            missing_images.append({
-                                'css_file': css_file.name,
-                                'image_path': image_path,
-                                'full_path': str(full_path)
-                            })
-                            print(f"❌ Missing: {image_path} (referenced in {css_file.name})")
-                        else:
-                            print(f"✅ Found: {image_path}")
-                            
+                refs = [ref for ref in css_index.refs(css_file) if is_image_ref(ref['path'])]
             except Exception as e:
                 print(f"Error checking {css_file.name}: {e}")
+                continue
+                
+            for ref in refs:
+                image_path = ref['path']
+                if image_path.startswith('images/'):
+                    full_path = self.project_root / image_path
+                    if not full_path.exists():
+                        missing_images.append({
+                            'css_file': css_file.name,
+                            'image_path': image_path,
+                            'full_path': str(full_path)
+                        })
+                        print(f"❌ Missing: {image_path} (referenced in {css_file.name})")
+                    else:
+                        print(f"✅ Found: {image_path}")
+        css_index.save()
                 
         if missing_images:
             print(f"\n⚠️  Found {len(missing_images)} missing image references")
@@ -283,4 +435,5 @@ def main():
         print("\nNo changes applied.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with profile_session('--profile' in sys.argv[1:]):
+        main()
\ No newline at end of file
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Latest Video Feed for Church Website
+Build step that fetches the channel's YouTube feed once, instead of every
+visitor's browser asking api.rss2json.com on each homepage load. The feed is
+cached with a TTL; once it expires it is revalidated with If-None-Match /
+If-Modified-Since, and a failed fetch falls back to the cached copy. The
+latest video is written to latest-video.json and its title baked into
+index.html, so index.bundle.js makes no cross-origin call.
+
+A local feed file can stand in for YouTube (offline work, tests); it is
+revalidated by its size and mtime.
+
+Usage: python video_feed.py [--feed FILE_OR_URL] [--ttl SECONDS] [--refresh]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import html
+import urllib.request
+import urllib.error
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from move_journal import write_durable
+
+CHANNEL_ID = 'UC3dKXfaGzFL_YvslCMCUtdg'
+FEED_URL = f"https://www.youtube.com/feeds/videos.xml?channel_id={CHANNEL_ID}"
+CACHE_FILENAME = '.video_feed_cache.json'
+OUTPUT_FILENAME = 'latest-video.json'
+PAGE_FILENAME = 'index.html'
+TITLE_ELEMENT_ID = 'lastEvent-title'
+DEFAULT_TTL = 3600
+FETCH_TIMEOUT = 10
+MAX_ITEMS = 5
+
+NAMESPACES = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'yt': 'http://www.youtube.com/xml/schemas/2015',
+}
+
+
+def parse_feed(data):
+    """Videos of a YouTube Atom feed, newest first"""
+    root = ET.fromstring(data)
+    items = []
+    for entry in root.findall('atom:entry', NAMESPACES):
+        link = entry.find('atom:link', NAMESPACES)
+        items.append({
+            'title': (entry.findtext('atom:title', '', NAMESPACES) or '').strip(),
+            'video_id': entry.findtext('yt:videoId', '', NAMESPACES),
+            'url': link.get('href') if link is not None else '',
+            'published': entry.findtext('atom:published', '', NAMESPACES),
+        })
+    items.sort(key=lambda item: item['published'], reverse=True)
+    return items[:MAX_ITEMS]
+
+
+def bake_title(page, title):
+    """Set the text of the title element in a page, keeping its surrounding whitespace"""
+    pattern = re.compile(r'(<(\w+)\b[^>]*\bid="' + re.escape(TITLE_ELEMENT_ID) + r'"[^>]*>)(\s*)(.*?)(\s*)(</\2\s*>)',
+                         re.DOTALL)
+    match = pattern.search(page)
+    if match is None:
+        return None
+    return page[:match.start(4)] + html.escape(title, quote=False) + page[match.end(4):]
+
+
+class VideoFeed:
+    def __init__(self, project_root, source=None, ttl=DEFAULT_TTL):
+        self.project_root = Path(project_root)
+        self.source = source or FEED_URL
+        self.ttl = ttl
+        self.cache_file = self.project_root / CACHE_FILENAME
+        self.cache = self.load_cache()
+        self.error = None
+
+    def load_cache(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # A different feed's cache says nothing about this one
+        return cache if cache.get('source') == self.source else {}
+
+    def save_cache(self):
+        write_durable(self.cache_file, json.dumps(self.cache, indent=1).encode('utf-8'))
+
+    def is_local(self):
+        return not re.match(r'^https?://', self.source, re.IGNORECASE)
+
+    def _local_path(self):
+        return Path(self.source[len('file://'):] if self.source.startswith('file://') else self.source)
+
+    def request(self):
+        """Conditional fetch; returns (status, body or None, etag, last_modified)"""
+        if self.is_local():
+            file_path = self._local_path()
+            st = file_path.stat()
+            validator = f'"{st.st_size}-{st.st_mtime_ns}"'
+            if self.cache.get('etag') == validator:
+                return 304, None, validator, None
+            return 200, file_path.read_bytes(), validator, None
+
+        headers = {'User-Agent': 'churchsite-video-feed'}
+        if self.cache.get('etag'):
+            headers['If-None-Match'] = self.cache['etag']
+        if self.cache.get('last_modified'):
+            headers['If-Modified-Since'] = self.cache['last_modified']
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.source, headers=headers),
+                                        timeout=FETCH_TIMEOUT) as response:
+                return response.status, response.read(), response.headers.get('ETag'), \
+                    response.headers.get('Last-Modified')
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return 304, None, e.headers.get('ETag') or self.cache.get('etag'), \
+                    e.headers.get('Last-Modified') or self.cache.get('last_modified')
+            raise
+
+    def fetch(self, force=False, save=True):
+        """Latest videos and how they were obtained: 'cached', 'revalidated', 'fetched' or 'stale'
+
+        Within the TTL the cache is used without touching the network; after
+        it (or with force) the feed is revalidated. If that fails and there is
+        a cached copy, the cached copy is used and reported as stale. With
+        save=False (dry runs) the cache file is left as it was.
+        """
+        now = time.time()
+        if self.cache.get('items') and not force and now - self.cache.get('fetched_at', 0) < self.ttl:
+            return self.cache['items'], 'cached'
+
+        try:
+            status, body, etag, last_modified = self.request()
+            items = self.cache.get('items', []) if status == 304 else parse_feed(body)
+        except (OSError, urllib.error.URLError, ET.ParseError) as e:
+            if self.cache.get('items'):
+                self.error = str(e)
+                return self.cache['items'], 'stale'
+            raise
+
+        self.cache = {'source': self.source, 'etag': etag, 'last_modified': last_modified,
+                      'fetched_at': now, 'items': items}
+        if save:
+            self.save_cache()
+        return items, 'revalidated' if status == 304 else 'fetched'
+
+    def publish(self, items):
+        """Write latest-video.json and bake the title into index.html; returns the files changed"""
+        if not items:
+            return []
+        latest = items[0]
+        changed = []
+        output_path = self.project_root / OUTPUT_FILENAME
+        data = (json.dumps(latest, indent=1, ensure_ascii=False) + '\n').encode('utf-8')
+        if not output_path.exists() or output_path.read_bytes() != data:
+            write_durable(output_path, data)
+            changed.append(OUTPUT_FILENAME)
+
+        page_path = self.project_root / PAGE_FILENAME
+        if page_path.exists():
+            page = page_path.read_text(encoding='utf-8')
+            baked = bake_title(page, latest['title'])
+            if baked is not None and baked != page:
+                write_durable(page_path, baked.encode('utf-8'))
+                changed.append(PAGE_FILENAME)
+        return changed
+
+
+def main():
+    project_root = os.getcwd()
+    args = sys.argv[1:]
+    source = args[args.index('--feed') + 1] if '--feed' in args else None
+    ttl = int(args[args.index('--ttl') + 1]) if '--ttl' in args else DEFAULT_TTL
+
+    print("Church Website Latest Video Feed")
+    print("=" * 40)
+    feed = VideoFeed(project_root, source=source, ttl=ttl)
+    print(f"Feed: {feed.source}")
+    try:
+        items, status = feed.fetch(force='--refresh' in args)
+    except Exception as e:
+        print(f"❌ Could not fetch the feed: {e}")
+        return 1
+    if status == 'stale':
+        print(f"⚠️  Fetch failed ({feed.error}); using the cached feed")
+    if not items:
+        print("⚠️  The feed has no videos")
+        return 1
+
+    print(f"✅ {len(items)} videos ({status}); latest: {items[0]['title']}")
+    for file_name in feed.publish(items):
+        print(f"✅ Updated {file_name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
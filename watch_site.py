@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Watch Mode for Church Website
+Watches images/ and the root CSS/HTML files and, after each burst of
+changes, re-runs only the stages the changed files affect: categorize new
+or modified images, rewrite the url() paths of changed stylesheets, and
+re-verify the references that point at (or come from) the changed files.
+Uses filesystem events through watchdog when installed, polling otherwise.
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+from pathlib import Path
+
+from image_index import ImageIndex, IMAGE_EXTENSIONS, EXCLUDED_DIRS, iter_image_entries
+from image_categories import CategoryMatcher, build_categories
+from update_css_paths import CSSPathUpdater
+from css_index import CSSIndex
+from asset_graph import AssetGraph, resolve
+from move_journal import MoveTransaction
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # polling is used instead
+    Observer = None
+    FileSystemEventHandler = object
+
+# Quiet period that ends a burst, and the longest a burst may be held back
+DEBOUNCE_SECONDS = 0.2
+MAX_BATCH_DELAY = 1.0
+POLL_INTERVAL = 0.25
+REFERRER_EXTENSIONS = {'.css', '.html'}
+# watchdog 3+ also reports opened/closed_no_write on plain reads, which
+# would make the watcher's own verify pass re-trigger it
+CHANGE_EVENT_TYPES = {'created', 'modified', 'deleted', 'moved'}
+
+
+def is_watched(relative_path):
+    """Root-level CSS/HTML and source images under images/ (not derived output)"""
+    extension = os.path.splitext(relative_path)[1].lower()
+    if '/' not in relative_path:
+        return extension in REFERRER_EXTENSIONS
+    top, _, rest = relative_path.partition('/')
+    if top != 'images' or rest.split('/', 1)[0] in EXCLUDED_DIRS:
+        return False
+    return extension in IMAGE_EXTENSIONS
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forward watchdog events as project-relative paths"""
+
+    def __init__(self, project_root, events):
+        super().__init__()
+        self.project_root = project_root
+        self.events = events
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in CHANGE_EVENT_TYPES:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if not path:
+                continue
+            try:
+                relative_path = Path(path).resolve().relative_to(self.project_root).as_posix()
+            except ValueError:
+                continue
+            if is_watched(relative_path):
+                self.events.put(relative_path)
+
+
+class Poller(threading.Thread):
+    """Fallback change detection: compare stat snapshots of the watched files"""
+
+    def __init__(self, project_root, events, interval=POLL_INTERVAL):
+        super().__init__(daemon=True)
+        self.project_root = project_root
+        self.events = events
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def snapshot(self):
+        state = {}
+        with os.scandir(self.project_root) as it:
+            for entry in it:
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in REFERRER_EXTENSIONS:
+                    st = entry.stat()
+                    state[entry.name] = (st.st_mtime_ns, st.st_size)
+        for relative_path, entry in iter_image_entries(self.project_root / 'images'):
+            st = entry.stat()
+            state[f"images/{relative_path}"] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def run(self):
+        previous = self.snapshot()
+        while not self.stopped.wait(self.interval):
+            current = self.snapshot()
+            for path in current.keys() | previous.keys():
+                if current.get(path) != previous.get(path):
+                    self.events.put(path)
+            previous = current
+
+    def stop(self):
+        self.stopped.set()
+
+
+class SiteWatcher:
+    def __init__(self, project_root, organize=False, report=None, polling=False):
+        self.project_root = Path(project_root).resolve()
+        self.images_dir = self.project_root / 'images'
+        self.organize = organize
+        self.report = report or self._print_report
+        self.polling = polling or Observer is None
+        self.events = queue.Queue()
+
+        self.categories = build_categories()
+        self.matcher = CategoryMatcher(self.categories)
+        self.index = ImageIndex(self.images_dir)
+        self.css_index = CSSIndex(self.project_root)
+        self.updater = CSSPathUpdater(self.project_root)
+        # target -> referrers, so a changed image re-verifies only its referrers
+        self.graph = AssetGraph(self.project_root)
+        self.referrers = {}
+
+    @staticmethod
+    def _print_report(event, **fields):
+        details = ', '.join(f"{key}={value}" for key, value in fields.items())
+        print(f"[{time.strftime('%H:%M:%S')}] {event}: {details}")
+
+    def prime(self):
+        """Load the index and build the reverse reference map once, up front
+
+        The index is not refreshed here: each batch re-examines only the
+        images it changed (see categorize).
+        """
+        self.index.load()
+        self.graph.build()
+        self.referrers = {}
+        for referrer, targets in self.graph.graph.items():
+            for target in targets:
+                self.referrers.setdefault(target, set()).add(referrer)
+
+    def referrer_targets(self, relative_path):
+        """Current references of one CSS or HTML file, resolved to project paths"""
+        file_path = self.project_root / relative_path
+        if relative_path.endswith('.css'):
+            targets = [ref['path'] for ref in self.css_index.refs(file_path)]
+        else:
+            targets = self.graph.html_refs(relative_path)
+        return {path for path in (resolve(relative_path, t) for t in targets) if path}
+
+    def next_batch(self, timeout=None):
+        """Block for the first event, then collect until the burst goes quiet"""
+        try:
+            batch = {self.events.get(timeout=timeout)}
+        except queue.Empty:
+            return set()
+        deadline = time.monotonic() + MAX_BATCH_DELAY
+        while True:
+            remaining = min(DEBOUNCE_SECONDS, deadline - time.monotonic())
+            if remaining <= 0:
+                break
+            try:
+                batch.add(self.events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def handle_batch(self, batch):
+        """Run the stages affected by one burst of changed paths"""
+        started = time.perf_counter()
+        images = {path for path in batch if path.startswith('images/')}
+        referrers = {path for path in batch if path not in images}
+
+        moved = {}
+        if images:
+            moved = self.categorize(images)
+        if referrers:
+            self.rewrite_css(sorted(p for p in referrers if p.endswith('.css')))
+
+        # Re-verify changed referrers plus every referrer of a changed image
+        to_verify = {p for p in referrers if (self.project_root / p).exists()}
+        for path in images | set(moved.values()):
+            to_verify |= self.referrers.get(path, set())
+        missing = self.verify(sorted(to_verify))
+
+        self.css_index.save()
+        self.report('batch', changed=len(batch), images=len(images), referrers=len(referrers),
+                    verified=len(to_verify), missing=missing,
+                    ms=round((time.perf_counter() - started) * 1000, 1))
+
+    def categorize(self, images):
+        """Index and categorize changed images; with organize=True move them into place"""
+        records = self.index.update(path.split('/', 1)[1] for path in images)
+        if self.index.stats['rescanned'] or self.index.stats['removed']:
+            self.index.save()
+
+        moves = []
+        for path in sorted(images):
+            relative_path = path.split('/', 1)[1]
+            record = records.get(relative_path)
+            if record is None:
+                self.report('removed', path=path)
+                continue
+            category = self.matcher.match(relative_path)
+            target = f"{category}/{relative_path.rsplit('/', 1)[-1]}"
+            meta = record.get('meta') or {}
+            self.report('image', path=path, category=category,
+                        width=meta.get('width'), height=meta.get('height'))
+            if self.organize and target != relative_path:
+                moves.append((path, f"images/{target}"))
+
+        if not moves:
+            return {}
+
+        transaction = MoveTransaction(self.project_root)
+        mappings = dict(moves)
+        planned = self.updater.plan_rewrites(mappings)
+        try:
+            transaction.begin(moves, {name: content for name, (content, _) in planned.items()})
+            transaction.apply()
+        except (ValueError, RuntimeError, OSError) as e:
+            self.report('error', message=f"move failed: {e}")
+            return {}
+        for source, target in moves:
+            self.report('moved', source=source, target=target)
+            self.referrers[target] = self.referrers.pop(source, set()) | set(planned)
+        return mappings
+
+    def rewrite_css(self, css_files):
+        """Apply the organized-layout path mappings to the changed stylesheets only"""
+        rewriter = self.updater.path_rewriter
+        for css_file in css_files:
+            file_path = self.project_root / css_file
+            if not file_path.exists():
+                continue
+            changes = self.css_index.rewrite_refs(file_path, rewriter.rewrite, dry_run=False)
+            for old_path, new_path in changes:
+                self.report('rewrite', file=css_file, old_path=old_path, new_path=new_path)
+
+    def verify(self, referrers):
+        """Check the references of the given files; update the reverse map as we go"""
+        missing = 0
+        for referrer in referrers:
+            file_path = self.project_root / referrer
+            if not file_path.exists():
+                continue
+            targets = self.referrer_targets(referrer)
+            for old_targets in self.referrers.values():
+                old_targets.discard(referrer)
+            for target in sorted(targets):
+                self.referrers.setdefault(target, set()).add(referrer)
+                if not (self.project_root / target).exists():
+                    missing += 1
+                    self.report('missing', referrer=referrer, target=target)
+        return missing
+
+    def start(self):
+        """Start delivering events; returns the observer/poller to stop later"""
+        if self.polling:
+            watcher = Poller(self.project_root, self.events)
+            watcher.start()
+            return watcher
+        observer = Observer()
+        handler = _EventHandler(self.project_root, self.events)
+        observer.schedule(handler, str(self.project_root), recursive=False)
+        if self.images_dir.exists():
+            observer.schedule(handler, str(self.images_dir), recursive=True)
+        observer.start()
+        return observer
+
+    def run(self, stop_event=None):
+        """Watch until interrupted (or until stop_event is set)"""
+        self.prime()
+        watcher = self.start()
+        self.report('watching', root=str(self.project_root),
+                    backend='polling' if self.polling else 'watchdog', organize=self.organize)
+        try:
+            while stop_event is None or not stop_event.is_set():
+                batch = self.next_batch(timeout=0.5)
+                if batch:
+                    self.handle_batch(batch)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.stop()
+        return 0
+
+
+def main():
+    project_root = os.getcwd()
+
+    print("Church Website Watch Mode")
+    print(f"Project root: {project_root}")
+    if Observer is None:
+        print("ℹ️  watchdog not installed: polling for changes")
+
+    watcher = SiteWatcher(project_root, organize='--organize' in sys.argv[1:])
+    return watcher.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())